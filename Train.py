@@ -2,13 +2,18 @@
 import os
 import sqlite3
 import datetime
-import pickle
+import numpy as np
 import configargparse
 from pyannote.audio import PretrainedSpeakerEmbedding
-from diarize import chunk_audio  # your existing chunking logic
+from diarize import chunk_audio
+from embedding_store import VECTOR_MAGIC, encode_vector, decode_vector
+from result_cache import hash_file
 
 def init_db(db_path):
     conn = sqlite3.connect(db_path)
+    # WAL keeps bulk inserts to one fsync per transaction
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
     conn.execute("""
       CREATE TABLE IF NOT EXISTS speakers (
         id INTEGER PRIMARY KEY,
@@ -24,40 +29,205 @@ def init_db(db_path):
         FOREIGN KEY(speaker_id) REFERENCES speakers(id)
       )
     """)
+    # Enrolled source files, so re-runs skip finished files and resume
+    # partially enrolled ones from the last committed chunk
+    conn.execute("""
+      CREATE TABLE IF NOT EXISTS sources (
+        id INTEGER PRIMARY KEY,
+        speaker_id INTEGER NOT NULL,
+        content_hash TEXT NOT NULL,
+        chunk_duration REAL NOT NULL,
+        embedding_model TEXT NOT NULL,
+        path TEXT NOT NULL,
+        size INTEGER NOT NULL,
+        mtime REAL NOT NULL,
+        total_chunks INTEGER NOT NULL,
+        done_chunks INTEGER NOT NULL DEFAULT 0,
+        completed DATETIME,
+        UNIQUE(speaker_id, content_hash, chunk_duration, embedding_model),
+        FOREIGN KEY(speaker_id) REFERENCES speakers(id)
+      )
+    """)
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(embeddings)")}
+    if "source_id" not in columns:
+        conn.execute("ALTER TABLE embeddings ADD COLUMN source_id INTEGER REFERENCES sources(id)")
+    if "chunk_index" not in columns:
+        conn.execute("ALTER TABLE embeddings ADD COLUMN chunk_index INTEGER")
+    conn.execute("""
+      CREATE UNIQUE INDEX IF NOT EXISTS embeddings_source_chunk
+      ON embeddings(source_id, chunk_index)
+    """)
     conn.commit()
     return conn
 
-def upsert_speaker(conn, name):
+def upsert_speaker(conn, name, commit=True):
     cur = conn.cursor()
     cur.execute("INSERT OR IGNORE INTO speakers(name) VALUES(?)", (name,))
-    conn.commit()
+    if commit:
+        conn.commit()
     cur.execute("SELECT id FROM speakers WHERE name = ?", (name,))
     return cur.fetchone()[0]
 
-def insert_embedding(conn, speaker_id, vector):
-    blob = pickle.dumps(vector)
+def insert_embedding(conn, speaker_id, vector, commit=True, index=None):
+    """
+    Insert one embedding. If an ann_index.IVFIndex is given, it picks up
+    the new row once committed; the (possibly rebuilt) index is returned.
+    """
+    blob = encode_vector(vector)
     ts = datetime.datetime.utcnow().isoformat()
     conn.execute(
       "INSERT INTO embeddings(speaker_id, vector, timestamp) VALUES(?,?,?)",
       (speaker_id, blob, ts)
     )
-    conn.commit()
+    if commit:
+        conn.commit()
+        if index is not None:
+            index = index.sync(conn)
+    return index
+
+def insert_embeddings(conn, speaker_id, vectors, source_id=None, first_chunk=0):
+    """
+    Insert many embeddings for one speaker with a single executemany.
+    Does not commit; callers wrap a whole file or run in one transaction.
+    With a source_id, rows are numbered by chunk from first_chunk.
+    """
+    ts = datetime.datetime.utcnow().isoformat()
+    conn.executemany(
+      "INSERT INTO embeddings(speaker_id, vector, timestamp, source_id, chunk_index) "
+      "VALUES(?,?,?,?,?)",
+      ((speaker_id, encode_vector(v), ts, source_id,
+        first_chunk + i if source_id is not None else None)
+       for i, v in enumerate(vectors))
+    )
+
+def find_completed_source(conn, name, path, chunk_duration, embedding_model):
+    """
+    Cheap check (no hashing) for a file already enrolled for this speaker
+    with the same chunking and model, matched by path, size and mtime.
+    """
+    st = os.stat(path)
+    return conn.execute("""
+      SELECT sources.id FROM sources JOIN speakers ON speakers.id = sources.speaker_id
+      WHERE speakers.name = ? AND sources.path = ? AND sources.size = ?
+        AND sources.mtime = ? AND sources.chunk_duration = ?
+        AND sources.embedding_model = ? AND sources.completed IS NOT NULL
+    """, (name, os.path.abspath(path), st.st_size, st.st_mtime,
+          chunk_duration, embedding_model)).fetchone()
+
+def get_or_create_source(conn, speaker_id, path, content_hash, chunk_duration,
+                         embedding_model, total_chunks):
+    """
+    Return (source_id, done_chunks, completed) for a source file, creating
+    its row if needed. Does not commit.
+    """
+    st = os.stat(path)
+    row = conn.execute("""
+      SELECT id, done_chunks, completed FROM sources
+      WHERE speaker_id = ? AND content_hash = ? AND chunk_duration = ?
+        AND embedding_model = ?
+    """, (speaker_id, content_hash, chunk_duration, embedding_model)).fetchone()
+    if row is not None:
+        # Same content may have moved or been touched; remember where it is now
+        conn.execute("UPDATE sources SET path = ?, size = ?, mtime = ? WHERE id = ?",
+                     (os.path.abspath(path), st.st_size, st.st_mtime, row[0]))
+        return row[0], row[1], row[2] is not None
+    cur = conn.execute("""
+      INSERT INTO sources(speaker_id, content_hash, chunk_duration, embedding_model,
+                          path, size, mtime, total_chunks)
+      VALUES(?,?,?,?,?,?,?,?)
+    """, (speaker_id, content_hash, chunk_duration, embedding_model,
+          os.path.abspath(path), st.st_size, st.st_mtime, total_chunks))
+    return cur.lastrowid, 0, False
+
+def migrate_embeddings(conn, batch_size=10000):
+    """
+    Rewrite pickled embedding rows in the raw float32 format.
+    Runs in one transaction; returns the number of rows converted.
+    """
+    with conn:
+        ids = [row[0] for row in conn.execute(
+          "SELECT id FROM embeddings WHERE substr(vector, 1, 4) != ?",
+          (VECTOR_MAGIC,)
+        )]
+        for i in range(0, len(ids), batch_size):
+            batch = ids[i:i + batch_size]
+            rows = conn.execute(
+              f"SELECT id, vector FROM embeddings WHERE id IN ({','.join('?' * len(batch))})",
+              batch
+            ).fetchall()
+            conn.executemany(
+              "UPDATE embeddings SET vector = ? WHERE id = ?",
+              [(encode_vector(decode_vector(blob)), row_id) for row_id, blob in rows]
+            )
+    return len(ids)
+
+def embed_chunks(model, chunks, batch_size=32):
+    """
+    Embed (n_chunks, samples) audio in batches of stacked tensors.
+    Returns an (n_chunks, dimension) array.
+    """
+    import torch
+    vectors = []
+    for start in range(0, len(chunks), batch_size):
+        batch = np.ascontiguousarray(chunks[start:start + batch_size], dtype=np.float32)
+        # (batch, channel, sample) as expected by PretrainedSpeakerEmbedding
+        waveforms = torch.from_numpy(batch).unsqueeze(1)
+        vectors.append(np.asarray(model(waveforms)))
+    if not vectors:
+        return np.empty((0, model.dimension), dtype=np.float32)
+    return np.concatenate(vectors)
 
 def train(args):
     if not args.speaker:
         raise ValueError("At least one --speaker NAME PATH pair is required")
-    model = PretrainedSpeakerEmbedding(
-      args.embedding_model, device=args.device
-    )
+    model = None
     conn = init_db(args.db_path)
+    index = None
+    if args.ann_index:
+        from ann_index import IVFIndex, META_FILE
+        if os.path.isfile(os.path.join(args.ann_index, META_FILE)):
+            index = IVFIndex.open(args.ann_index)
     for name, path in args.speaker:
         if not os.path.isfile(path):
             raise FileNotFoundError(f"{path} not found")
-        speaker_id = upsert_speaker(conn, name)
-        segments = chunk_audio(path, duration=args.chunk_duration)
-        for segment in segments:
-            emb = model({'audio': path, 'segment': segment})
-            insert_embedding(conn, speaker_id, emb.numpy())
+        if find_completed_source(conn, name, path, args.chunk_duration, args.embedding_model):
+            print(f"Skipping {path}: already enrolled for {name}")
+            continue
+
+        content_hash = hash_file(path)
+        chunks = chunk_audio(path, duration=args.chunk_duration)
+        with conn:
+            speaker_id = upsert_speaker(conn, name, commit=False)
+            source_id, done, completed = get_or_create_source(
+                conn, speaker_id, path, content_hash, args.chunk_duration,
+                args.embedding_model, len(chunks))
+        if completed:
+            print(f"Skipping {path}: already enrolled for {name}")
+            continue
+        if done:
+            print(f"Resuming {path} for {name} at chunk {done}/{len(chunks)}")
+
+        # Load the model only once some file actually needs embedding
+        if model is None:
+            model = PretrainedSpeakerEmbedding(
+              args.embedding_model, device=args.device
+            )
+        for start in range(done, len(chunks), args.commit_chunks):
+            end = min(start + args.commit_chunks, len(chunks))
+            vectors = embed_chunks(model, chunks[start:end], batch_size=args.batch_size)
+            # Rows and progress commit together, so a crash resumes from here
+            with conn:
+                insert_embeddings(conn, speaker_id, vectors,
+                                  source_id=source_id, first_chunk=start)
+                conn.execute("UPDATE sources SET done_chunks = ? WHERE id = ?",
+                             (end, source_id))
+        with conn:
+            conn.execute("UPDATE sources SET completed = ? WHERE id = ?",
+                         (datetime.datetime.utcnow().isoformat(), source_id))
+        if args.ann_index:
+            # Append the committed rows to the index (built on first use)
+            index = index.sync(conn) if index is not None \
+                else IVFIndex.build_from_db(args.ann_index, conn)
     conn.close()
 
 def main():
@@ -83,10 +253,48 @@ def main():
       "--embedding-model", default="speechbrain/spkrec-ecapa-voxceleb",
       help="Hugging Face model for speaker embeddings"
     )
+    tr.add_argument(
+      "--batch-size", type=int, default=32,
+      help="Chunks per embedding batch"
+    )
+    tr.add_argument(
+      "--commit-chunks", type=int, default=256,
+      help="Chunks embedded per committed transaction (resume granularity)"
+    )
     tr.add_argument("--device", default="cpu", help="torch device")
+    tr.add_argument(
+      "--ann-index",
+      help="Speaker index directory (see ann_index.py) to keep up to date"
+    )
+    mg = sub.add_parser(
+      "migrate", help="Convert pickled embeddings to the raw float32 format"
+    )
+    mg.add_argument(
+      "--db-path", default="transcribbler.db",
+      help="SQLite database path"
+    )
+    bi = sub.add_parser(
+      "build-index", help="Build the approximate nearest-neighbour speaker index"
+    )
+    bi.add_argument(
+      "--db-path", default="transcribbler.db",
+      help="SQLite database path"
+    )
+    bi.add_argument("--ann-index", required=True, help="Index directory to write")
+    bi.add_argument("--nlist", type=int, help="Number of inverted lists")
     args = p.parse_args()
     if args.command == "train":
         train(args)
+    elif args.command == "migrate":
+        conn = init_db(args.db_path)
+        print(f"Converted {migrate_embeddings(conn)} embedding rows")
+        conn.close()
+    elif args.command == "build-index":
+        from ann_index import IVFIndex
+        conn = init_db(args.db_path)
+        index = IVFIndex.build_from_db(args.ann_index, conn, nlist=args.nlist)
+        print(f"Indexed {len(index)} embeddings in {index.meta['nlist']} lists")
+        conn.close()
 
 if __name__ == "__main__":
     main()
@@ -141,7 +349,9 @@ def test_train_end_to_end(two_speakers):
     ids = set(r[0] for r in rows)
     assert len(ids) == 2, "Expected one embedding per speaker chunk"
     for _, blob in rows:
-        vec = pickle.loads(blob)
+        assert blob[:4] == VECTOR_MAGIC
+        vec = decode_vector(blob)
         assert isinstance(vec, np.ndarray)
         assert vec.ndim == 1
+        assert vec.dtype == np.float32
     conn.close()
\ No newline at end of file
@@ -1,14 +1,25 @@
 import json
-import pandas as pd
 
-def align_transcript_with_speakers(transcript_data, speaker_segments, output_path=None):
+from aligner import SpeakerTimeline, TurnIndex, split_by_speaker
+from sinks import COLUMNS, open_sink
+from transcript_store import STORE_EXTENSION, load_transcript, segment_times
+
+def align_transcript_with_speakers(transcript_data, speaker_segments, output_path=None,
+                                   by_word=False, output_format=None):
     """
     Merge transcript with speaker information
     
     Args:
-        transcript_data (dict): Whisper transcription result
+        transcript_data (dict): Whisper transcription result, or the path of
+            one saved by transcribe.py (store file or JSON)
         speaker_segments (list): Speaker diarization segments
-        output_path (str, optional): Path to save aligned transcript
+        output_path (str, optional): Path to save aligned transcript (CSV,
+            JSONL, Parquet or Arrow by extension, see sinks.py)
+        by_word (bool): Attribute each word (needs word_timestamps=True, as
+            in transcribe.py) and split segments where the speaker changes,
+            instead of giving each segment its dominant speaker
+        output_format (str, optional): Output format if not implied by
+            output_path's extension
         
     Returns:
         list: Aligned transcript with speaker information
@@ -16,70 +27,64 @@ def align_transcript_with_speakers(transcript_data, speaker_segments, output_pat
     print("Aligning transcription with speaker information...")
     
     # Load from files if paths are provided
+    opened = None
     if isinstance(transcript_data, str):
-        with open(transcript_data, 'r') as f:
-            transcript_data = json.load(f)
+        transcript_data = opened = load_transcript(transcript_data)
     
     if isinstance(speaker_segments, str):
         with open(speaker_segments, 'r') as f:
             speaker_segments = json.load(f)
     
     aligned_segments = []
-    
-    for segment in transcript_data["segments"]:
-        # Find the dominant speaker for this segment
-        segment_start = segment["start"]
-        segment_end = segment["end"]
-        segment_speaker = find_dominant_speaker(segment_start, segment_end, speaker_segments)
+    try:
+        segments = transcript_data["segments"]
         
-        # Add segment with speaker info
-        aligned_segments.append({
-            "start": segment_start,
-            "end": segment_end,
-            "speaker": segment_speaker,
-            "text": segment["text"]
-        })
+        if by_word:
+            timeline = SpeakerTimeline.from_segments(speaker_segments)
+            segments = split_by_speaker(segments, timeline, default="Unknown")
+            segment_speakers = [piece["speaker"] for piece in segments]
+        else:
+            # Find the dominant speaker for every segment in one pass
+            index = TurnIndex.from_segments(speaker_segments)
+            segment_speakers = index.dominant_speakers(*segment_times(segments))
+        
+        for segment, segment_speaker in zip(segments, segment_speakers):
+            # Add segment with speaker info
+            aligned_segments.append({
+                "start": segment["start"],
+                "end": segment["end"],
+                "speaker": segment_speaker,
+                "text": segment["text"]
+            })
+    finally:
+        # Release a store file's memory map so transcribe.py can replace it
+        if hasattr(opened, "close"):
+            segments = None
+            opened.close()
     
     if output_path:
-        # Save as CSV for easy viewing
-        df = pd.DataFrame(aligned_segments)
-        df.to_csv(output_path, index=False)
+        with open_sink(output_path, output_format) as sink:
+            sink.write_rows(tuple(segment[column] for column in COLUMNS)
+                            for segment in aligned_segments)
         print(f"Aligned transcript saved to {output_path}")
-        
-        # Also save as JSON
-        json_path = output_path.replace('.csv', '.json')
-        with open(json_path, 'w') as f:
-            json.dump(aligned_segments, f, indent=2)
     
     return aligned_segments
 
 def find_dominant_speaker(start_time, end_time, speaker_segments):
     """Find the dominant speaker for a given time range"""
-    speakers = {}
-    
-    for segment in speaker_segments:
-        # Check for overlap
-        overlap_start = max(start_time, segment["start"])
-        overlap_end = min(end_time, segment["end"])
-        
-        if overlap_end > overlap_start:
-            duration = overlap_end - overlap_start
-            speakers[segment["speaker"]] = speakers.get(segment["speaker"], 0) + duration
-    
-    # Return speaker with most speaking time in this segment
-    if speakers:
-        return max(speakers, key=speakers.get)
-    return "Unknown"
+    index = TurnIndex.from_segments(speaker_segments)
+    return index.dominant_speakers([start_time], [end_time])[0]
 
 if __name__ == "__main__":
     # Example usage
-    transcript_file = "data/transcription.json"
+    transcript_file = "data/transcription" + STORE_EXTENSION
     speakers_file = "data/speakers.json"
     
     aligned_transcript = align_transcript_with_speakers(
         transcript_file,
         speakers_file,
-        output_path="data/aligned_transcript.csv"
+        output_path="data/aligned_transcript.csv",
+        by_word=True
     )
     
     # Print preview
@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+"""
+aligner.py: shared speaker-turn alignment for main.py and align.py.
+
+Diarization turns are sorted once into an interval index. Each query
+(a segment midpoint or a segment span) is then resolved with two binary
+searches instead of a scan over every turn, and the overlap sums are
+computed with NumPy over all candidate (segment, turn) pairs at once.
+
+For word-level attribution the turns are flattened once into a
+SpeakerTimeline: sorted boundaries and the one speaker holding each
+interval between them. The speaker of every word midpoint is then a
+single searchsorted, and split_by_speaker() cuts Whisper segments where
+the speaker changes between consecutive words, in one linear pass.
+"""
+
+import contextlib
+import gc
+import heapq
+
+import numpy as np
+
+
+class TurnIndex:
+    """
+    Sorted interval index over diarization turns.
+
+    Turns keep their original list position, so ties are broken exactly as
+    the old linear scans did: the midpoint strategy picks the first turn in
+    list order that contains the point, and the dominant-overlap strategy
+    picks the first speaker (in order of first overlapping turn) with the
+    largest summed overlap.
+    """
+
+    def __init__(self, turns):
+        """
+        Args:
+            turns (iterable): (start, end, speaker) tuples in any order.
+        """
+        starts, ends, codes = [], [], []
+        self.labels = []
+        label_codes = {}
+        for turn_start, turn_end, speaker in turns:
+            if speaker not in label_codes:
+                label_codes[speaker] = len(self.labels)
+                self.labels.append(speaker)
+            starts.append(turn_start)
+            ends.append(turn_end)
+            codes.append(label_codes[speaker])
+
+        starts = np.asarray(starts, dtype=np.float64)
+        ends = np.asarray(ends, dtype=np.float64)
+        # Stable sort keeps equal starts in list order
+        self._order = np.argsort(starts, kind="stable")
+        self._starts = starts[self._order]
+        self._ends = ends[self._order]
+        self._codes = np.asarray(codes, dtype=np.int64)[self._order]
+        # Running max of ends: every turn before the first position whose
+        # running max reaches a time t has already finished before t.
+        self._max_ends = np.maximum.accumulate(self._ends) if len(ends) else self._ends
+
+    @classmethod
+    def from_segments(cls, speaker_segments):
+        """Build an index from align.py style dicts with start/end/speaker keys."""
+        return cls((s["start"], s["end"], s["speaker"]) for s in speaker_segments)
+
+    def __len__(self):
+        return len(self._starts)
+
+    def _candidates(self, lo, hi):
+        """Expand per-query [lo, hi) ranges into flat (query, sorted turn) pairs."""
+        counts = np.maximum(hi - lo, 0)
+        query_idx = np.repeat(np.arange(len(counts)), counts)
+        offsets = np.cumsum(counts) - counts
+        turn_pos = np.arange(counts.sum()) - np.repeat(offsets - lo, counts)
+        return query_idx, turn_pos
+
+    def speakers_at(self, points, default="unknown"):
+        """
+        Label each time point with the speaker of the first turn containing it.
+
+        Args:
+            points (array-like): Query times in seconds.
+            default: Label for points not covered by any turn.
+
+        Returns:
+            list: One speaker label per point.
+        """
+        points = np.asarray(points, dtype=np.float64)
+        result = np.full(len(points), -1, dtype=np.int64)
+        if len(points) and len(self):
+            hi = np.searchsorted(self._starts, points, side="right")
+            lo = np.searchsorted(self._max_ends, points, side="left")
+            query_idx, turn_pos = self._candidates(lo, hi)
+            hit = self._ends[turn_pos] >= points[query_idx]
+            query_idx, turn_pos = query_idx[hit], turn_pos[hit]
+            # First turn in original list order wins
+            orig = self._order[turn_pos]
+            order = np.lexsort((orig, query_idx))
+            query_idx, turn_pos = query_idx[order], turn_pos[order]
+            first = np.ones(len(query_idx), dtype=bool)
+            first[1:] = query_idx[1:] != query_idx[:-1]
+            result[query_idx[first]] = self._codes[turn_pos[first]]
+        return self._decode(result, default)
+
+    def midpoint_speakers(self, starts, ends, default="unknown"):
+        """Label each [start, end] span with the speaker holding its midpoint."""
+        starts = np.asarray(starts, dtype=np.float64)
+        ends = np.asarray(ends, dtype=np.float64)
+        return self.speakers_at((starts + ends) / 2.0, default=default)
+
+    def dominant_speakers(self, starts, ends, default="Unknown"):
+        """
+        Label each [start, end] span with the speaker of greatest total overlap.
+
+        Args:
+            starts (array-like): Span start times in seconds.
+            ends (array-like): Span end times in seconds.
+            default: Label for spans that overlap no turn.
+
+        Returns:
+            list: One speaker label per span.
+        """
+        starts = np.asarray(starts, dtype=np.float64)
+        ends = np.asarray(ends, dtype=np.float64)
+        result = np.full(len(starts), -1, dtype=np.int64)
+        if len(starts) and len(self):
+            hi = np.searchsorted(self._starts, ends, side="left")
+            lo = np.searchsorted(self._max_ends, starts, side="right")
+            query_idx, turn_pos = self._candidates(lo, hi)
+            overlap = (np.minimum(ends[query_idx], self._ends[turn_pos])
+                       - np.maximum(starts[query_idx], self._starts[turn_pos]))
+            hit = overlap > 0
+            query_idx, turn_pos, overlap = query_idx[hit], turn_pos[hit], overlap[hit]
+
+            # Accumulate in original list order so the float sums match a
+            # sequential per-segment loop bit for bit.
+            order = np.lexsort((self._order[turn_pos], query_idx))
+            query_idx, turn_pos, overlap = query_idx[order], turn_pos[order], overlap[order]
+            codes = self._codes[turn_pos]
+            keys = query_idx * len(self.labels) + codes
+            group_keys, first_pos, inverse = np.unique(keys, return_index=True,
+                                                       return_inverse=True)
+            totals = np.zeros(len(group_keys), dtype=np.float64)
+            np.add.at(totals, inverse, overlap)
+
+            group_query = group_keys // len(self.labels)
+            group_code = group_keys % len(self.labels)
+            # Largest total wins; ties go to the speaker seen first
+            best = np.lexsort((first_pos, -totals, group_query))
+            group_query, group_code = group_query[best], group_code[best]
+            first = np.ones(len(group_query), dtype=bool)
+            first[1:] = group_query[1:] != group_query[:-1]
+            result[group_query[first]] = group_code[first]
+        return self._decode(result, default)
+
+    def _decode(self, codes, default):
+        labels = self.labels
+        return [labels[c] if c >= 0 else default for c in codes.tolist()]
+
+
+class SpeakerTimeline:
+    """
+    Diarization turns flattened into non-overlapping intervals.
+
+    Where turns overlap, the interval goes to the first of them in list
+    order (as in TurnIndex.speakers_at). With fill_gaps, silence between
+    turns is split at its middle between the speakers on either side,
+    and time before the first or after the last turn goes to that turn's
+    speaker, so no word is left unattributed.
+    """
+
+    def __init__(self, turns, fill_gaps=True):
+        """
+        Args:
+            turns (iterable): (start, end, speaker) tuples in any order.
+            fill_gaps (bool): Attribute untouched time to the nearest speaker.
+        """
+        starts, ends, codes = [], [], []
+        self.labels = []
+        label_codes = {}
+        for turn_start, turn_end, speaker in turns:
+            if turn_end <= turn_start:
+                continue
+            if speaker not in label_codes:
+                label_codes[speaker] = len(self.labels)
+                self.labels.append(speaker)
+            starts.append(turn_start)
+            ends.append(turn_end)
+            codes.append(label_codes[speaker])
+
+        # _codes[k] holds the interval ending at _bounds[k], and _codes[-1]
+        # everything after the last boundary
+        bounds, codes = self._flatten(np.asarray(starts, dtype=np.float64),
+                                      np.asarray(ends, dtype=np.float64),
+                                      np.asarray(codes, dtype=np.int64))
+        if fill_gaps:
+            bounds, codes = self._fill_gaps(bounds, codes)
+        self._bounds, self._codes = self._compress(bounds, codes)
+
+    @classmethod
+    def from_segments(cls, speaker_segments, fill_gaps=True):
+        """Build a timeline from align.py style dicts with start/end/speaker keys."""
+        return cls(((s["start"], s["end"], s["speaker"]) for s in speaker_segments),
+                   fill_gaps=fill_gaps)
+
+    @staticmethod
+    def _flatten(starts, ends, codes):
+        bounds = np.unique(np.concatenate((starts, ends)))
+        if not len(bounds):
+            return bounds, np.full(1, -1, dtype=np.int64)
+        interval_codes = np.full(max(len(bounds) - 1, 0), -1, dtype=np.int64)
+        by_start = np.argsort(starts, kind="stable").tolist()
+        start_list, end_list = starts.tolist(), ends.tolist()
+        # Sweep the boundaries keeping the active turns in a heap keyed by
+        # list position; expired turns are only dropped once they surface
+        active = []
+        j = 0
+        for k, bound in enumerate(bounds[:-1].tolist()):
+            while j < len(by_start) and start_list[by_start[j]] <= bound:
+                heapq.heappush(active, (by_start[j], end_list[by_start[j]]))
+                j += 1
+            while active and active[0][1] <= bound:
+                heapq.heappop(active)
+            if active:
+                interval_codes[k] = codes[active[0][0]]
+        return bounds, np.concatenate(([-1], interval_codes, [-1]))
+
+    @staticmethod
+    def _compress(bounds, codes):
+        """Drop boundaries between intervals with the same speaker."""
+        change = codes[1:] != codes[:-1]
+        return bounds[change], np.concatenate((codes[:1], codes[1:][change]))
+
+    @classmethod
+    def _fill_gaps(cls, bounds, codes):
+        bounds, codes = cls._compress(bounds, codes)
+        if len(codes) < 3:
+            return bounds, codes
+        gaps = np.flatnonzero(codes == -1)
+        # Interior gaps sit between two speakers (runs were merged above):
+        # both of their boundaries become one boundary at the gap's middle
+        interior = gaps[(gaps > 0) & (gaps < len(codes) - 1)]
+        bounds = bounds.copy()
+        bounds[interior - 1] = (bounds[interior - 1] + bounds[interior]) / 2.0
+        bounds = np.delete(bounds, interior)
+        codes = np.delete(codes, interior)
+        codes[0] = codes[1]
+        codes[-1] = codes[-2]
+        return bounds, codes
+
+    def codes_at(self, points):
+        """Speaker codes (indices into labels, -1 for none) at each time point."""
+        points = np.asarray(points, dtype=np.float64)
+        return self._codes[np.searchsorted(self._bounds, points, side="right")]
+
+    def speakers_at(self, points, default="unknown"):
+        """Label each time point with the speaker holding it."""
+        labels = self.labels
+        return [labels[c] if c >= 0 else default for c in self.codes_at(points).tolist()]
+
+
+@contextlib.contextmanager
+def _gc_paused():
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def split_by_speaker(segments, timeline, default="unknown"):
+    """
+    Attribute every word to a speaker and cut segments where it changes.
+
+    Each word goes to the speaker holding its midpoint; a segment becomes
+    one piece per run of consecutive words with the same speaker. Segments
+    without word timestamps are attributed as a whole by their midpoint.
+    Runs in linear time in the number of words.
+
+    Args:
+        segments (list): Whisper segments (with "words" from
+            word_timestamps=True) in time order.
+        timeline (SpeakerTimeline): Flattened diarization turns.
+        default: Label for words no speaker holds (only without fill_gaps).
+
+    Returns:
+        list: Dicts with start, end, speaker, text and words per piece;
+            the first and last piece of a segment keep its start and end.
+    """
+    # Building millions of small acyclic dicts and lists would otherwise
+    # trigger repeated full collections over the whole transcript
+    with _gc_paused():
+        per_segment = [seg.get("words") or [{"word": seg["text"], "start": seg["start"],
+                                             "end": seg["end"]}] for seg in segments]
+        words = [word for seg_words in per_segment for word in seg_words]
+        if not words:
+            return []
+
+        starts = np.fromiter((word["start"] for word in words), dtype=np.float64,
+                             count=len(words))
+        ends = np.fromiter((word["end"] for word in words), dtype=np.float64, count=len(words))
+        owner = np.repeat(np.arange(len(segments)),
+                          [len(seg_words) for seg_words in per_segment])
+        codes = timeline.codes_at((starts + ends) / 2.0)
+        cut = np.flatnonzero((codes[1:] != codes[:-1]) | (owner[1:] != owner[:-1])) + 1
+        run_starts = np.concatenate(([0], cut)).tolist()
+        run_ends = np.concatenate((cut, [len(words)])).tolist()
+
+        labels = timeline.labels
+        texts = [word.get("word", "") for word in words]
+        owner_list = owner.tolist()
+        code_list = codes.tolist()
+        pieces = []
+        for a, b in zip(run_starts, run_ends):
+            seg = segments[owner_list[a]]
+            first_of_segment = a == 0 or owner_list[a - 1] != owner_list[a]
+            last_of_segment = b == len(words) or owner_list[b] != owner_list[a]
+            code = code_list[a]
+            run = words[a:b]
+            pieces.append({
+                "start": seg["start"] if first_of_segment else run[0]["start"],
+                "end": seg["end"] if last_of_segment else run[-1]["end"],
+                "speaker": labels[code] if code >= 0 else default,
+                "text": "".join(texts[a:b]).strip(),
+                "words": run,
+            })
+    return pieces
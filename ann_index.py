@@ -0,0 +1,487 @@
+#!/usr/bin/env python3
+"""
+ann_index.py: persistent inverted-file (IVF) index over speaker embeddings.
+
+The index is a directory next to the Train.py database:
+
+    meta.json        dimension, list count, highest indexed embedding id,
+                     and the id of the current build
+    <build>.centroids.npy    (nlist, dim) coarse k-means centroids
+    <build>.vectors.npy      (n, dim) L2-normalised vectors, grouped by list
+    <build>.ids.npy          (n,) embedding row id of each vector
+    <build>.speakers.npy     (n,) speaker id of each vector
+    <build>.offsets.npy      (nlist + 1,) start of every list in the arrays above
+    <build>.speaker_ids.npy  (s,) sorted ids of the enrolled speakers
+    <build>.speaker_sums.npy (s, dim) sum of each speaker's normalised vectors
+    <build>.delta.*          raw append-only files for rows added since the build
+    index.lock       held while the index is built or synced
+
+Everything is memory-mapped when opened, so loading costs a few page
+faults instead of decoding every row. A query scores the centroids,
+probes the `nprobe` closest lists and ranks only their vectors. Rows
+added after the build go to the delta files (assigned to their nearest
+list) and are merged by a rebuild once they grow past a fraction of
+the index. Writers (build, add, sync) hold a lock that serialises them
+across threads and processes. Readers need no lock: a rebuild writes a
+new set of files and publishes it by replacing meta.json last, so files
+another process has mapped are never truncated or rewritten; the old set
+is deleted once it is no longer current (or at a later rebuild, where
+open maps keep Windows from deleting it).
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import uuid
+from contextlib import contextmanager
+
+import numpy as np
+
+from embedding_store import decode_matrix
+from result_cache import lock_file, unlock_file
+
+META_FILE = "meta.json"
+DELTA_VECTORS = "delta.vectors.f32"
+DELTA_IDS = "delta.ids.i64"
+DELTA_SPEAKERS = "delta.speakers.i64"
+DELTA_LISTS = "delta.lists.i32"
+LOCK_FILE = "index.lock"
+ARRAYS = ("centroids", "vectors", "ids", "speakers", "offsets", "speaker_ids", "speaker_sums")
+DELTAS = (DELTA_VECTORS, DELTA_IDS, DELTA_SPEAKERS, DELTA_LISTS)
+
+_locks = {}
+_locks_guard = threading.Lock()
+
+
+@contextmanager
+def index_lock(path):
+    """
+    Hold the writer lock of the index at `path`: a re-entrant thread lock
+    within this process plus an exclusive lock on index.lock across
+    processes.
+    """
+    key = os.path.abspath(path)
+    with _locks_guard:
+        entry = _locks.setdefault(key, {"lock": threading.RLock(), "file": None, "depth": 0})
+    with entry["lock"]:
+        if entry["depth"] == 0:
+            os.makedirs(path, exist_ok=True)
+            entry["file"] = lock_file(os.path.join(path, LOCK_FILE))
+        entry["depth"] += 1
+        try:
+            yield
+        finally:
+            entry["depth"] -= 1
+            if entry["depth"] == 0:
+                unlock_file(entry["file"])
+                entry["file"] = None
+
+
+def _build_file(path, build, name):
+    """Path of one file of a build; indexes written before build ids used bare names."""
+    return os.path.join(path, f"{build}.{name}" if build else name)
+
+
+def _remove_stale_builds(path, build):
+    """Delete the files of every build but `build`, skipping any still mapped on Windows."""
+    current = f"{build}."
+    legacy = {name + ".npy" for name in ARRAYS} | set(DELTAS)
+    for name in os.listdir(path):
+        prefix = name.split(".", 1)[0]
+        stale = name in legacy or (len(prefix) == 32 and not name.startswith(current)
+                                   and all(c in "0123456789abcdef" for c in prefix))
+        if stale:
+            try:
+                os.remove(os.path.join(path, name))
+            except OSError:
+                pass
+
+
+def _read_meta(path):
+    with open(os.path.join(path, META_FILE), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _write_meta(path, meta):
+    tmp = os.path.join(path, META_FILE + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    os.replace(tmp, os.path.join(path, META_FILE))
+
+
+def _normalize_rows(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (matrix / norms).astype(np.float32, copy=False)
+
+
+def _top_k(scores, k):
+    """Indices of the k largest scores, best first."""
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    part = np.argpartition(-scores, k - 1)[:k]
+    return part[np.argsort(-scores[part], kind="stable")]
+
+
+def train_centroids(vectors, nlist, iterations=10, sample_size=None, seed=0):
+    """
+    Spherical k-means on (a sample of) normalised vectors.
+
+    Returns:
+        numpy.ndarray: (nlist, dim) normalised centroids.
+    """
+    rng = np.random.default_rng(seed)
+    n = len(vectors)
+    nlist = max(1, min(nlist, n))
+    sample_size = sample_size or min(n, 256 * nlist)
+    sample = vectors[np.sort(rng.choice(n, size=sample_size, replace=False))]
+    centroids = sample[rng.choice(len(sample), size=nlist, replace=False)].copy()
+    for _ in range(iterations):
+        assign = np.argmax(sample @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, sample)
+        empty = np.bincount(assign, minlength=nlist) == 0
+        # Re-seed empty lists with random sample points
+        sums[empty] = sample[rng.choice(len(sample), size=int(empty.sum()))]
+        centroids = _normalize_rows(sums)
+    return centroids
+
+
+def assign_lists(vectors, centroids, block=65536):
+    """Nearest-centroid list of every vector, computed in blocks."""
+    out = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), block):
+        out[start:start + block] = np.argmax(vectors[start:start + block] @ centroids.T, axis=1)
+    return out
+
+
+def read_embeddings(conn, after_id=0):
+    """Return (ids, speakers, vectors) for embedding rows with id > after_id."""
+    rows = conn.execute(
+        "SELECT id, speaker_id, vector FROM embeddings WHERE id > ? ORDER BY id",
+        (after_id,)).fetchall()
+    ids = np.array([r[0] for r in rows], dtype=np.int64)
+    speakers = np.array([r[1] for r in rows], dtype=np.int64)
+    vectors = decode_matrix([r[2] for r in rows])
+    return ids, speakers, vectors
+
+
+class IVFIndex:
+    """Memory-mapped IVF-Flat index with an append-only delta."""
+
+    def __init__(self, path, meta, centroids, vectors, ids, speakers, offsets,
+                 speaker_ids=None, speaker_sums=None):
+        self.path = path
+        self.meta = meta
+        self.centroids = centroids
+        self.vectors = vectors
+        self.ids = ids
+        self.speakers = speakers
+        self.offsets = offsets
+        if speaker_ids is None:
+            # Indexes built before the speaker table was stored
+            speaker_ids, speaker_sums = speaker_table(vectors, speakers)
+        self.speaker_ids = speaker_ids
+        self.speaker_sums = speaker_sums
+        self._delta_rows = -1
+        self._load_delta()
+
+    # --- building and opening ------------------------------------------
+
+    @classmethod
+    def build(cls, path, vectors, ids, speakers, nlist=None, iterations=10, seed=0,
+              max_id=None):
+        """
+        Build an index from scratch and write it to `path`.
+
+        Args:
+            path (str): Index directory (created or overwritten).
+            vectors (numpy.ndarray): (n, dim) embeddings.
+            ids (numpy.ndarray): Embedding row id of each vector.
+            speakers (numpy.ndarray): Speaker id of each vector.
+            nlist (int, optional): Number of lists; defaults to ~4*sqrt(n).
+        """
+        vectors = _normalize_rows(np.asarray(vectors, dtype=np.float32))
+        ids = np.asarray(ids, dtype=np.int64)
+        speakers = np.asarray(speakers, dtype=np.int64)
+        if not len(vectors):
+            raise ValueError("Cannot build an index without any embeddings")
+        nlist = nlist or max(1, int(4 * np.sqrt(len(vectors))))
+        centroids = train_centroids(vectors, nlist, iterations=iterations, seed=seed)
+        lists = assign_lists(vectors, centroids)
+        order = np.argsort(lists, kind="stable")
+        offsets = np.zeros(len(centroids) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(lists, minlength=len(centroids)), out=offsets[1:])
+        speaker_ids, speaker_sums = speaker_table(vectors, speakers)
+
+        build = uuid.uuid4().hex
+        with index_lock(path):
+            # A fresh set of files: nothing another process has mapped is touched
+            for name, array in zip(ARRAYS, (centroids, vectors[order], ids[order],
+                                            speakers[order], offsets, speaker_ids,
+                                            speaker_sums)):
+                tmp = _build_file(path, build, name + ".tmp.npy")
+                np.save(tmp, array)
+                os.replace(tmp, _build_file(path, build, name + ".npy"))
+            for name in DELTAS:
+                open(_build_file(path, build, name), "wb").close()
+            meta = {"dim": int(vectors.shape[1]), "nlist": int(len(centroids)),
+                    "count": int(len(vectors)),
+                    "max_id": int(max_id if max_id is not None else ids.max()),
+                    "build": build}
+            # Publishing meta.json last switches readers to the new build
+            _write_meta(path, meta)
+            _remove_stale_builds(path, build)
+            logging.info(f"Built speaker index with {len(vectors)} vectors "
+                         f"in {len(centroids)} lists")
+            return cls.open(path)
+
+    @classmethod
+    def build_from_db(cls, path, conn, nlist=None):
+        """Build an index from every row of a Train.py database."""
+        with index_lock(path):
+            ids, speakers, vectors = read_embeddings(conn)
+            return cls.build(path, vectors, ids, speakers, nlist=nlist)
+
+    @classmethod
+    def open(cls, path, attempts=5):
+        """Open an index with its arrays memory-mapped read-only."""
+        for attempt in range(attempts):
+            meta = _read_meta(path)
+            load = lambda name: np.load(_build_file(path, meta.get("build"), name + ".npy"),
+                                        mmap_mode="r")
+            try:
+                if os.path.isfile(_build_file(path, meta.get("build"), "speaker_ids.npy")):
+                    table = (np.asarray(load("speaker_ids")), load("speaker_sums"))
+                else:
+                    table = (None, None)
+                return cls(path, meta, np.asarray(load("centroids")), load("vectors"),
+                           load("ids"), load("speakers"), np.asarray(load("offsets")), *table)
+            except FileNotFoundError:
+                # Rebuilt (and the old files removed) between reading meta.json
+                # and mapping the arrays: read the new meta.json
+                if attempt == attempts - 1 or _read_meta(path).get("build") == meta.get("build"):
+                    raise
+
+    def _delta_file(self, name):
+        return _build_file(self.path, self.meta.get("build"), name)
+
+    def _load_delta(self):
+        """(Re)map the delta files if rows were appended since the last look."""
+        try:
+            size = os.path.getsize(self._delta_file(DELTA_IDS))
+        except FileNotFoundError:
+            # Superseded by a rebuild: nothing more is appended to this build,
+            # so the rows already mapped are all there is
+            if self._delta_rows >= 0:
+                return
+            raise
+        rows = size // 8
+        if rows == self._delta_rows:
+            return
+        self._delta_rows = rows
+        if rows == 0:
+            self.delta_vectors = np.empty((0, self.meta["dim"]), dtype=np.float32)
+            self.delta_ids = np.empty(0, dtype=np.int64)
+            self.delta_speakers = np.empty(0, dtype=np.int64)
+            self.delta_lists = np.empty(0, dtype=np.int32)
+            return
+        self.delta_vectors = np.memmap(self._delta_file(DELTA_VECTORS), dtype="<f4", mode="r",
+                                       shape=(rows, self.meta["dim"]))
+        self.delta_ids = np.memmap(self._delta_file(DELTA_IDS), dtype="<i8", mode="r",
+                                   shape=(rows,))
+        self.delta_speakers = np.memmap(self._delta_file(DELTA_SPEAKERS), dtype="<i8",
+                                        mode="r", shape=(rows,))
+        self.delta_lists = np.memmap(self._delta_file(DELTA_LISTS), dtype="<i4", mode="r",
+                                     shape=(rows,))
+
+    def __len__(self):
+        return len(self.vectors) + len(self.delta_ids)
+
+    # --- incremental updates ---------------------------------------------
+
+    def add(self, ids, vectors, speakers):
+        """Append rows to the delta files, each assigned to its nearest list."""
+        vectors = _normalize_rows(np.atleast_2d(np.asarray(vectors, dtype=np.float32)))
+        if not len(vectors):
+            return
+        lists = assign_lists(vectors, self.centroids)
+        with index_lock(self.path):
+            disk_meta = _read_meta(self.path)
+            if disk_meta.get("build") != self.meta.get("build"):
+                raise ValueError("The index was rebuilt since it was opened; "
+                                 "use sync() or open it again")
+            for name, array in ((DELTA_VECTORS, vectors.astype("<f4")),
+                                (DELTA_SPEAKERS, np.asarray(speakers, dtype="<i8")),
+                                (DELTA_LISTS, lists.astype("<i4")),
+                                # ids last: their length defines how many delta rows exist
+                                (DELTA_IDS, np.asarray(ids, dtype="<i8"))):
+                with open(self._delta_file(name), "ab") as f:
+                    f.write(array.tobytes())
+            # Another process may have moved max_id on since this copy read it
+            max_id = max(self.meta["max_id"], disk_meta["max_id"])
+            self.meta["max_id"] = max(max_id, int(np.max(ids)))
+            _write_meta(self.path, self.meta)
+        self._load_delta()
+
+    def _refresh(self):
+        """
+        Catch up with writes by other processes: the current index object,
+        reopened if the index was rebuilt since this copy was opened.
+        """
+        meta = _read_meta(self.path)
+        if meta.get("build") != self.meta.get("build"):
+            self.close()
+            return IVFIndex.open(self.path)
+        self.meta = meta
+        self._load_delta()
+        return self
+
+    def sync(self, conn, rebuild_fraction=0.25):
+        """
+        Bring the index up to date with the database.
+
+        New rows are appended to the delta; once the delta exceeds
+        rebuild_fraction of the built index, the index is rebuilt from the
+        database so lists stay balanced. Runs under the index lock, so
+        concurrent syncs never append the same rows twice. Returns the
+        up-to-date index (a new object after a rebuild, here or elsewhere).
+        """
+        with index_lock(self.path):
+            index = self._refresh()
+            ids, speakers, vectors = read_embeddings(conn, after_id=index.meta["max_id"])
+            if len(ids):
+                index.add(ids, vectors, speakers)
+            if len(index.delta_ids) > rebuild_fraction * max(len(index.vectors), 1):
+                logging.info("Speaker index delta is large; rebuilding")
+                index.close()
+                return IVFIndex.build_from_db(index.path, conn, nlist=None)
+            return index
+
+    def close(self):
+        """Drop the memory maps (needed before files can be replaced on Windows)."""
+        self.centroids = self.offsets = None
+        self.speaker_ids = self.speaker_sums = None
+        self.vectors = self.ids = self.speakers = None
+        self.delta_vectors = self.delta_ids = self.delta_speakers = self.delta_lists = None
+        self._delta_rows = -1
+
+    # --- search ------------------------------------------------------------
+
+    def search(self, queries, k=10, nprobe=8):
+        """
+        Approximate k-nearest-neighbour search by cosine similarity.
+
+        Args:
+            queries (numpy.ndarray): (q, dim) query embeddings.
+            k (int): Neighbours per query.
+            nprobe (int): Number of lists to scan per query.
+
+        Returns:
+            tuple: (scores, ids, speakers), each (q, k); missing neighbours
+                have score -inf and id/speaker -1.
+        """
+        self._load_delta()
+        queries = _normalize_rows(np.atleast_2d(np.asarray(queries, dtype=np.float32)))
+        nprobe = min(nprobe, len(self.centroids))
+        coarse = queries @ self.centroids.T
+        out_scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        out_ids = np.full((len(queries), k), -1, dtype=np.int64)
+        out_speakers = np.full((len(queries), k), -1, dtype=np.int64)
+
+        for qi, query in enumerate(queries):
+            probe = np.argpartition(-coarse[qi], nprobe - 1)[:nprobe]
+            rows = np.concatenate([np.arange(self.offsets[l], self.offsets[l + 1])
+                                   for l in probe])
+            scores = self.vectors[rows] @ query
+            ids = self.ids[rows]
+            speakers = self.speakers[rows]
+            if len(self.delta_ids):
+                in_probe = np.isin(self.delta_lists, probe)
+                scores = np.concatenate([scores, self.delta_vectors[in_probe] @ query])
+                ids = np.concatenate([ids, self.delta_ids[in_probe]])
+                speakers = np.concatenate([speakers, self.delta_speakers[in_probe]])
+            best = _top_k(scores, k)
+            out_scores[qi, :len(best)] = scores[best]
+            out_ids[qi, :len(best)] = ids[best]
+            out_speakers[qi, :len(best)] = speakers[best]
+        return out_scores, out_ids, out_speakers
+
+    def speaker_centroids(self, speakers):
+        """Normalised centroids of the given speaker ids, delta rows included."""
+        speakers = np.asarray(speakers, dtype=np.int64)
+        sums = np.zeros((len(speakers), self.meta["dim"]), dtype=np.float32)
+        if len(self.speaker_ids):
+            position = np.minimum(np.searchsorted(self.speaker_ids, speakers),
+                                  len(self.speaker_ids) - 1)
+            built = self.speaker_ids[position] == speakers
+            sums[built] = self.speaker_sums[position[built]]
+        if len(self.delta_ids):
+            rows = np.flatnonzero(np.isin(self.delta_speakers, speakers))
+            if len(rows):
+                owner = np.searchsorted(np.sort(speakers), self.delta_speakers[rows])
+                order = np.argsort(speakers)
+                np.add.at(sums, order[owner], self.delta_vectors[rows])
+        return _normalize_rows(sums)
+
+    def match(self, queries, threshold=0.5, k=10, nprobe=8):
+        """
+        Assign each query to an enrolled speaker: the k nearest neighbours
+        pick the candidate speakers, which are then scored by cosine
+        similarity to their centroids, as speaker_id.EnrolledSpeakers
+        does, so the threshold means the same in both.
+
+        Returns:
+            list: (speaker_id or None, similarity to that speaker's
+                centroid) per query.
+        """
+        queries = _normalize_rows(np.atleast_2d(np.asarray(queries, dtype=np.float32)))
+        _, _, speakers = self.search(queries, k=k, nprobe=nprobe)
+        candidates = np.unique(speakers[speakers >= 0])
+        if not len(candidates):
+            return [(None, 0.0)] * len(queries)
+        scores = queries @ self.speaker_centroids(candidates).T
+        results = []
+        for query_scores, row_speakers in zip(scores, speakers):
+            row = np.searchsorted(candidates, np.unique(row_speakers[row_speakers >= 0]))
+            if not len(row):
+                results.append((None, 0.0))
+                continue
+            best = row[np.argmax(query_scores[row])]
+            score = float(query_scores[best])
+            results.append((int(candidates[best]) if score >= threshold else None, score))
+        return results
+
+
+def speaker_table(vectors, speakers, block=65536):
+    """(sorted speaker ids, (s, dim) sums of their normalised vectors)."""
+    speakers = np.asarray(speakers, dtype=np.int64)
+    speaker_ids = np.unique(speakers)
+    sums = np.zeros((len(speaker_ids), vectors.shape[1]), dtype=np.float32)
+    for start in range(0, len(speakers), block):
+        owner = np.searchsorted(speaker_ids, speakers[start:start + block])
+        np.add.at(sums, owner, _normalize_rows(np.asarray(vectors[start:start + block],
+                                                          dtype=np.float32)))
+    return speaker_ids, sums
+
+
+def exact_search(vectors, queries, k=10):
+    """Brute-force cosine k-NN, for checking recall. Returns row indices (q, k)."""
+    vectors = _normalize_rows(np.asarray(vectors, dtype=np.float32))
+    queries = _normalize_rows(np.atleast_2d(np.asarray(queries, dtype=np.float32)))
+    return np.stack([_top_k(vectors @ q, k) for q in queries])
+
+
+def open_or_build(path, db_path):
+    """Open the index at `path`, building it from the database if missing, and sync it."""
+    conn = sqlite3.connect(db_path)
+    try:
+        with index_lock(path):
+            if os.path.isfile(os.path.join(path, META_FILE)):
+                return IVFIndex.open(path).sync(conn)
+            return IVFIndex.build_from_db(path, conn)
+    finally:
+        conn.close()
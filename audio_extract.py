@@ -1,7 +1,11 @@
 import subprocess
 import os
 import sys
-import shutil # Used for shutil.which to find ffmpeg in PATH
+import threading
+from collections import deque
+import numpy as np
+
+from media import find_tool, map_pcm_wav
 
 # Helper function to find resources when bundled by PyInstaller
 def resource_path(relative_path):
@@ -23,10 +27,9 @@ def resource_path(relative_path):
 # Function to locate the FFmpeg executable
 def find_ffmpeg_executable(ffmpeg_path_override=None):
     """
-    Finds the FFmpeg executable path in a specific order:
-    1. User-provided override path.
-    2. Bundled executable (in 'bin' folder relative to script/bundle).
-    3. System PATH.
+    Finds the FFmpeg executable path (see media.find_tool for the search
+    order: override, $FFMPEG_BINARY, bundled/application folders, PATH).
+    The result is cached, so repeated calls don't search again.
     
     Args:
         ffmpeg_path_override (str, optional): Path provided via command line or config.
@@ -34,32 +37,9 @@ def find_ffmpeg_executable(ffmpeg_path_override=None):
     Returns:
         str: The path to the found FFmpeg executable, or None if not found.
     """
-    # 1. Check override path from command line/config
-    if ffmpeg_path_override:
-        # Check if the override path actually exists and is a file
-        if os.path.isfile(ffmpeg_path_override):
-             print(f"Using FFmpeg from override path: {ffmpeg_path_override}")
-             return ffmpeg_path_override
-        else:
-             print(f"Warning: Override FFmpeg path specified but not found: {ffmpeg_path_override}")
-            
-    # 2. Check for bundled executable relative to script/bundle
-    # Determine expected executable name based on OS
-    ffmpeg_exe_name = 'ffmpeg.exe' if os.name == 'nt' else 'ffmpeg' 
-    # Construct path relative to the base path (script dir or _MEIPASS)
-    bundled_ffmpeg_path = resource_path(os.path.join('bin', ffmpeg_exe_name))
-    
-    if os.path.isfile(bundled_ffmpeg_path):
-        print(f"Using bundled FFmpeg: {bundled_ffmpeg_path}")
-        return bundled_ffmpeg_path
-            
-    # 3. Check system PATH using shutil.which (more robust than just checking PATH env var)
-    ffmpeg_in_path = shutil.which("ffmpeg")
-    if ffmpeg_in_path:
-        print(f"Using FFmpeg from system PATH: {ffmpeg_in_path}")
-        return ffmpeg_in_path
-
-    # 4. Not found anywhere
+    ffmpeg_exec = find_tool("ffmpeg", ffmpeg_path_override)
+    if ffmpeg_exec:
+        return ffmpeg_exec
     print("Error: FFmpeg executable not found.")
     print("Please ensure FFmpeg is installed and in your system PATH,")
     print("or specify its location using the --ffmpeg argument in the command line,")
@@ -92,6 +72,8 @@ def extract_audio(video_path, output_path, sample_rate=16000, ffmpeg_path_overri
     # Construct the command arguments list
     command = [
         ffmpeg_exec, 
+        "-hide_banner",
+        "-loglevel", "error",   # Keep stderr down to actual errors
         "-i", video_path,       # Input file
         "-vn",                  # Disable video recording
         "-acodec", "pcm_s16le", # Audio codec: PCM signed 16-bit little-endian (standard WAV)
@@ -104,14 +86,13 @@ def extract_audio(video_path, output_path, sample_rate=16000, ffmpeg_path_overri
     
     try:
         # Execute the FFmpeg command
-        result = subprocess.run(
+        subprocess.run(
             command, 
             check=True, # Raise CalledProcessError if FFmpeg returns a non-zero exit code
-            stdout=subprocess.PIPE, # Capture standard output
-            stderr=subprocess.PIPE, # Capture standard error
-            encoding='utf-8'        # Decode stdout/stderr as text
+            stdout=subprocess.DEVNULL, # FFmpeg writes nothing useful to stdout here
+            stderr=subprocess.PIPE, # Capture errors only (see -loglevel above)
+            encoding='utf-8'        # Decode stderr as text
         )
-        print(f"FFmpeg stdout:\n{result.stdout}") # Print FFmpeg output for info
         print(f"Audio extracted successfully to {output_path}")
         return output_path
         
@@ -130,6 +111,165 @@ def extract_audio(video_path, output_path, sample_rate=16000, ffmpeg_path_overri
         print(f"An unexpected error occurred during audio extraction: {e}")
         return None
 
+# Samples of a WAV that needs no decoding, trimmed like -ss/-t would
+def _mapped_samples(input_path, sample_rate, start=None, duration=None):
+    samples = map_pcm_wav(input_path, sample_rate)
+    if samples is None:
+        return None
+    first = int(round((start or 0) * sample_rate))
+    last = len(samples) if duration is None else first + int(round(duration * sample_rate))
+    return samples[first:last]
+
+# Drain a pipe in the background, keeping only the last lines
+def _drain_stderr(pipe, tail):
+    for line in iter(pipe.readline, b""):
+        tail.append(line.decode("utf-8", errors="replace").rstrip())
+    pipe.close()
+
+# Stream decoded PCM from FFmpeg's stdout without a temporary WAV file
+def iter_audio_chunks(input_path, sample_rate=16000, chunk_seconds=30.0,
+                      ffmpeg_path_override=None, start=None, duration=None):
+    """
+    Decode an audio or video file through a pipe, yielding mono float32 chunks.
+    
+    FFmpeg writes raw s16le samples to stdout, which are read in fixed-size
+    blocks and converted as they arrive; stderr is drained on a background
+    thread so neither pipe is ever buffered in full. Closing the generator
+    early stops FFmpeg.
+    
+    Args:
+        input_path (str): Path to input audio or video file.
+        sample_rate (int): Target sample rate. Defaults to 16000.
+        chunk_seconds (float): Length of each yielded chunk (the last may be shorter).
+        ffmpeg_path_override (str, optional): User-specified path to FFmpeg.
+        start (float, optional): Offset in seconds to start decoding from.
+        duration (float, optional): Maximum number of seconds to decode.
+        
+    Yields:
+        numpy.ndarray: 1-D float32 samples in [-1, 1).
+        
+    Raises:
+        FileNotFoundError: If FFmpeg cannot be located.
+        RuntimeError: If FFmpeg exits with an error.
+    """
+    samples = _mapped_samples(input_path, sample_rate, start, duration)
+    if samples is not None:
+        block = max(1, int(chunk_seconds * sample_rate))
+        for offset in range(0, len(samples), block):
+            chunk = samples[offset:offset + block].astype(np.float32)
+            chunk /= 32768.0
+            yield chunk
+        return
+    
+    ffmpeg_exec = find_ffmpeg_executable(ffmpeg_path_override)
+    if not ffmpeg_exec:
+        raise FileNotFoundError("FFmpeg executable could not be located. Cannot decode audio.")
+    
+    command = [ffmpeg_exec, "-nostdin", "-hide_banner", "-loglevel", "error"]
+    if start:
+        command += ["-ss", f"{start:.3f}"]
+    if duration is not None:
+        command += ["-t", f"{duration:.3f}"]
+    command += ["-i", input_path, "-vn", "-f", "s16le", "-acodec", "pcm_s16le",
+                "-ac", "1", "-ar", str(sample_rate), "-"]
+    
+    block_bytes = max(1, int(chunk_seconds * sample_rate)) * 2
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    stderr_tail = deque(maxlen=50)
+    drainer = threading.Thread(target=_drain_stderr, args=(process.stderr, stderr_tail),
+                               daemon=True)
+    drainer.start()
+    finished = False
+    try:
+        buffer = bytearray(block_bytes)
+        view = memoryview(buffer)
+        while True:
+            # Fill a whole block; pipes may return short reads
+            filled = 0
+            while filled < block_bytes:
+                n = process.stdout.readinto(view[filled:])
+                if not n:
+                    break
+                filled += n
+            usable = filled - filled % 2
+            if usable:
+                chunk = np.frombuffer(buffer, dtype=np.int16, count=usable // 2).astype(np.float32)
+                chunk /= 32768.0
+                yield chunk
+            if filled < block_bytes:
+                break
+        finished = True
+    finally:
+        if not finished and process.poll() is None:
+            process.kill()
+        process.stdout.close()
+        process.wait()
+        drainer.join(timeout=5)
+    if process.returncode != 0:
+        raise RuntimeError(f"FFmpeg failed to decode {input_path} (return code "
+                           f"{process.returncode}): " + "\n".join(stderr_tail))
+
+# Decode audio straight into memory for the transcription/diarization stages
+def load_audio(input_path, sample_rate=16000, ffmpeg_path_override=None,
+               start=None, duration=None):
+    """
+    Decode an audio or video file once into a mono float32 waveform.
+    
+    The same array can be passed to Whisper's model.transcribe and, wrapped
+    with torch.from_numpy (which shares memory), to a pyannote pipeline as
+    {"waveform": ..., "sample_rate": ...}, so the input is only demuxed and
+    resampled a single time.
+    
+    Args:
+        input_path (str): Path to input audio or video file.
+        sample_rate (int): Target sample rate. Defaults to 16000 (what both Whisper and pyannote expect).
+        ffmpeg_path_override (str, optional): User-specified path to FFmpeg.
+        start (float, optional): Offset in seconds to start decoding from.
+        duration (float, optional): Maximum number of seconds to decode.
+        
+    Returns:
+        numpy.ndarray: 1-D float32 samples in [-1, 1).
+        
+    Raises:
+        FileNotFoundError: If FFmpeg cannot be located.
+        RuntimeError: If FFmpeg fails to decode the input.
+    """
+    samples = _mapped_samples(input_path, sample_rate, start, duration)
+    if samples is not None:
+        # Already 16-bit mono PCM at the right rate: read the mapped samples
+        audio = samples.astype(np.float32)
+        audio /= 32768.0
+        return audio
+    
+    ffmpeg_exec = find_ffmpeg_executable(ffmpeg_path_override)
+    if not ffmpeg_exec:
+        raise FileNotFoundError("FFmpeg executable could not be located. Cannot decode audio.")
+    
+    command = [ffmpeg_exec, "-nostdin", "-hide_banner", "-loglevel", "error", "-threads", "0"]
+    if start:
+        command += ["-ss", f"{start:.3f}"]      # Seek before opening the input (fast seek)
+    if duration is not None:
+        command += ["-t", f"{duration:.3f}"]
+    command += [
+        "-i", input_path,       # Input file
+        "-vn",                  # Ignore any video streams
+        "-f", "s16le",          # Raw PCM signed 16-bit little-endian on stdout
+        "-acodec", "pcm_s16le",
+        "-ac", "1",             # Mono
+        "-ar", str(sample_rate),# Audio sample rate
+        "-"
+    ]
+    try:
+        result = subprocess.run(command, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(f"FFmpeg failed to decode {input_path}: "
+                           f"{e.stderr.decode('utf-8', errors='replace').strip()}") from e
+    
+    # One conversion copy, then scale in place
+    audio = np.frombuffer(result.stdout, dtype=np.int16).astype(np.float32)
+    audio /= 32768.0
+    return audio
+
 # Example usage block (optional, usually removed or commented out for bundled apps)
 # if __name__ == "__main__":
 #     print("Testing audio extraction...")
@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""
+batch.py: helpers for running the transcription pipeline over many files.
+
+Inputs may be given as a directory, a glob pattern or a manifest file
+(one media path per line, '#' comments allowed, relative paths resolved
+against the manifest's folder). Each input gets its own CSV in the output
+directory; outputs that already exist are treated as complete and skipped,
+since main.align_and_write only renames its output into place once
+the whole file has been written.
+
+Given each input's duration (from the probe cache), order_plan() puts
+the longest (or shortest) recordings first and run_batch() hands them to
+N workers as they become free. Longest-first keeps one long recording
+from starting last and leaving the other workers idle; shortest-first
+returns the most results early. Progress lines carry an ETA projected by
+replaying the same greedy schedule over the remaining files at the
+processing speed measured so far.
+"""
+
+import glob
+import heapq
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+SCHEDULE_ORDERS = ("longest", "shortest", "input")
+
+MEDIA_EXTENSIONS = {
+    ".wav", ".mp3", ".m4a", ".flac", ".ogg", ".opus", ".aac", ".wma",
+    ".mp4", ".mkv", ".mov", ".avi", ".webm", ".wmv", ".m4v",
+}
+
+
+def is_media_file(path):
+    return os.path.splitext(path)[1].lower() in MEDIA_EXTENSIONS
+
+
+def read_manifest(manifest_path):
+    """
+    Read a manifest of input paths.
+
+    Args:
+        manifest_path (str): Text file with one path per line.
+
+    Returns:
+        list: Absolute input paths in manifest order.
+    """
+    base_dir = os.path.dirname(os.path.abspath(manifest_path))
+    paths = []
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            if not os.path.isabs(line):
+                line = os.path.join(base_dir, line)
+            paths.append(os.path.normpath(line))
+    return paths
+
+
+def collect_inputs(spec):
+    """
+    Expand a directory, glob pattern or manifest file into input paths.
+
+    Args:
+        spec (str): Directory, glob pattern (``**`` allowed) or manifest path.
+
+    Returns:
+        list: Input file paths, sorted for directories and globs.
+    """
+    if os.path.isdir(spec):
+        return sorted(
+            os.path.join(spec, name) for name in os.listdir(spec)
+            if is_media_file(name) and os.path.isfile(os.path.join(spec, name))
+        )
+    if os.path.isfile(spec):
+        if is_media_file(spec):
+            return [spec]
+        return read_manifest(spec)
+    return sorted(p for p in glob.glob(spec, recursive=True)
+                  if os.path.isfile(p) and is_media_file(p))
+
+
+def output_path_for(input_path, output_dir, extension=".csv"):
+    stem = os.path.splitext(os.path.basename(input_path))[0]
+    return os.path.join(output_dir, stem + extension)
+
+
+def plan_outputs(inputs, output_dir, extension=".csv"):
+    """
+    Pair every input with its output path.
+
+    Raises:
+        ValueError: If two inputs would write to the same output file.
+    """
+    plan = []
+    seen = {}
+    for input_path in inputs:
+        output_path = output_path_for(input_path, output_dir, extension)
+        key = os.path.normcase(os.path.abspath(output_path))
+        if key in seen:
+            raise ValueError(f"{input_path} and {seen[key]} would both write {output_path}")
+        seen[key] = input_path
+        plan.append((input_path, output_path))
+    return plan
+
+
+def order_plan(plan, durations, order="longest"):
+    """
+    Sort a plan by input duration for scheduling.
+
+    Inputs whose duration is unknown (None) are counted as the mean known
+    duration, so they are neither all started first nor all left to last.
+
+    Args:
+        plan (list): (input_path, output_path) pairs.
+        durations (list): Seconds of audio per pair, or None where unknown.
+        order (str): 'longest' or 'shortest' first; 'input' keeps the plan order.
+
+    Returns:
+        tuple: (plan, durations) in the new order, with unknown durations filled in.
+    """
+    if order not in SCHEDULE_ORDERS:
+        raise ValueError(f"Unknown schedule order: {order}")
+    known = [d for d in durations if d is not None]
+    fallback = sum(known) / len(known) if known else 0.0
+    durations = [fallback if d is None else d for d in durations]
+    indices = list(range(len(plan)))
+    if order != "input":
+        # Stable, so equal durations keep their plan order
+        indices.sort(key=lambda i: durations[i], reverse=order == "longest")
+    return [plan[i] for i in indices], [durations[i] for i in indices]
+
+
+def projected_makespan(durations, workers, busy=()):
+    """
+    Finish time of greedy list scheduling: each job in turn goes to the
+    worker that is free first (with longest-first order this is the LPT
+    rule, within 4/3 of the optimal makespan).
+
+    Args:
+        durations (list): Job lengths in the order they will be started.
+        workers (int): Number of workers.
+        busy (iterable): Time each already busy worker still needs.
+
+    Returns:
+        float: When the last worker finishes, in the units of durations.
+    """
+    free_at = list(busy)[:workers]
+    free_at += [0.0] * (workers - len(free_at))
+    heapq.heapify(free_at)
+    for duration in durations:
+        heapq.heappush(free_at, heapq.heappop(free_at) + duration)
+    return max(free_at) if free_at else 0.0
+
+
+def format_seconds(seconds):
+    seconds = int(round(seconds))
+    if seconds >= 3600:
+        return f"{seconds // 3600}h{seconds % 3600 // 60:02d}m"
+    if seconds >= 60:
+        return f"{seconds // 60}m{seconds % 60:02d}s"
+    return f"{seconds}s"
+
+
+class _Progress:
+    """Shared state of a run: what is queued and running, and the speed so far."""
+
+    def __init__(self, pending, durations, workers):
+        self.pending = deque(pending)
+        self.durations = durations
+        self.workers = workers
+        self.running = {}
+        self.audio_done = 0.0
+        self.seconds_done = 0.0
+        self.lock = threading.Lock()
+
+    def eta(self):
+        """Projected seconds until the batch finishes, or None before any speed is known."""
+        if not self.audio_done:
+            return None
+        speed = self.seconds_done / self.audio_done
+        now = time.perf_counter()
+        busy = [max(0.0, self.durations[i] * speed - (now - started))
+                for i, started in self.running.items()]
+        return projected_makespan([self.durations[i] * speed for i in self.pending],
+                                  self.workers, busy)
+
+    def status(self):
+        eta = self.eta()
+        line = f"{len(self.running)} running, {len(self.pending)} queued"
+        if eta is not None:
+            finish = time.strftime("%H:%M", time.localtime(time.time() + eta))
+            line += f", ETA {finish} (in {format_seconds(eta)})"
+        return line
+
+
+def run_batch(plan, process, overwrite=False, workers=1, durations=None):
+    """
+    Run process(input_path, output_path) for every planned file.
+
+    Files are started in plan order, on up to `workers` threads calling
+    process concurrently (it must be thread-safe then, e.g.
+    workers.WorkerPool.process). Failures are logged and recorded but do
+    not stop the batch.
+
+    Args:
+        plan (list): (input_path, output_path) pairs from plan_outputs(),
+            usually ordered by order_plan().
+        process (callable): Processes one file and writes its output.
+        overwrite (bool): Re-process inputs whose output already exists.
+        workers (int): Files processed at the same time.
+        durations (list, optional): Seconds of audio per planned file; used
+            for the projected makespan and ETA.
+
+    Returns:
+        list: One result dict per input, in plan order, with keys input,
+            output, status ('ok', 'skipped' or 'failed'), seconds,
+            audio_seconds and error.
+    """
+    durations = list(durations) if durations is not None else [None] * len(plan)
+    results = []
+    pending = []
+    for n, (input_path, output_path) in enumerate(plan, 1):
+        result = {"input": input_path, "output": output_path, "status": "ok",
+                  "seconds": 0.0, "audio_seconds": None, "error": None}
+        if not os.path.isfile(input_path):
+            result.update(status="failed", error="input file not found")
+            logging.error(f"[{n}/{len(plan)}] Input file not found: {input_path}")
+        elif not overwrite and os.path.isfile(output_path):
+            result["status"] = "skipped"
+            logging.info(f"[{n}/{len(plan)}] Skipping {input_path}: {output_path} already exists")
+        else:
+            result["audio_seconds"] = durations[n - 1]
+            pending.append(n - 1)
+        results.append(result)
+
+    workers = max(1, min(workers, len(pending)))
+    known = [durations[i] for i in pending if durations[i] is not None]
+    if known and len(known) == len(pending):
+        makespan = projected_makespan([durations[i] for i in pending], workers)
+        total = sum(known)
+        logging.info(f"Scheduled {len(pending)} file(s), {format_seconds(total)} of audio, "
+                     f"on {workers} worker(s): the busiest worker gets "
+                     f"{format_seconds(makespan)} of audio "
+                     f"(even split: {format_seconds(total / workers)})")
+    progress = _Progress(pending, [d or 0.0 for d in durations], workers)
+
+    def work():
+        while True:
+            with progress.lock:
+                if not progress.pending:
+                    return
+                i = progress.pending.popleft()
+                progress.running[i] = start = time.perf_counter()
+            input_path, output_path = plan[i]
+            tag = f"[{i + 1}/{len(plan)}]"
+            length = f" ({format_seconds(durations[i])} of audio)" if durations[i] else ""
+            logging.info(f"{tag} Processing {input_path}{length}")
+            result = results[i]
+            try:
+                process(input_path, output_path)
+            except Exception as e:
+                result.update(status="failed", error=str(e))
+                logging.error(f"{tag} Failed on {input_path}: {e}")
+            seconds = time.perf_counter() - start
+            result["seconds"] = round(seconds, 3)
+            with progress.lock:
+                del progress.running[i]
+                if result["status"] == "ok" and durations[i]:
+                    progress.audio_done += durations[i]
+                    progress.seconds_done += seconds
+                status = progress.status()
+            logging.info(f"{tag} {'Finished' if result['status'] == 'ok' else 'Gave up on'} "
+                         f"{os.path.basename(input_path)} in {format_seconds(seconds)}; {status}")
+
+    if workers == 1:
+        work()
+    else:
+        threads = [threading.Thread(target=work, name=f"batch-{n}", daemon=True)
+                   for n in range(workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    return results
+
+
+def report_summary(results, summary_path=None):
+    """
+    Log a per-file summary and optionally write it as JSON.
+
+    Returns:
+        int: Number of failed inputs.
+    """
+    counts = {"ok": 0, "skipped": 0, "failed": 0}
+    for result in results:
+        counts[result["status"]] += 1
+    logging.info(f"Batch summary: {counts['ok']} processed, "
+                 f"{counts['skipped']} skipped, {counts['failed']} failed "
+                 f"({len(results)} total)")
+    for result in results:
+        line = f"  {result['status']:<8} {result['seconds']:>9.1f}s  {result['input']}"
+        if result["error"]:
+            line += f"  ({result['error']})"
+        logging.info(line)
+
+    if summary_path:
+        os.makedirs(os.path.dirname(os.path.abspath(summary_path)), exist_ok=True)
+        with open(summary_path, "w", encoding="utf-8") as f:
+            json.dump({"counts": counts, "files": results}, f, indent=2)
+        logging.info(f"Batch summary written to {summary_path}")
+    return counts["failed"]
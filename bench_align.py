@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+bench_align.py: benchmark the TurnIndex aligner against the old linear scans.
+
+Generates a synthetic meeting (back-to-back Whisper segments, overlapping
+diarization turns), times the midpoint and dominant-overlap strategies at
+10^5-10^6 segments, and checks a sample of results against the original
+per-segment loops from main.py and align.py.
+
+With --words N, also times word-level attribution (SpeakerTimeline and
+split_by_speaker) with N words per segment, checking word speakers
+against TurnIndex.
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from aligner import SpeakerTimeline, TurnIndex, split_by_speaker
+
+
+def legacy_midpoint(start, end, turns):
+    midpoint = (start + end) / 2.0
+    for turn_start, turn_end, speaker in turns:
+        if turn_start <= midpoint <= turn_end:
+            return speaker
+    return "unknown"
+
+
+def legacy_dominant(start_time, end_time, speaker_segments):
+    speakers = {}
+    for segment in speaker_segments:
+        overlap_start = max(start_time, segment["start"])
+        overlap_end = min(end_time, segment["end"])
+        if overlap_end > overlap_start:
+            duration = overlap_end - overlap_start
+            speakers[segment["speaker"]] = speakers.get(segment["speaker"], 0) + duration
+    if speakers:
+        return max(speakers, key=speakers.get)
+    return "Unknown"
+
+
+def make_meeting(n_segments, n_speakers=8, seed=0):
+    """Return (segment starts, segment ends, turns) for a synthetic meeting."""
+    rng = np.random.default_rng(seed)
+    seg_len = rng.uniform(1.0, 8.0, n_segments)
+    seg_ends = np.cumsum(seg_len)
+    seg_starts = seg_ends - seg_len
+
+    # Roughly one turn per two segments, with gaps and crosstalk
+    n_turns = max(1, n_segments // 2)
+    total = seg_ends[-1]
+    turn_starts = np.sort(rng.uniform(0.0, total, n_turns))
+    turn_ends = turn_starts + rng.uniform(0.5, 20.0, n_turns)
+    labels = [f"SPEAKER_{i:02d}" for i in range(n_speakers)]
+    speaker_ids = rng.integers(0, n_speakers, n_turns)
+    turns = [(float(s), float(e), labels[k])
+             for s, e, k in zip(turn_starts, turn_ends, speaker_ids)]
+    return seg_starts, seg_ends, turns
+
+
+def make_word_segments(seg_starts, seg_ends, words_per_segment):
+    """Whisper-style segments with evenly spaced word timestamps."""
+    segments = []
+    for start, end in zip(seg_starts.tolist(), seg_ends.tolist()):
+        step = (end - start) / words_per_segment
+        words = [{"word": f" w{k}", "start": start + k * step, "end": start + (k + 1) * step}
+                 for k in range(words_per_segment)]
+        segments.append({"start": start, "end": end, "text": "", "words": words})
+    return segments
+
+
+def run_words(n_segments, words_per_segment, verify):
+    seg_starts, seg_ends, turns = make_meeting(n_segments)
+    segments = make_word_segments(seg_starts, seg_ends, words_per_segment)
+    n_words = n_segments * words_per_segment
+
+    t0 = time.perf_counter()
+    timeline = SpeakerTimeline(turns)
+    t_build = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    pieces = split_by_speaker(segments, timeline)
+    t_split = time.perf_counter() - t0
+
+    print(f"words={n_words:>9} turns={len(turns):>8} timeline={t_build:.3f}s "
+          f"split={t_split:.3f}s ({t_split / n_words * 1e9:.0f} ns/word) "
+          f"rows={len(pieces)} (from {n_segments} segments)")
+
+    if verify:
+        rng = np.random.default_rng(1)
+        sample = rng.choice(n_segments, size=min(verify, n_segments), replace=False)
+        mids = np.array([(w["start"] + w["end"]) / 2.0
+                         for i in sample for w in segments[i]["words"]])
+        exact = SpeakerTimeline(turns, fill_gaps=False).speakers_at(mids)
+        assert exact == TurnIndex(turns).speakers_at(mids)
+        print(f"  verified {len(mids)} word speakers against TurnIndex")
+
+
+def run(n_segments, verify):
+    seg_starts, seg_ends, turns = make_meeting(n_segments)
+
+    t0 = time.perf_counter()
+    index = TurnIndex(turns)
+    t_build = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    midpoint = index.midpoint_speakers(seg_starts, seg_ends)
+    t_mid = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    dominant = index.dominant_speakers(seg_starts, seg_ends)
+    t_dom = time.perf_counter() - t0
+
+    print(f"segments={n_segments:>8} turns={len(turns):>8} "
+          f"build={t_build:.3f}s midpoint={t_mid:.3f}s dominant={t_dom:.3f}s")
+
+    if verify:
+        rng = np.random.default_rng(1)
+        sample = rng.choice(n_segments, size=min(verify, n_segments), replace=False)
+        dict_turns = [{"start": s, "end": e, "speaker": k} for s, e, k in turns]
+        t0 = time.perf_counter()
+        for i in sample:
+            s, e = float(seg_starts[i]), float(seg_ends[i])
+            assert midpoint[i] == legacy_midpoint(s, e, turns), i
+            assert dominant[i] == legacy_dominant(s, e, dict_turns), i
+        per_seg = (time.perf_counter() - t0) / len(sample)
+        print(f"  verified {len(sample)} segments against legacy loops; "
+              f"legacy cost ~{per_seg * n_segments:.0f}s for the full run")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100_000, 1_000_000],
+                        help="Segment counts to benchmark")
+    parser.add_argument("--verify", type=int, default=200,
+                        help="Number of sampled segments to check against the legacy loops (0 to skip)")
+    parser.add_argument("--words", type=int, default=0,
+                        help="Also benchmark word-level attribution with this many words per segment")
+    args = parser.parse_args()
+    for n in args.sizes:
+        run(n, args.verify)
+        if args.words:
+            run_words(n, args.words, args.verify)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+bench_ann.py: recall and latency of the IVF speaker index against exact search.
+
+Generates clustered synthetic embeddings (one cluster per fake speaker),
+builds an index in a temporary directory, then reports build and open
+times, and per-query latency and recall@k for several nprobe settings
+next to brute-force search over the same vectors.
+"""
+
+import argparse
+import tempfile
+import time
+
+import numpy as np
+
+from ann_index import IVFIndex, exact_search
+
+
+def make_library(n_vectors, n_speakers, dim, seed=0):
+    rng = np.random.default_rng(seed)
+    centres = rng.normal(size=(n_speakers, dim)).astype(np.float32)
+    speakers = rng.integers(0, n_speakers, n_vectors)
+    vectors = centres[speakers] + rng.normal(scale=0.6, size=(n_vectors, dim)).astype(np.float32)
+    queries = centres[rng.integers(0, n_speakers, 200)] \
+        + rng.normal(scale=0.6, size=(200, dim)).astype(np.float32)
+    return vectors, speakers, queries
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--vectors", type=int, default=200_000)
+    parser.add_argument("--speakers", type=int, default=2_000)
+    parser.add_argument("--dim", type=int, default=192)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 8, 16, 32])
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    vectors, speakers, queries = make_library(args.vectors, args.speakers, args.dim)
+    queries = queries[:args.queries]
+    ids = np.arange(1, len(vectors) + 1)
+
+    with tempfile.TemporaryDirectory() as path:
+        t0 = time.perf_counter()
+        IVFIndex.build(path, vectors, ids, speakers).close()
+        print(f"build: {time.perf_counter() - t0:.2f}s for {len(vectors)} x {args.dim}")
+
+        t0 = time.perf_counter()
+        index = IVFIndex.open(path)
+        print(f"open (mmap): {(time.perf_counter() - t0) * 1000:.1f} ms, "
+              f"{index.meta['nlist']} lists")
+
+        t0 = time.perf_counter()
+        truth = exact_search(vectors, queries, args.k)
+        exact_ms = (time.perf_counter() - t0) * 1000 / len(queries)
+        print(f"exact: {exact_ms:.2f} ms/query")
+        truth_ids = ids[truth]
+
+        for nprobe in args.nprobe:
+            index.search(queries[:5], k=args.k, nprobe=nprobe)  # warm the page cache
+            t0 = time.perf_counter()
+            _, found, _ = index.search(queries, k=args.k, nprobe=nprobe)
+            ms = (time.perf_counter() - t0) * 1000 / len(queries)
+            recall = np.mean([len(set(f) & set(t)) / args.k
+                              for f, t in zip(found.tolist(), truth_ids.tolist())])
+            print(f"nprobe={nprobe:>3}: {ms:.2f} ms/query, recall@{args.k}={recall:.3f}, "
+                  f"speedup x{exact_ms / ms:.1f}")
+        index.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,457 @@
+#!/usr/bin/env python3
+"""
+bench_pipeline.py: end-to-end throughput benchmark of the pipeline stages.
+
+Generates synthetic multi-speaker meetings (alternating tones with a
+syllable-rate envelope and short pauses, written like Train.py's
+make_sine_wav) and runs each stage on them:
+
+    extract     audio_extract.extract_audio
+    transcribe  main.transcribe_audio
+    diarize     diarize.diarize_audio
+    align       main.align_and_write
+    train       Train.train
+
+Every stage runs in a fresh process so its peak RSS is its own. Per
+stage the report holds model load time, wall and CPU time, real-time
+factor (wall / audio seconds) and peak RSS as JSON; --compare checks a
+run against an earlier report.
+
+With --stub-models, Whisper, the pyannote pipeline and the speaker
+embedding model are replaced by cheap, deterministic offline stand-ins
+that work on the real audio, so the harness runs without model weights,
+a GPU or a Hugging Face token and its numbers only move when the code
+around the models does. FFmpeg is always the real one.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import types
+import wave
+
+import numpy as np
+
+SAMPLE_RATE = 16000
+STAGES = ["extract", "transcribe", "diarize", "align", "train"]
+
+
+# --- synthetic audio ---------------------------------------------------------
+
+def speaker_tone(speaker, n_samples, offset=0, rate=SAMPLE_RATE):
+    """A voiced-sounding tone for one speaker: fundamental plus two harmonics."""
+    f0 = 140.0 + 60.0 * speaker
+    t = (offset + np.arange(n_samples)) / rate
+    tone = (np.sin(2 * np.pi * f0 * t)
+            + 0.5 * np.sin(4 * np.pi * f0 * t)
+            + 0.25 * np.sin(6 * np.pi * f0 * t))
+    # ~4 Hz syllable envelope
+    envelope = 0.55 + 0.45 * np.sin(2 * np.pi * 4.0 * t) ** 2
+    return 0.4 * tone * envelope
+
+
+def make_meeting_wav(path, duration=60.0, n_speakers=3, rate=SAMPLE_RATE, seed=0):
+    """
+    Write a synthetic meeting of back-to-back speaker turns to a 16-bit mono
+    WAV, one turn at a time so long meetings never sit in memory.
+
+    Returns:
+        list: Ground-truth (start, end, speaker label) turns.
+    """
+    rng = np.random.default_rng(seed)
+    total = int(duration * rate)
+    turns = []
+    written = 0
+    speaker = 0
+    with wave.open(path, "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(rate)
+        while written < total:
+            gap = min(int(rng.uniform(0.2, 1.0) * rate), total - written)
+            noise = rng.normal(0.0, 0.003, gap)
+            wf.writeframes((noise * 32767).astype(np.int16).tobytes())
+            written += gap
+            length = min(int(rng.uniform(1.5, 8.0) * rate), total - written)
+            if length <= 0:
+                break
+            samples = speaker_tone(speaker, length, written, rate) + rng.normal(0.0, 0.003, length)
+            wf.writeframes((np.clip(samples, -1, 1) * 32767).astype(np.int16).tobytes())
+            turns.append((written / rate, (written + length) / rate, f"SPEAKER_{speaker:02d}"))
+            written += length
+            speaker = (speaker + int(rng.integers(1, n_speakers))) % n_speakers if n_speakers > 1 else 0
+    return turns
+
+
+def make_speaker_wavs(directory, duration=60.0, n_speakers=3, rate=SAMPLE_RATE):
+    """Write one enrolment WAV per speaker, duration seconds in total."""
+    paths = []
+    length = int(duration / n_speakers * rate)
+    for speaker in range(n_speakers):
+        path = os.path.join(directory, f"speaker_{speaker}.wav")
+        samples = speaker_tone(speaker, length, rate=rate)
+        with wave.open(path, "wb") as wf:
+            wf.setnchannels(1)
+            wf.setsampwidth(2)
+            wf.setframerate(rate)
+            wf.writeframes((samples * 32767).astype(np.int16).tobytes())
+        paths.append((f"Speaker {speaker}", path))
+    return paths
+
+
+def make_segments(turns, duration, seed=0):
+    """Whisper-like segments (2-6 s, back to back) over the meeting."""
+    rng = np.random.default_rng(seed)
+    lengths = rng.uniform(2.0, 6.0, int(duration / 2.0) + 1)
+    ends = np.cumsum(lengths)
+    ends = ends[ends <= duration]
+    starts = np.concatenate([[0.0], ends[:-1]])
+    return [{"id": i, "start": float(s), "end": float(e), "text": f" segment {i}"}
+            for i, (s, e) in enumerate(zip(starts, ends))]
+
+
+def read_wav(path):
+    with wave.open(path, "rb") as wf:
+        data = wf.readframes(wf.getnframes())
+    return np.frombuffer(data, dtype=np.int16).astype(np.float32) / 32768.0
+
+
+# --- offline stand-ins ---------------------------------------------------------
+
+def _as_array(audio):
+    if isinstance(audio, str):
+        return read_wav(audio)
+    return np.asarray(audio, dtype=np.float32).reshape(-1)
+
+
+def _frames(audio, frame):
+    n = len(audio) // frame
+    return audio[:n * frame].reshape(n, frame)
+
+
+class StandInWhisper:
+    """Segments at voiced runs of frame energy, one placeholder word per 0.4 s."""
+
+    def transcribe(self, audio, **options):
+        audio = _as_array(audio)
+        frame = int(0.03 * SAMPLE_RATE)
+        frames = _frames(audio, frame)
+        energy = np.einsum("ij,ij->i", frames, frames) / frame
+        voiced = energy > 1e-3
+        edges = np.flatnonzero(np.diff(np.concatenate([[0], voiced.astype(np.int8), [0]])))
+        segments = []
+        for lo, hi in zip(edges[::2], edges[1::2]):
+            start, end = lo * 0.03, hi * 0.03
+            if end - start < 0.3:
+                continue
+            words = " ".join(["word"] * max(1, int((end - start) / 0.4)))
+            segments.append({"id": len(segments), "start": start, "end": end, "text": " " + words})
+        return {"text": "", "segments": segments, "language": "en"}
+
+
+class _Segment:
+    def __init__(self, start, end):
+        self.start = start
+        self.end = end
+
+
+class StandInAnnotation:
+    def __init__(self, turns):
+        self.turns = turns
+
+    def itertracks(self, yield_label=False):
+        for i, (start, end, label) in enumerate(self.turns):
+            yield (_Segment(start, end), i, label) if yield_label else (_Segment(start, end), i)
+
+
+class StandInPipeline:
+    """Labels 0.25 s frames by dominant frequency and merges runs into turns."""
+
+    def to(self, device):
+        return self
+
+    def __call__(self, file):
+        if "waveform" in file:
+            audio = _as_array(file["waveform"])
+        else:
+            audio = read_wav(file["audio"])
+        hop = int(0.25 * SAMPLE_RATE)
+        frames = _frames(audio, hop)
+        spectrum = np.abs(np.fft.rfft(frames * np.hanning(hop), axis=1))
+        peak = np.argmax(spectrum, axis=1) * SAMPLE_RATE / hop
+        energy = np.einsum("ij,ij->i", frames, frames) / hop
+        labels = {}
+        turns = []
+        for i, (freq, e) in enumerate(zip(np.round(peak / 20.0).tolist(), energy.tolist())):
+            if e < 1e-3:
+                continue
+            label = labels.setdefault(freq, f"SPEAKER_{len(labels):02d}")
+            start, end = i * 0.25, (i + 1) * 0.25
+            if turns and turns[-1][2] == label and turns[-1][1] == start:
+                turns[-1] = (turns[-1][0], end, label)
+            else:
+                turns.append((start, end, label))
+        return StandInAnnotation(turns)
+
+
+class StandInEmbedding:
+    """Spectral band energies of each waveform as a unit-length vector."""
+
+    dimension = 192
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def __call__(self, waveforms):
+        batch = np.asarray(waveforms, dtype=np.float32).reshape(len(waveforms), -1)
+        spectrum = np.abs(np.fft.rfft(batch, axis=1))
+        bands = np.linspace(0, spectrum.shape[1], self.dimension, endpoint=False).astype(np.int64)
+        vectors = np.add.reduceat(spectrum, bands, axis=1)
+        return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+
+def install_stand_ins():
+    """Make `import whisper` and `from pyannote.audio import ...` resolve to the stand-ins."""
+    whisper = types.ModuleType("whisper")
+    whisper.available_models = lambda: ["tiny", "base", "small", "medium", "large"]
+    whisper.load_model = lambda name, device=None, **kwargs: StandInWhisper()
+    audio = types.ModuleType("pyannote.audio")
+    audio.Pipeline = types.SimpleNamespace(
+        from_pretrained=lambda checkpoint, **kwargs: StandInPipeline())
+    audio.PretrainedSpeakerEmbedding = StandInEmbedding
+    pyannote = sys.modules.get("pyannote") or types.ModuleType("pyannote")
+    pyannote.audio = audio
+    sys.modules.update({"whisper": whisper, "pyannote": pyannote, "pyannote.audio": audio})
+
+
+# --- measurement -------------------------------------------------------------
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MiB, or None if unavailable."""
+    try:
+        import resource
+    except ImportError:
+        try:
+            import psutil
+        except ImportError:
+            return None
+        return psutil.Process().memory_info().peak_wset / 2**20
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and KiB elsewhere
+    return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+
+def cpu_seconds():
+    """CPU time of this process and its finished children (e.g. ffmpeg)."""
+    total = time.process_time()
+    try:
+        import resource
+    except ImportError:
+        return total
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return total + children.ru_utime + children.ru_stime
+
+
+def _load_stage(stage, spec):
+    """Return (callable running the stage, audio seconds it processes)."""
+    workdir = spec["workdir"]
+    if stage == "extract":
+        from audio_extract import extract_audio
+        out = os.path.join(workdir, "extracted.wav")
+        return lambda: extract_audio(spec["meeting"], out), spec["duration"]
+    if stage == "transcribe":
+        import whisper
+        import main
+        model = whisper.load_model(spec["whisper_model"], device=spec["device"])
+        return lambda: main.transcribe_audio(model, spec["meeting"]), spec["duration"]
+    if stage == "diarize":
+        from diarize import diarize_audio, load_pipeline
+        device = None if spec["stub_models"] else spec["device"]
+        pipeline = load_pipeline(spec["token"], spec["pipeline"], device=device)
+        return (lambda: diarize_audio(spec["meeting"], spec["token"], pipeline=pipeline),
+                spec["duration"])
+    if stage == "align":
+        import main
+        segments = make_segments(spec["turns"], spec["duration"])
+        out = os.path.join(workdir, "aligned.csv")
+        return lambda: main.align_and_write(segments, spec["turns"], out), spec["duration"]
+    if stage == "train":
+        import Train
+        db_path = os.path.join(workdir, f"speakers-{os.getpid()}.db")
+        args = argparse.Namespace(
+            speaker=[list(pair) for pair in spec["speakers"]], db_path=db_path,
+            chunk_duration=3.0, embedding_model=spec["embedding_model"], batch_size=32,
+            commit_chunks=256, device=spec["device"], ann_index=None)
+        return lambda: Train.train(args), spec["duration"]
+    raise ValueError(f"Unknown stage: {stage}")
+
+
+def run_stage(stage, spec):
+    """Run one stage in the current process and return its measurements."""
+    if spec["stub_models"]:
+        install_stand_ins()
+    t0 = time.perf_counter()
+    run, audio_seconds = _load_stage(stage, spec)
+    load_seconds = time.perf_counter() - t0
+
+    cpu0 = cpu_seconds()
+    t0 = time.perf_counter()
+    run()
+    wall = time.perf_counter() - t0
+    return {
+        "load_seconds": load_seconds,
+        "wall_seconds": wall,
+        "cpu_seconds": cpu_seconds() - cpu0,
+        "rtf": wall / audio_seconds,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def measure(stage, spec, repeat):
+    """Run a stage `repeat` times, each in a fresh process, and summarise."""
+    runs = []
+    ctx = multiprocessing.get_context("spawn")
+    for _ in range(repeat):
+        with ctx.Pool(1) as pool:
+            runs.append(pool.apply(run_stage, (stage, spec)))
+    rss = [r["peak_rss_mb"] for r in runs if r["peak_rss_mb"] is not None]
+    return {
+        "stage": stage,
+        "audio_seconds": spec["duration"],
+        "load_seconds": statistics.median(r["load_seconds"] for r in runs),
+        "wall_seconds": statistics.median(r["wall_seconds"] for r in runs),
+        "cpu_seconds": statistics.median(r["cpu_seconds"] for r in runs),
+        "rtf": statistics.median(r["rtf"] for r in runs),
+        "peak_rss_mb": max(rss) if rss else None,
+        "runs": runs,
+    }
+
+
+def environment(args):
+    import subprocess
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                                text=True, cwd=os.path.dirname(os.path.abspath(__file__))
+                                ).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "stub_models": args.stub_models,
+        "whisper_model": args.whisper_model,
+        "device": args.device,
+        "speakers": args.speakers,
+        "repeat": args.repeat,
+    }
+
+
+def compare(results, baseline_path, tolerance):
+    """Print per-stage ratios against a baseline report; return the regression count."""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = {(r["stage"], r["audio_seconds"]): r for r in json.load(f)["results"]}
+    regressions = 0
+    for result in results:
+        old = baseline.get((result["stage"], result["audio_seconds"]))
+        if old is None or "rtf" not in old or "rtf" not in result:
+            continue
+        ratio = result["rtf"] / old["rtf"] if old["rtf"] else float("inf")
+        flag = ""
+        if ratio > 1.0 + tolerance:
+            regressions += 1
+            flag = "  REGRESSION"
+        rss = ""
+        if result.get("peak_rss_mb") and old.get("peak_rss_mb"):
+            rss = f" rss x{result['peak_rss_mb'] / old['peak_rss_mb']:.2f}"
+        print(f"{result['stage']:>10} {result['audio_seconds']:>7.0f}s "
+              f"rtf {old['rtf']:.4f} -> {result['rtf']:.4f} (x{ratio:.2f}){rss}{flag}",
+              file=sys.stderr)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--durations", type=float, nargs="+", default=[60.0],
+                        help="Synthetic meeting lengths in seconds")
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=STAGES,
+                        help="Stages to run")
+    parser.add_argument("--speakers", type=int, default=3, help="Speakers per meeting")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="Runs per stage (fresh process each); medians are reported")
+    parser.add_argument("--stub-models", action="store_true",
+                        help="Use deterministic offline stand-ins instead of the real models")
+    parser.add_argument("--whisper-model", default="base", help="Whisper model for transcribe")
+    parser.add_argument("--pipeline", default="pyannote/speaker-diarization",
+                        help="pyannote pipeline for diarize")
+    parser.add_argument("--embedding-model", default="speechbrain/spkrec-ecapa-voxceleb",
+                        help="Speaker embedding model for train")
+    parser.add_argument("--pyannote-token", default=os.environ.get("HF_TOKEN"),
+                        help="Hugging Face token (default: $HF_TOKEN)")
+    parser.add_argument("--device", default="cpu", help="torch device")
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+    parser.add_argument("--compare", metavar="BASELINE",
+                        help="Earlier JSON report to compare real-time factors against")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="Allowed real-time factor increase over the baseline (fraction)")
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix="bench_pipeline_") as workdir:
+        for duration in args.durations:
+            meeting = os.path.join(workdir, f"meeting_{duration:g}.wav")
+            turns = make_meeting_wav(meeting, duration, args.speakers)
+            speakers_dir = os.path.join(workdir, f"speakers_{duration:g}")
+            os.makedirs(speakers_dir)
+            spec = {
+                "workdir": workdir,
+                "meeting": meeting,
+                "duration": duration,
+                "turns": turns,
+                "speakers": make_speaker_wavs(speakers_dir, duration, args.speakers),
+                "stub_models": args.stub_models,
+                "whisper_model": args.whisper_model,
+                "pipeline": args.pipeline,
+                "embedding_model": args.embedding_model,
+                "token": args.pyannote_token,
+                "device": args.device,
+            }
+            for stage in args.stages:
+                try:
+                    result = measure(stage, spec, args.repeat)
+                except Exception as e:
+                    result = {"stage": stage, "audio_seconds": duration,
+                              "error": f"{type(e).__name__}: {e}"}
+                    print(f"{stage:>10} {duration:>7.0f}s failed: {result['error']}",
+                          file=sys.stderr)
+                else:
+                    rss = f"{result['peak_rss_mb']:.0f} MiB" if result["peak_rss_mb"] else "n/a"
+                    print(f"{stage:>10} {duration:>7.0f}s wall={result['wall_seconds']:.3f}s "
+                          f"rtf={result['rtf']:.4f} load={result['load_seconds']:.2f}s "
+                          f"rss={rss}", file=sys.stderr)
+                results.append(result)
+
+    report = json.dumps({"environment": environment(args), "results": results}, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(report + "\n")
+    else:
+        print(report)
+
+    failed = sum("error" in r for r in results)
+    if args.compare:
+        failed += compare(results, args.compare, args.tolerance)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+bench_startup.py: measure how long main.py takes to start.
+
+Runs each scenario in a fresh interpreter with `-X importtime`:
+
+    import      python -c "import main"
+    help        python main.py --help
+    missing     python main.py -i <missing file> ...   (input-not-found exit)
+    frozen      the frozen app's runtime hooks (--hooks), then `missing`
+
+and reports the wall time (median of --runs), the slowest imports by
+cumulative time, and which heavy frameworks (torch, whisper, pyannote,
+...) got imported. None of them should appear: they are only loaded once
+a stage needs its model.
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+HEAVY_MODULES = ["torch", "whisper", "pyannote.audio", "speechbrain", "pandas",
+                 "torchaudio", "lightning", "transformers"]
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+MISSING_ARGS = ["-i", "does-not-exist.wav", "-o", "out.csv", "--pyannote-token", "unused"]
+
+SCENARIOS = {
+    "import": ["-c", "import main"],
+    "help": ["main.py", "--help"],
+    "missing": ["main.py"] + MISSING_ARGS,
+    # Filled in by frozen_scenario()
+    "frozen": None,
+}
+
+
+def frozen_scenario(hooks):
+    """Import the runtime hook modules, then run main.py like the frozen exe."""
+    code = (f"import sys, runpy\n"
+            f"for hook in {hooks!r}:\n"
+            f"    __import__(hook)\n"
+            f"sys.argv = ['main.py'] + {MISSING_ARGS!r}\n"
+            f"runpy.run_path('main.py', run_name='__main__')\n")
+    return ["-c", code]
+
+
+def parse_importtime(stderr):
+    """
+    Return {module: (cumulative microseconds, depth)} from -X importtime
+    output; depth 0 is an import made directly by the scenario.
+    """
+    times = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3 or not fields[1].strip().isdigit():
+            continue
+        # Nested imports are indented two spaces per level after the "|"
+        name = fields[2].rstrip()[1:]
+        depth = (len(name) - len(name.lstrip(" "))) // 2
+        times[name.strip()] = (int(fields[1]), depth)
+    return times
+
+
+def run(scenario, python):
+    t0 = time.perf_counter()
+    result = subprocess.run([python, "-X", "importtime"] + SCENARIOS[scenario],
+                            cwd=HERE, capture_output=True, text=True)
+    return time.perf_counter() - t0, parse_importtime(result.stderr), result.returncode
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS),
+                        default=list(SCENARIOS), help="What to time")
+    parser.add_argument("--runs", type=int, default=5, help="Runs per scenario (median reported)")
+    parser.add_argument("--top", type=int, default=10, help="Slowest imports to list")
+    parser.add_argument("--python", default=sys.executable, help="Interpreter to measure")
+    parser.add_argument("--hooks", nargs="+", default=["runtime_hook"],
+                        help="Runtime hook modules the frozen scenario imports first")
+    args = parser.parse_args()
+    SCENARIOS["frozen"] = frozen_scenario(args.hooks)
+
+    for scenario in args.scenarios:
+        walls = []
+        for _ in range(args.runs):
+            wall, imports, returncode = run(scenario, args.python)
+            walls.append(wall)
+        heavy = [name for name in HEAVY_MODULES if name in imports]
+        print(f"{scenario:>8}: {statistics.median(walls) * 1000:7.1f} ms wall "
+              f"(exit {returncode}), {len(imports)} modules imported, "
+              f"heavy: {', '.join(heavy) or 'none'}")
+        # Only top-level names, so nested imports are not counted twice
+        top = sorted(((us, name) for name, (us, depth) in imports.items() if depth == 0),
+                     reverse=True)[:args.top]
+        for us, name in top:
+            print(f"          {us / 1000:7.1f} ms  {name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,21 @@
-import whisper, os
+# Report the local model folder and the result cache (see models.py to
+# fetch models for offline use)
+import sys
 
-# Download or load the model into cache
-model = whisper.load_model("medium.en")
+from models import default_model_dir, status, use_local_models
+from result_cache import ResultCache
 
-# Whisper’s default cache path
-cache_root = whisper._MODELS_PATH if hasattr(whisper, "_MODELS_PATH") \
-             else os.path.expanduser("~/.cache/whisper/models")
+models = sys.argv[1:] or ["base"]
+root = default_model_dir()
+use_local_models(root, offline=True)
 
-print("Model lives at:", cache_root)
\ No newline at end of file
+print("Models live at:", root)
+for kind, name, state, size in status(root, whisper_models=models):
+    size = f", {size / 1024 / 1024:.1f} MB" if size else ""
+    print(f"  {kind} {name}: {state}{size}")
+
+# Transcript / diarization results cached by main.py
+results = ResultCache()
+print("Result cache lives at:", results.root)
+for kind, (count, size) in sorted(results.stats().items()):
+    print(f"  {kind}: {count} entries, {size / 1024 / 1024:.1f} MB")
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+chunked.py: parallel Whisper transcription of long audio.
+
+The decoded waveform is split near the quietest point around every
+chunk boundary, copied once into shared memory, and transcribed chunk by
+chunk across a pool of worker processes that each keep a Whisper model
+loaded. Workers read their slice straight from the shared buffer, so the
+audio is never pickled. Chunks overlap by a little padding on each side;
+when the results are merged each chunk only keeps the segments whose
+midpoint falls inside the range it owns, timestamps are shifted back to
+recording time, and text repeated across a boundary is dropped.
+"""
+
+import logging
+import multiprocessing
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+FRAME_SECONDS = 0.03
+
+
+def find_split_points(audio, sample_rate, chunk_seconds, search_seconds=10.0):
+    """
+    Choose chunk boundaries at low-energy frames.
+
+    Args:
+        audio (numpy.ndarray): Mono float32 waveform.
+        sample_rate (int): Sample rate of the waveform.
+        chunk_seconds (float): Target chunk length.
+        search_seconds (float): How far either side of each target boundary
+            to look for the quietest frame.
+
+    Returns:
+        list: Sample offsets [0, b1, ..., len(audio)].
+    """
+    frame = max(1, int(FRAME_SECONDS * sample_rate))
+    n_frames = len(audio) // frame
+    if n_frames == 0 or len(audio) <= chunk_seconds * sample_rate:
+        return [0, len(audio)]
+    frames = audio[:n_frames * frame].reshape(n_frames, frame)
+    energy = np.einsum("ij,ij->i", frames, frames)
+
+    bounds = [0]
+    step = chunk_seconds * sample_rate / frame
+    search = int(search_seconds * sample_rate / frame)
+    target = step
+    while target < n_frames - search:
+        lo = max(int(target) - search, bounds[-1] // frame + 1)
+        hi = min(int(target) + search + 1, n_frames)
+        if lo >= hi:
+            break
+        quietest = lo + int(np.argmin(energy[lo:hi]))
+        bounds.append(quietest * frame + frame // 2)
+        target = quietest + step
+    bounds.append(len(audio))
+    return bounds
+
+
+def _normalize(text):
+    return re.sub(r"[^\w\s]", "", text).lower().split()
+
+
+def merge_chunk_segments(chunk_results, tolerance=1.0):
+    """
+    Merge per-chunk Whisper segments into one recording-wide list.
+
+    Args:
+        chunk_results (list): (offset, own_start, own_end, segments) per chunk
+            in time order, where segment times are relative to offset and the
+            chunk owns midpoints in [own_start, own_end) (all in seconds).
+        tolerance (float): Seconds of slack when deciding whether a segment
+            at a chunk edge repeats the previous one.
+
+    Returns:
+        list: Segments with recording-time start/end and renumbered ids.
+    """
+    merged = []
+    for offset, own_start, own_end, segments in chunk_results:
+        for seg in segments:
+            start = seg["start"] + offset
+            end = seg["end"] + offset
+            if not own_start <= (start + end) / 2.0 < own_end:
+                continue
+            words = _normalize(seg["text"])
+            if merged and start < merged[-1]["end"] + tolerance:
+                previous = _normalize(merged[-1]["text"])
+                # Same line transcribed by both chunks, or a fragment of it
+                if words and previous[-len(words):] == words:
+                    continue
+            if merged:
+                start = min(max(start, merged[-1]["end"]), end)
+            out = dict(seg, id=len(merged), start=start, end=end)
+            if seg.get("words"):
+                out["words"] = [dict(w, start=w["start"] + offset, end=w["end"] + offset)
+                                for w in seg["words"]]
+            merged.append(out)
+    return merged
+
+
+# --- worker side -----------------------------------------------------------
+
+_worker_model = None
+
+
+def _init_worker(model_name, device, num_threads, model_dir):
+    global _worker_model
+    import torch
+    from models import load_whisper
+    if num_threads:
+        torch.set_num_threads(num_threads)
+    # On CPU every worker maps the same weight file, so they share one copy
+    _worker_model = load_whisper(model_name, device, model_dir)
+
+
+def _transcribe_chunk(shm_name, n_samples, start, end, options):
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        audio = np.ndarray((n_samples,), dtype=np.float32, buffer=shm.buf)
+        result = _worker_model.transcribe(audio[start:end], **options)
+        segments = result.get("segments", [])
+        del audio, result
+    finally:
+        shm.close()
+    return segments
+
+
+# --- parent side -----------------------------------------------------------
+
+class ChunkedTranscriber:
+    """
+    Pool of Whisper worker processes for transcribing one input in parallel.
+
+    The pool (and each worker's model) stays alive between calls, so batch
+    runs only pay the model load once per worker.
+    """
+
+    def __init__(self, model_name, device="cpu", workers=None, num_threads=None,
+                 chunk_seconds=300.0, pad_seconds=2.0, sample_rate=16000, model_dir=None):
+        self.workers = workers or max(1, (os.cpu_count() or 2) // 2)
+        if num_threads is None:
+            num_threads = max(1, (os.cpu_count() or self.workers) // self.workers)
+        self.chunk_seconds = chunk_seconds
+        self.pad_seconds = pad_seconds
+        self.sample_rate = sample_rate
+        # Spawn, not fork: by the first submit torch's intra-op threads (and
+        # with --pipelined the diarization thread) are running in this process
+        self._pool = ProcessPoolExecutor(max_workers=self.workers,
+                                         mp_context=multiprocessing.get_context("spawn"),
+                                         initializer=_init_worker,
+                                         initargs=(model_name, device, num_threads, model_dir))
+
+    def transcribe(self, audio, **options):
+        """
+        Transcribe a waveform in parallel chunks.
+
+        Args:
+            audio (numpy.ndarray): Mono float32 waveform at self.sample_rate.
+            **options: Passed to whisper's model.transcribe for every chunk.
+
+        Returns:
+            list: Merged segments in recording time.
+        """
+        sr = self.sample_rate
+        bounds = find_split_points(audio, sr, self.chunk_seconds)
+        pad = int(self.pad_seconds * sr)
+        logging.info(f"Transcribing {len(bounds) - 1} chunk(s) on {self.workers} worker(s)")
+
+        shm = shared_memory.SharedMemory(create=True, size=max(audio.nbytes, 1))
+        try:
+            shared = np.ndarray(audio.shape, dtype=np.float32, buffer=shm.buf)
+            shared[:] = audio
+            jobs = []
+            for own_start, own_end in zip(bounds[:-1], bounds[1:]):
+                start = max(0, own_start - pad)
+                end = min(len(audio), own_end + pad)
+                future = self._pool.submit(_transcribe_chunk, shm.name, len(audio),
+                                           start, end, options)
+                jobs.append((start / sr, own_start / sr, own_end / sr, future))
+            # The last chunk owns everything up to the end of the recording
+            results = [(offset, own_start, own_end if i < len(jobs) - 1 else float("inf"),
+                        future.result())
+                       for i, (offset, own_start, own_end, future) in enumerate(jobs)]
+            del shared
+        finally:
+            shm.close()
+            shm.unlink()
+        return merge_chunk_segments(results)
+
+    def close(self):
+        self._pool.shutdown()
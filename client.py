@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+client.py: talk to a running server.py.
+
+    python client.py submit meeting.mp4 --wait -o meeting.csv
+    python client.py submit meeting.mp4 --upload      # send the file itself
+    python client.py status [JOB]
+    python client.py fetch JOB -o meeting.csv
+    python client.py cancel JOB
+    python client.py health
+
+--server is http://HOST:PORT (default http://127.0.0.1:8765, or
+$TRANSCRIBBLER_SERVER) or unix:/path/to/socket. JobClient is usable on
+its own; submit() waits and retries while the server's queue is full.
+"""
+
+import argparse
+import http.client
+import json
+import os
+import socket
+import sys
+import time
+from urllib.parse import quote, urlsplit
+
+DEFAULT_SERVER = "http://127.0.0.1:8765"
+
+
+class ServerError(RuntimeError):
+    """An error response from the server; status is the HTTP status code."""
+
+    def __init__(self, status, message, retry_after=None):
+        super().__init__(f"{status}: {message}")
+        self.status = status
+        self.retry_after = retry_after
+
+
+class _UnixConnection(http.client.HTTPConnection):
+    def __init__(self, socket_path, timeout=None):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        if self.timeout is not None:
+            self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+class JobClient:
+    def __init__(self, server=DEFAULT_SERVER, timeout=60.0):
+        self.server = server
+        self.timeout = timeout
+
+    def _connect(self):
+        if self.server.startswith("unix:"):
+            return _UnixConnection(self.server[len("unix:"):], timeout=self.timeout)
+        url = urlsplit(self.server)
+        return http.client.HTTPConnection(url.hostname, url.port or 80, timeout=self.timeout)
+
+    def request(self, method, path, body=None, headers=None, raw=False):
+        """
+        Send one request.
+
+        Returns:
+            The decoded JSON response, or bytes with raw=True.
+
+        Raises:
+            ServerError: For 4xx/5xx responses.
+        """
+        conn = self._connect()
+        try:
+            conn.request(method, path, body=body, headers=headers or {})
+            response = conn.getresponse()
+            data = response.read()
+        finally:
+            conn.close()
+        if response.status >= 400:
+            try:
+                message = json.loads(data)["error"]
+            except (ValueError, KeyError):
+                message = data.decode("utf-8", "replace")
+            retry_after = response.getheader("Retry-After")
+            raise ServerError(response.status, message,
+                              float(retry_after) if retry_after else None)
+        return data if raw else json.loads(data)
+
+    def submit(self, input_path, output_path=None, upload=False, wait_for_room=True):
+        """
+        Submit a job for a media file.
+
+        Args:
+            input_path (str): Media file; without upload the server reads it
+                from this path, so it must be on the server's host.
+            output_path (str, optional): Where the server writes the CSV,
+                relative to its --output-dir (default: its jobs folder;
+                fetch() returns it either way).
+            upload (bool): Send the file's contents in the request.
+            wait_for_room (bool): While the queue is full, wait Retry-After
+                seconds and try again instead of raising.
+
+        Returns:
+            dict: The queued job.
+        """
+        while True:
+            try:
+                if upload:
+                    with open(input_path, "rb") as f:
+                        size = os.fstat(f.fileno()).st_size
+                        name = quote(os.path.basename(input_path))
+                        return self.request("POST", f"/jobs?name={name}", body=f,
+                                            headers={"Content-Type": "application/octet-stream",
+                                                     "Content-Length": str(size)})
+                request = {"input": os.path.abspath(input_path)}
+                if output_path:
+                    request["output"] = output_path
+                return self.request("POST", "/jobs", body=json.dumps(request),
+                                    headers={"Content-Type": "application/json"})
+            except ServerError as e:
+                if e.status != 503 or not wait_for_room:
+                    raise
+                time.sleep(e.retry_after or 5)
+
+    def status(self, job_id):
+        return self.request("GET", f"/jobs/{job_id}")
+
+    def jobs(self):
+        return self.request("GET", "/jobs")["jobs"]
+
+    def health(self):
+        return self.request("GET", "/health")
+
+    def cancel(self, job_id):
+        return self.request("DELETE", f"/jobs/{job_id}")
+
+    def fetch(self, job_id, output_path=None):
+        """Return the CSV of a finished job as text, or write it to output_path."""
+        data = self.request("GET", f"/jobs/{job_id}/csv", raw=True)
+        if output_path is None:
+            return data.decode("utf-8")
+        with open(output_path, "wb") as f:
+            f.write(data)
+        return output_path
+
+    def wait(self, job_id, poll_seconds=1.0, timeout=None):
+        """Poll until the job is done, failed or cancelled; returns its last status."""
+        deadline = time.monotonic() + timeout if timeout else None
+        while True:
+            job = self.status(job_id)
+            if job["status"] in ("done", "failed", "cancelled"):
+                return job
+            if deadline and time.monotonic() > deadline:
+                raise TimeoutError(f"job {job_id} still {job['status']} after {timeout}s")
+            time.sleep(poll_seconds)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Submit and manage jobs on a running server.py")
+    parser.add_argument("--server", default=os.environ.get("TRANSCRIBBLER_SERVER", DEFAULT_SERVER),
+                        help="http://HOST:PORT or unix:/path/to/socket")
+    commands = parser.add_subparsers(dest="command", required=True)
+    submit = commands.add_parser("submit", help="Queue a media file")
+    submit.add_argument("input")
+    submit.add_argument("--upload", action="store_true",
+                        help="Send the file instead of its path (server on another host or container)")
+    submit.add_argument("--wait", action="store_true", help="Wait for the job to finish")
+    submit.add_argument("-o", "--output",
+                        help="With --wait, save the CSV here; otherwise where the server writes it "
+                             "(relative to its --output-dir)")
+    status = commands.add_parser("status", help="Show one job, or all jobs")
+    status.add_argument("job", nargs="?")
+    fetch = commands.add_parser("fetch", help="Download the CSV of a finished job")
+    fetch.add_argument("job")
+    fetch.add_argument("-o", "--output", help="CSV file to write (default: print it)")
+    cancel = commands.add_parser("cancel", help="Cancel a queued or running job")
+    cancel.add_argument("job")
+    commands.add_parser("health", help="Show workers and queue depth")
+    args = parser.parse_args()
+
+    client = JobClient(args.server)
+    try:
+        if args.command == "submit":
+            job = client.submit(args.input, None if args.wait else args.output,
+                                upload=args.upload)
+            print(json.dumps(job, indent=2))
+            if args.wait:
+                job = client.wait(job["id"])
+                print(json.dumps(job, indent=2))
+                if job["status"] != "done":
+                    return 1
+                if args.output:
+                    client.fetch(job["id"], args.output)
+        elif args.command == "status":
+            print(json.dumps(client.status(args.job) if args.job else client.jobs(), indent=2))
+        elif args.command == "fetch":
+            result = client.fetch(args.job, args.output)
+            if not args.output:
+                sys.stdout.write(result)
+        elif args.command == "cancel":
+            print(json.dumps(client.cancel(args.job), indent=2))
+        else:
+            print(json.dumps(client.health(), indent=2))
+    except (ServerError, OSError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+"""
+compat.py: compatibility fixes for the frozen (PyInstaller) build.
+
+Replaces the old runtime_hook / bootstrap / *_patch.py modules. install()
+is cheap and idempotent: it puts the bundle's bin folder on PATH and
+registers an import hook, and every fix is applied only when (and if)
+the module it fixes is imported:
+
+    numpy                         np.float / np.int / np.bool / np.object / np.NaN aliases
+    packaging.version             empty version strings parse as 0.0.0
+    torch.utils.imports           same for torch's own version comparison
+    pkg_resources                 missing NullProvider / declare_namespace, and
+                                  require() ignoring the absent altgraph
+    speechbrain.utils.importutils no filesystem scans for lazy exports
+
+pkg_resources and altgraph are replaced by minimal stubs only when the
+bundle does not contain them at all. Nothing is logged above DEBUG and
+logging is left alone unless TRANSCRIBBLER_DEBUG_HOOKS=1 is set to show
+what was patched.
+"""
+
+import importlib.abc
+import importlib.machinery
+import logging
+import os
+import sys
+import types
+import warnings
+
+logger = logging.getLogger("TranscribblerApp.compat")
+
+_installed = False
+
+
+# --- fixes -------------------------------------------------------------------
+
+def patch_numpy(np):
+    """Restore aliases removed in NumPy 1.24 / 2.0 that dependencies still use."""
+    with warnings.catch_warnings():
+        # Probing a removed alias warns on some NumPy versions
+        warnings.simplefilter("ignore", FutureWarning)
+        for name, value in (("float", float), ("int", int), ("bool", bool),
+                            ("object", object), ("NaN", float("nan"))):
+            if not hasattr(np, name):
+                setattr(np, name, value)
+
+
+def _empty_as_zero(version):
+    return "0.0.0" if version == "" else version
+
+
+def patch_packaging_version(version_module):
+    """Treat empty version strings (common in frozen metadata) as 0.0.0."""
+    original_parse = version_module.parse
+    original_version = version_module.Version
+    original_invalid_version = version_module.InvalidVersion
+
+    class Version(original_version):
+        def __init__(self, version):
+            super().__init__(_empty_as_zero(version))
+
+    class InvalidVersion(original_invalid_version):
+        def __init__(self, version="", *args):
+            super().__init__(_empty_as_zero(version), *args)
+
+    version_module.parse = lambda version: original_parse(_empty_as_zero(version))
+    version_module.Version = Version
+    version_module.InvalidVersion = InvalidVersion
+
+
+def patch_torch_imports(imports_module):
+    original = getattr(imports_module, "_compare_version", None)
+    if original is None:
+        return
+    imports_module._compare_version = lambda version, target: original(
+        _empty_as_zero(version), _empty_as_zero(target))
+
+
+class NullProvider:
+    """Resource provider that has nothing; enough for code probing metadata."""
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def has_metadata(self, name):
+        return False
+
+    def get_metadata(self, name):
+        return ""
+
+    def get_resource_filename(self, manager, resource_name):
+        return ""
+
+    def get_resource_stream(self, manager, resource_name):
+        return None
+
+    def get_resource_string(self, manager, resource_name):
+        return b""
+
+    def has_resource(self, resource_name):
+        return False
+
+    def resource_isdir(self, resource_name):
+        return False
+
+    def resource_listdir(self, resource_name):
+        return []
+
+
+def _declare_namespace(package_name):
+    return sys.modules.setdefault(package_name, types.ModuleType(package_name))
+
+
+def patch_pkg_resources(pkg_resources):
+    if not hasattr(pkg_resources, "NullProvider"):
+        pkg_resources.NullProvider = NullProvider
+    if not hasattr(pkg_resources, "declare_namespace"):
+        pkg_resources.declare_namespace = _declare_namespace
+    original_require = getattr(pkg_resources, "require", None)
+    not_found = getattr(pkg_resources, "DistributionNotFound", None)
+    if original_require is not None and not_found is not None:
+        def require(*args, **kwargs):
+            try:
+                return original_require(*args, **kwargs)
+            except not_found as e:
+                # altgraph is a build-time PyInstaller dependency, never bundled
+                if "altgraph" in str(e):
+                    return []
+                raise
+        pkg_resources.require = require
+
+
+def patch_speechbrain_importutils(importutils):
+    # These scan the filesystem, which finds nothing inside the bundle
+    importutils.lazy_export_all = lambda *args, **kwargs: None
+    importutils.find_imports = lambda *args, **kwargs: []
+
+
+PATCHES = {
+    "numpy": patch_numpy,
+    "packaging.version": patch_packaging_version,
+    "torch.utils.imports": patch_torch_imports,
+    "pkg_resources": patch_pkg_resources,
+    "speechbrain.utils.importutils": patch_speechbrain_importutils,
+}
+
+
+# --- stubs for modules missing from the bundle -------------------------------
+
+class _StubDistribution:
+    def __init__(self, project_name="", version=""):
+        self.project_name = project_name
+        self.version = version
+        self.key = project_name.lower()
+
+    def has_metadata(self, name):
+        return False
+
+    def get_metadata(self, name):
+        return ""
+
+    def requires(self):
+        return []
+
+
+class _StubWorkingSet:
+    def __init__(self, entries=None):
+        self.entries = entries or []
+        self.by_key = {}
+
+    def add_entry(self, entry):
+        self.entries.append(entry)
+
+    def add(self, dist, entry=None):
+        self.by_key.setdefault(dist.key, dist)
+
+    def find(self, req):
+        return self.by_key.get(req.key)
+
+    def require(self, *requirements):
+        return []
+
+
+class _StubRequirement:
+    def __init__(self, req_str=""):
+        self.req_str = req_str
+        self.key = req_str.lower()
+
+    def __str__(self):
+        return self.req_str
+
+
+def _stub_pkg_resources(module):
+    module.__version__ = "0.0.0"
+    module.Distribution = _StubDistribution
+    module.Requirement = _StubRequirement
+    module.WorkingSet = _StubWorkingSet
+    module.working_set = _StubWorkingSet()
+    module.Environment = type("Environment", (dict,), {})
+    module.DistributionNotFound = type("DistributionNotFound", (Exception,), {})
+    module.VersionConflict = type("VersionConflict", (Exception,), {})
+    module.require = lambda *args, **kwargs: []
+    module.get_distribution = _StubDistribution
+    module.load_entry_point = lambda dist, group, name: None
+    module.find_distributions = lambda *args, **kwargs: []
+    module.resource_filename = lambda package, name: os.path.join(_bundle_dir(), name)
+    module.resource_string = lambda package, name: b""
+    module.resource_stream = lambda package, name: None
+    module.resource_listdir = lambda package, name: []
+    module.resource_exists = lambda package, name: False
+    module.resource_isdir = lambda package, name: False
+
+
+def _stub_altgraph(module):
+    module.__version__ = "0.17.3"
+
+
+STUBS = {
+    "pkg_resources": _stub_pkg_resources,
+    "altgraph": _stub_altgraph,
+    "altgraph.ObjectGraph": None,
+    "altgraph.Graph": None,
+    "altgraph.GraphUtil": None,
+    "altgraph.GraphAlgo": None,
+}
+
+
+# --- import hook -------------------------------------------------------------
+
+class _PatchingLoader(importlib.abc.Loader):
+    """Wraps the real loader and applies the module's fix after it runs."""
+
+    def __init__(self, loader, patch):
+        self.loader = loader
+        self.patch = patch
+
+    def create_module(self, spec):
+        return self.loader.create_module(spec)
+
+    def exec_module(self, module):
+        self.loader.exec_module(module)
+        _apply(module.__name__, module, self.patch)
+
+    def __getattr__(self, name):
+        # get_resource_reader, get_code, ... used by pkgutil and friends
+        return getattr(self.loader, name)
+
+
+class _StubLoader(importlib.abc.Loader):
+    def __init__(self, fill):
+        self.fill = fill
+
+    def create_module(self, spec):
+        return None
+
+    def exec_module(self, module):
+        if self.fill is not None:
+            self.fill(module)
+        parent, _, child = module.__name__.rpartition(".")
+        if parent in sys.modules:
+            setattr(sys.modules[parent], child, module)
+        logger.debug(f"Stubbed missing module {module.__name__}")
+
+
+class CompatFinder(importlib.abc.MetaPathFinder):
+    """
+    Meta path finder that only answers for the modules in PATCHES and
+    STUBS; every other import is a set lookup and falls through.
+    """
+
+    def __init__(self, pending):
+        self.pending = set(pending)
+
+    def find_spec(self, fullname, path=None, target=None):
+        if fullname not in self.pending and fullname not in STUBS:
+            return None
+        spec = self._find_real(fullname, path, target)
+        if spec is None:
+            if fullname not in STUBS:
+                return None
+            is_package = "." not in fullname
+            return importlib.machinery.ModuleSpec(
+                fullname, _StubLoader(STUBS[fullname]), is_package=is_package)
+        if fullname in self.pending and spec.loader is not None:
+            spec.loader = _PatchingLoader(spec.loader, PATCHES[fullname])
+        return spec
+
+    def _find_real(self, fullname, path, target):
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, "find_spec"):
+                continue
+            spec = finder.find_spec(fullname, path, target)
+            if spec is not None:
+                return spec
+        return None
+
+
+_finder = None
+
+
+def _apply(name, module, patch):
+    try:
+        patch(module)
+        logger.debug(f"Patched {name}")
+    except Exception as e:
+        logger.debug(f"Could not patch {name}: {e}")
+    if _finder is not None:
+        _finder.pending.discard(name)
+
+
+def _bundle_dir():
+    return getattr(sys, "_MEIPASS", os.path.dirname(os.path.abspath(__file__)))
+
+
+def install():
+    """Apply the compatibility layer once; later calls do nothing."""
+    global _installed, _finder
+    if _installed:
+        return
+    _installed = True
+    if os.environ.get("TRANSCRIBBLER_DEBUG_HOOKS"):
+        logging.basicConfig(level=logging.DEBUG)
+        logger.setLevel(logging.DEBUG)
+
+    bin_dir = os.path.join(_bundle_dir(), "bin")
+    path = os.environ.get("PATH", "")
+    if os.path.isdir(bin_dir) and bin_dir not in path.split(os.pathsep):
+        os.environ["PATH"] = bin_dir + os.pathsep + path
+
+    # Modules imported before the hook get their fix right away
+    pending = []
+    for name, patch in PATCHES.items():
+        if name in sys.modules:
+            _apply(name, sys.modules[name], patch)
+        else:
+            pending.append(name)
+    _finder = CompatFinder(pending)
+    sys.meta_path.insert(0, _finder)
@@ -5,30 +5,179 @@ diarize.py: defines diarize_audio() to perform speaker diarization using pyannot
 
 import os
 import logging
+import threading
+from collections import OrderedDict
 import numpy as np
 
-# Patch for NumPy 2.0 compatibility
-if not hasattr(np, 'NaN'):
-    np.NaN = float("nan")
-    print("Patched np.NaN for NumPy 2.0 compatibility in diarize.py")
+from compat import patch_numpy
 
-try:
-    from pyannote.audio import Pipeline
-except ImportError:
-    raise ImportError("pyannote.audio is required. Install with: pip install pyannote.audio")
+# pyannote still uses np.NaN, removed in NumPy 2.0
+patch_numpy(np)
+
+DEFAULT_PIPELINE = "pyannote/speaker-diarization"
+
+def load_pipeline(auth_token: str,
+                  pipeline_name: str = DEFAULT_PIPELINE,
+                  device: str = None,
+                  revision: str = None):
+    """
+    Load a pyannote diarization pipeline from the hub or local cache.
+    This always loads fresh weights; use get_pipeline() to share them.
+    pyannote.audio (and torch) are only imported here, on first load.
+    """
+    try:
+        from pyannote.audio import Pipeline
+    except ImportError:
+        raise ImportError("pyannote.audio is required. Install with: pip install pyannote.audio")
+    checkpoint = f"{pipeline_name}@{revision}" if revision else pipeline_name
+    logging.info(f"Loading diarization pipeline '{checkpoint}'")
+    pipeline = Pipeline.from_pretrained(checkpoint,
+                                        use_auth_token=auth_token)
+    if device:
+        import torch
+        pipeline.to(torch.device(device))
+    return pipeline
+
+class PipelineRegistry:
+    """
+    Thread-safe, bounded LRU cache of loaded diarization pipelines.
+
+    Pipelines are keyed by (pipeline name, device, revision). Concurrent
+    requests for the same key wait for a single load; loads of different
+    keys don't block each other. When more than max_size pipelines are
+    resident the least recently used one is dropped.
+    """
+
+    def __init__(self, max_size: int = 2):
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._pipelines = OrderedDict()
+        self._loading = {}
+
+    @staticmethod
+    def _key(pipeline_name, device, revision):
+        return (pipeline_name, str(device or "cpu"), revision)
+
+    def get(self, auth_token: str,
+            pipeline_name: str = DEFAULT_PIPELINE,
+            device: str = None,
+            revision: str = None):
+        """Return a cached pipeline, loading it on first use."""
+        key = self._key(pipeline_name, device, revision)
+        with self._lock:
+            if key in self._pipelines:
+                self._pipelines.move_to_end(key)
+                return self._pipelines[key]
+            key_lock = self._loading.setdefault(key, threading.Lock())
+
+        with key_lock:
+            with self._lock:
+                if key in self._pipelines:
+                    self._pipelines.move_to_end(key)
+                    return self._pipelines[key]
+            pipeline = load_pipeline(auth_token, pipeline_name, device, revision)
+            with self._lock:
+                self._pipelines[key] = pipeline
+                self._loading.pop(key, None)
+                while len(self._pipelines) > max(self.max_size, 1):
+                    evicted, _ = self._pipelines.popitem(last=False)
+                    logging.info(f"Evicted diarization pipeline {evicted}")
+        return pipeline
+
+    def warm_up(self, auth_token: str, specs=None):
+        """
+        Load pipelines ahead of time.
+
+        Args:
+            auth_token (str): Hugging Face token for pyannote.audio.
+            specs (list, optional): (pipeline_name, device, revision) tuples.
+                Defaults to the default pipeline on CPU.
+        """
+        for pipeline_name, device, revision in specs or [(DEFAULT_PIPELINE, None, None)]:
+            self.get(auth_token, pipeline_name, device, revision)
+
+    def release(self, pipeline_name: str = DEFAULT_PIPELINE,
+                device: str = None,
+                revision: str = None):
+        """Drop one pipeline from the cache. Returns True if it was loaded."""
+        with self._lock:
+            pipeline = self._pipelines.pop(self._key(pipeline_name, device, revision), None)
+        found = pipeline is not None
+        if found and str(device or "").startswith("cuda"):
+            import torch
+            del pipeline
+            torch.cuda.empty_cache()
+        return found
+
+    def clear(self):
+        """Drop every cached pipeline."""
+        with self._lock:
+            self._pipelines.clear()
+
+    def loaded(self):
+        """Return the keys of resident pipelines, least recently used first."""
+        with self._lock:
+            return list(self._pipelines)
+
+# Process-wide registry used by diarize_audio() and long-running callers
+pipeline_registry = PipelineRegistry()
+
+def get_pipeline(auth_token: str,
+                 pipeline_name: str = DEFAULT_PIPELINE,
+                 device: str = None,
+                 revision: str = None):
+    """Return a pipeline from the process-wide registry, loading it once."""
+    return pipeline_registry.get(auth_token, pipeline_name, device, revision)
 
 def diarize_audio(audio_path: str,
                   auth_token: str,
-                  pipeline_name: str = "pyannote/speaker-diarization"):
+                  pipeline_name: str = DEFAULT_PIPELINE,
+                  pipeline=None,
+                  waveform=None,
+                  sample_rate: int = 16000):
     """
     Perform speaker diarization on the given audio file.
+    Without an explicit pipeline, the process-wide registry is used so the
+    model weights are only loaded once per process.
+    Pass an already decoded mono float32 waveform (e.g. from
+    audio_extract.load_audio) to skip decoding the file again; it is
+    handed to pyannote without copying.
     Returns a pyannote.core.Annotation with speaker turns.
     """
-    logging.info(f"Loading diarization pipeline '{pipeline_name}'")
-    pipeline = Pipeline.from_pretrained(pipeline_name,
-                                       use_auth_token=auth_token)
-    return pipeline({"uri": os.path.basename(audio_path),
-                     "audio": audio_path})
+    if pipeline is None:
+        pipeline = get_pipeline(auth_token, pipeline_name)
+    file = {"uri": os.path.basename(audio_path)}
+    if waveform is not None:
+        import torch
+        # from_numpy shares the buffer; unsqueeze adds the channel axis
+        file["waveform"] = torch.from_numpy(waveform).unsqueeze(0)
+        file["sample_rate"] = sample_rate
+    else:
+        file["audio"] = audio_path
+    return pipeline(file)
+
+def chunk_audio(audio_path: str,
+                duration: float = 3.0,
+                step: float = None,
+                sample_rate: int = 16000,
+                ffmpeg_path_override: str = None):
+    """
+    Decode an audio file once and cut it into fixed-length chunks.
+    Returns a (n_chunks, samples_per_chunk) float32 array that is a strided
+    view over the decoded waveform, so windowing copies nothing. A file
+    shorter than one chunk comes back as a single shorter chunk.
+    """
+    from audio_extract import load_audio
+    audio = load_audio(audio_path, sample_rate=sample_rate,
+                       ffmpeg_path_override=ffmpeg_path_override)
+    window = int(round(duration * sample_rate))
+    hop = int(round((step or duration) * sample_rate))
+    if len(audio) < window:
+        return audio[np.newaxis, :]
+    n_chunks = 1 + (len(audio) - window) // hop
+    return np.lib.stride_tricks.as_strided(
+        audio, shape=(n_chunks, window),
+        strides=(hop * audio.strides[0], audio.strides[0]))
 
 def main():
     import configargparse
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+embedding_store.py: on-disk format of enrolled speaker embeddings.
+
+Vectors in the `embeddings` table (see Train.py) are stored as a 12-byte
+header (magic, numpy dtype string, dimension) followed by the raw
+little-endian float32 vector. Rows written by older versions are pickles.
+"""
+
+import pickle
+import struct
+
+import numpy as np
+
+VECTOR_MAGIC = b"EMB1"
+VECTOR_DTYPE = "<f4"
+VECTOR_HEADER = struct.Struct("<4s4sI")
+
+
+def encode_vector(vector):
+    vec = np.ascontiguousarray(np.asarray(vector).ravel(), dtype=VECTOR_DTYPE)
+    header = VECTOR_HEADER.pack(VECTOR_MAGIC, VECTOR_DTYPE.encode("ascii"), vec.size)
+    return header + vec.tobytes()
+
+
+def decode_vector(blob):
+    """Decode an embedding blob; rows written before the raw format are pickles."""
+    blob = bytes(blob)
+    if not blob.startswith(VECTOR_MAGIC):
+        return np.asarray(pickle.loads(blob)).ravel()
+    _, dtype, dim = VECTOR_HEADER.unpack_from(blob)
+    return np.frombuffer(blob, dtype=dtype.rstrip(b"\0").decode("ascii"),
+                         count=dim, offset=VECTOR_HEADER.size)
+
+
+def decode_matrix(blobs):
+    """
+    Decode many embedding blobs into one (n, dim) float32 array.
+
+    Raw rows of a common dimension are decoded with a single frombuffer
+    over their concatenated payloads; anything else falls back to
+    decode_vector row by row.
+    """
+    blobs = [bytes(b) for b in blobs]
+    if not blobs:
+        return np.empty((0, 0), dtype=np.float32)
+    first = blobs[0]
+    if all(b.startswith(VECTOR_MAGIC) for b in blobs) and \
+            all(b[:VECTOR_HEADER.size] == first[:VECTOR_HEADER.size] for b in blobs):
+        _, dtype, dim = VECTOR_HEADER.unpack_from(first)
+        payload = b"".join(b[VECTOR_HEADER.size:] for b in blobs)
+        matrix = np.frombuffer(payload, dtype=dtype.rstrip(b"\0").decode("ascii"))
+        return matrix.reshape(len(blobs), dim).astype(np.float32, copy=False)
+    return np.stack([decode_vector(b) for b in blobs]).astype(np.float32, copy=False)
+
+
+def database_signature(conn):
+    """Cheap fingerprint of the enrolled data, used to detect changes."""
+    return (conn.execute("SELECT COUNT(*), MAX(id) FROM embeddings").fetchone()
+            + conn.execute("SELECT COUNT(*), MAX(id) FROM speakers").fetchone())
@@ -1,62 +1,31 @@
 #!/usr/bin/env python3
 """
 TranscribblerApp: A CLI tool that transcribes an audio/video file with OpenAI Whisper,
-performs speaker diarization via diarize.py, then writes a CSV of
-timestamped, speaker‑labelled segments.
+performs speaker diarization via diarize.py, then writes a CSV (or JSONL,
+Parquet or Arrow file, see sinks.py) of timestamped, speaker‑labelled segments.
 """
 
 import configargparse as argparse
-import csv
+import atexit
 import logging
+import multiprocessing
 import os
 import sys
-import subprocess
-from pathlib import Path
+from concurrent.futures import Future, ThreadPoolExecutor
 
 # FFmpeg locator function to find ffmpeg in various locations
 def find_ffmpeg():
     """
-    Find ffmpeg executable in multiple possible locations:
-    1. In the same directory as the application
-    2. In a 'bin' subdirectory
+    Find the ffmpeg executable (cached per process, see media.find_tool):
+    1. Next to $FFMPEG_BINARY, if set
+    2. In the application (or bundle) directory or its 'bin' subdirectory
     3. In the installation directory (C:\Program Files (x86)\TranscribblerApp\)
     4. In the system PATH
     """
-    # Get the directory where the executable is located
-    if getattr(sys, 'frozen', False):
-        app_dir = Path(os.path.dirname(sys.executable))
-    else:
-        app_dir = Path(os.path.dirname(os.path.abspath(__file__)))
-    
-    # Possible locations to check
-    possible_locations = [
-        app_dir / "ffmpeg.exe",
-        app_dir / "bin" / "ffmpeg.exe",
-        Path(r"C:\Program Files (x86)\TranscribblerApp\ffmpeg.exe"),
-        Path(r"C:\Program Files\TranscribblerApp\ffmpeg.exe")
-    ]
-    
-    # Check each location
-    for location in possible_locations:
-        if location.exists():
-            logging.info(f"Found FFmpeg at: {location}")
-            return str(location)
-    
-    # If not found in specific locations, try to find in PATH
-    try:
-        result = subprocess.run(["where", "ffmpeg"], 
-                               capture_output=True, 
-                               text=True, 
-                               check=False)
-        if result.returncode == 0 and result.stdout.strip():
-            ffmpeg_path = result.stdout.strip().split('\n')[0]
-            logging.info(f"Found FFmpeg in PATH: {ffmpeg_path}")
-            return ffmpeg_path
-    except Exception as e:
-        logging.warning(f"Error checking FFmpeg in PATH: {e}")
-    
-    logging.error("FFmpeg not found. Please install FFmpeg and place it in the application directory.")
-    return None
+    ffmpeg_path = find_tool("ffmpeg")
+    if not ffmpeg_path:
+        logging.error("FFmpeg not found. Please install FFmpeg and place it in the application directory.")
+    return ffmpeg_path
 
 # Configure environment for FFmpeg
 def configure_ffmpeg():
@@ -75,13 +44,39 @@ def configure_ffmpeg():
     
     return ffmpeg_path
 
-try:
-    import whisper
-except ImportError:
-    print("Error: please install OpenAI Whisper (pip install openai-whisper)")
-    sys.exit(1)
+from diarize import DEFAULT_PIPELINE, diarize_audio, get_pipeline
+from aligner import SpeakerTimeline, TurnIndex, split_by_speaker
+from batch import (SCHEDULE_ORDERS, collect_inputs, order_plan, plan_outputs, run_batch,
+                   report_summary)
+from audio_extract import load_audio
+from media import ProbeCache, find_tool, probe
+from result_cache import ResultCache
+from streaming import SpeakerLinker, iter_windows
+from chunked import ChunkedTranscriber
+from speaker_id import DEFAULT_EMBEDDING_MODEL, get_embedding_model, identify_speakers
+from profiling import PYTHON_PROFILERS, profiler
+from models import load_whisper, shared_whisper, use_local_models
+from sinks import FORMATS, open_sink
 
-from diarize import diarize_audio
+# Whisper and pyannote both work on 16 kHz mono audio
+SAMPLE_RATE = 16000
+
+# Same names as whisper.available_models(), kept here so that --help and
+# argument errors don't have to import whisper (and torch) first
+WHISPER_MODELS = [
+    'tiny.en', 'tiny', 'base.en', 'base', 'small.en', 'small',
+    'medium.en', 'medium', 'large-v1', 'large-v2', 'large-v3', 'large',
+    'large-v3-turbo', 'turbo',
+]
+
+def import_whisper():
+    """Import whisper on first use; it pulls in torch, which takes seconds."""
+    try:
+        import whisper
+    except ImportError:
+        print("Error: please install OpenAI Whisper (pip install openai-whisper)")
+        sys.exit(1)
+    return whisper
 
 def setup_logger():
     logging.basicConfig(
@@ -90,25 +85,18 @@ def setup_logger():
         datefmt="%H:%M:%S"
     )
 
-def parse_args():
-    parser = argparse.ArgumentParser(
-        description="Transcribe and diarize audio/video into a speaker‑labelled CSV.",
-        default_config_files=['config.ini'],
-        ignore_unknown_config_file_keys=True
-    )
-    parser.add_argument('-c', '--config',
-                        is_config_file=True,
-                        help='Path to config file (INI or YAML)')
-    parser.add_argument('-i', '--input',
-                        required=True,
-                        help='Path to input audio or video file')
-    parser.add_argument('-o', '--output',
-                        required=True,
-                        help='Path to output CSV file (overwritten if exists)')
+def add_pipeline_arguments(parser):
+    """Options for the models and stages; shared with the job server (server.py)."""
     parser.add_argument('--whisper-model',
                         default='base',
-                        choices=whisper.available_models(),
+                        choices=WHISPER_MODELS,
                         help='Whisper model size (tiny, base, small, medium, large)')
+    parser.add_argument('--model-dir',
+                        help='Folder with models fetched by models.py '
+                             '(default: $TRANSCRIBBLER_MODELS or <cache dir>/models)')
+    parser.add_argument('--offline',
+                        action='store_true',
+                        help='Only use models already in the model folder; never download')
     parser.add_argument('--device',
                         default='cpu',
                         choices=['cpu', 'cuda'],
@@ -117,73 +105,629 @@ def parse_args():
                         env_var='PYANNOTE_AUTH_TOKEN',
                         required=True,
                         help='Hugging Face token for pyannote.audio')
+    parser.add_argument('--decode-per-stage',
+                        action='store_true',
+                        help='Let Whisper and pyannote each decode the input themselves '
+                             'instead of sharing one decoded waveform')
+    parser.add_argument('--cache-dir',
+                        help='Folder for cached Whisper segments and speaker turns '
+                             '(default: $TRANSCRIBBLER_CACHE or the user cache folder)')
+    parser.add_argument('--cache-max-mb',
+                        type=float,
+                        default=2048,
+                        help='Size limit for the result cache; least recently used entries are evicted')
+    parser.add_argument('--no-cache',
+                        action='store_true',
+                        help='Neither read nor write cached results')
+    parser.add_argument('--refresh',
+                        action='store_true',
+                        help='Recompute results even if cached, then update the cache')
+    parser.add_argument('--stream',
+                        action='store_true',
+                        help='Process the input window by window and append rows to the output '
+                             'as each window finishes (bounded memory for long recordings)')
+    parser.add_argument('--window-seconds',
+                        type=float,
+                        default=600.0,
+                        help='With --stream, length of each window in seconds')
+    parser.add_argument('--window-overlap',
+                        type=float,
+                        default=30.0,
+                        help='With --stream, seconds of the previous window re-diarized '
+                             'to keep speaker labels consistent across windows')
+    parser.add_argument('--parallel-chunks',
+                        type=int,
+                        default=0,
+                        help='Split long audio at quiet points and transcribe the chunks '
+                             'in this many worker processes (0 or 1 = off)')
+    parser.add_argument('--chunk-seconds',
+                        type=float,
+                        default=300.0,
+                        help='With --parallel-chunks, target chunk length in seconds')
+    parser.add_argument('--speaker-db',
+                        help='Speaker database built by Train.py; matching diarized speakers '
+                             'are labelled with their enrolled names')
+    parser.add_argument('--speaker-threshold',
+                        type=float,
+                        default=0.5,
+                        help='Minimum cosine similarity to label a speaker with an enrolled name')
+    parser.add_argument('--speaker-index',
+                        help='With --speaker-db, match through this approximate nearest-neighbour '
+                             'index directory (built from the database if missing)')
+    parser.add_argument('--embedding-model',
+                        default=DEFAULT_EMBEDDING_MODEL,
+                        help='Speaker embedding model (must match the one used by Train.py)')
+    parser.add_argument('--word-speakers',
+                        action='store_true',
+                        help='Transcribe with word timestamps, give each word to the speaker '
+                             'talking at that moment and split segments where the speaker changes')
+    parser.add_argument('--pipelined',
+                        action='store_true',
+                        help='Run Whisper transcription and speaker diarization at the same time')
+    parser.add_argument('--transcribe-threads',
+                        type=int,
+                        help='Torch CPU threads for Whisper (default with --pipelined: half the cores)')
+    parser.add_argument('--diarize-threads',
+                        type=int,
+                        help='Torch CPU threads for diarization (default with --pipelined: the other half)')
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Transcribe and diarize audio/video into a speaker‑labelled transcript file.",
+        default_config_files=['config.ini'],
+        ignore_unknown_config_file_keys=True
+    )
+    parser.add_argument('-c', '--config',
+                        is_config_file=True,
+                        help='Path to config file (INI or YAML)')
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('-i', '--input',
+                        help='Path to input audio or video file')
+    source.add_argument('--batch',
+                        help='Directory, glob pattern or manifest file of inputs; '
+                             'models are loaded once and reused for every file')
+    parser.add_argument('-o', '--output',
+                        required=True,
+                        help='Path to output file (overwritten if exists), '
+                             'or output directory with --batch')
+    parser.add_argument('--output-format',
+                        choices=list(FORMATS),
+                        help='csv, jsonl, parquet or arrow (parquet and arrow need pyarrow); '
+                             'default: from the output file extension, else csv')
+    parser.add_argument('--overwrite',
+                        action='store_true',
+                        help='With --batch, re-process inputs whose output already exists')
+    parser.add_argument('--batch-summary',
+                        help='With --batch, also write the per-file summary to this JSON file')
+    parser.add_argument('--batch-workers',
+                        type=int,
+                        default=1,
+                        help='With --batch, process this many files at the same time, each worker '
+                             'process with its own models (CPU cores are split between them, '
+                             'and again between any --parallel-chunks processes of a worker)')
+    parser.add_argument('--batch-order',
+                        default='longest',
+                        choices=SCHEDULE_ORDERS,
+                        help='With --batch, start the longest or shortest recordings first '
+                             '(by probed duration), or keep the input order')
+    add_pipeline_arguments(parser)
+    parser.add_argument('--profile',
+                        metavar='FILE',
+                        help='Write per-stage wall/CPU time, real-time factor and peak memory '
+                             'to this JSON file (also a Chrome trace, see profiling.py)')
+    parser.add_argument('--profile-python',
+                        choices=PYTHON_PROFILERS,
+                        help='With --profile, also run each stage under cProfile '
+                             '(<FILE>.<stage>.prof) or sample Python stacks (<FILE>.folded)')
+    parser.add_argument('--profile-interval',
+                        type=float,
+                        default=0.02,
+                        help='With --profile, seconds between memory (and stack) samples')
     return parser.parse_args()
 
-def transcribe_audio(model, input_path: str):
+def transcribe_audio(model, input_path: str, audio=None, word_timestamps=False):
     logging.info(f"Transcribing {input_path} with Whisper...")
-    result = model.transcribe(input_path, word_timestamps=False)
+    # A pre-decoded 16 kHz waveform skips Whisper's own ffmpeg pass
+    result = model.transcribe(input_path if audio is None else audio,
+                              word_timestamps=word_timestamps)
     segments = result.get("segments", [])
     if not segments:
         logging.warning("No segments returned by Whisper.")
     return segments
 
-def align_and_write_csv(segments, turns, output_path: str):
+def diarize_turns(input_path: str, auth_token: str, pipeline=None, audio=None):
+    annotation = diarize_audio(audio_path=input_path, auth_token=auth_token,
+                               pipeline=pipeline, waveform=audio,
+                               sample_rate=SAMPLE_RATE)
+    return [
+        (segment.start, segment.end, speaker)
+        for segment, _, speaker in annotation.itertracks(yield_label=True)
+    ]
+
+def stage_thread_budgets(args):
+    """
+    Return (transcribe_threads, diarize_threads) for torch.set_num_threads.
+    With --pipelined the cores are split between the stages unless set
+    explicitly, so the two stages don't oversubscribe the CPU.
+    """
+    transcribe_threads = args.transcribe_threads
+    diarize_threads = args.diarize_threads
+    if args.pipelined:
+        cores = os.cpu_count() or 2
+        if transcribe_threads is None:
+            transcribe_threads = max(1, cores - (diarize_threads or cores // 2))
+        if diarize_threads is None:
+            diarize_threads = max(1, cores - transcribe_threads)
+    return transcribe_threads, diarize_threads
+
+def run_with_torch_threads(num_threads, stage, *stage_args, **stage_kwargs):
+    """Run one stage with its own torch intra-op thread budget."""
+    if num_threads:
+        import torch
+        # With the OpenMP backend this only affects the calling thread
+        torch.set_num_threads(num_threads)
+    return stage(*stage_args, **stage_kwargs)
+
+_stage_pool = None
+_whisper_models = {}
+
+def get_whisper_model(model_name: str, device: str, model_dir: str = None):
+    """
+    Load a Whisper model once per process and reuse it afterwards. On CPU
+    the weights are memory-mapped from the model folder (see models.py).
+    """
+    key = (model_name, device)
+    if key not in _whisper_models:
+        logging.info(f"Loading Whisper '{model_name}' on {device}...")
+        import_whisper()
+        with profiler.stage("whisper_load"):
+            _whisper_models[key] = load_whisper(model_name, device, model_dir)
+    return _whisper_models[key]
+
+_chunked_transcribers = {}
+
+def get_chunked_transcriber(args, transcribe_threads=None):
+    """Start (once per process) the worker pool used by --parallel-chunks."""
+    key = (args.whisper_model, args.device, args.parallel_chunks)
+    if key not in _chunked_transcribers:
+        num_threads = None
+        if transcribe_threads:
+            num_threads = max(1, transcribe_threads // args.parallel_chunks)
+        if args.device == "cpu":
+            # Download and convert once here rather than racing in every worker
+            import_whisper()
+            with profiler.stage("whisper_load"):
+                shared_whisper(args.whisper_model, args.model_dir)
+        # Workers load their models on first use, inside whisper_decode
+        _chunked_transcribers[key] = ChunkedTranscriber(
+            args.whisper_model, device=args.device, workers=args.parallel_chunks,
+            num_threads=num_threads, chunk_seconds=args.chunk_seconds,
+            sample_rate=SAMPLE_RATE, model_dir=args.model_dir)
+    return _chunked_transcribers[key]
+
+def close_chunked_transcribers():
+    """Stop the --parallel-chunks worker pools started by this process."""
+    while _chunked_transcribers:
+        _, transcriber = _chunked_transcribers.popitem()
+        transcriber.close()
+
+def open_result_cache(args):
+    """Return the ResultCache for this run, or None with --no-cache."""
+    if args.no_cache:
+        return None
+    return ResultCache(args.cache_dir, max_bytes=int(args.cache_max_mb * 1024 * 1024))
+
+_probe_caches = {}
+
+def _probe_cache(args):
+    if args.no_cache:
+        return None
+    if args.cache_dir not in _probe_caches:
+        _probe_caches[args.cache_dir] = ProbeCache(args.cache_dir)
+    return _probe_caches[args.cache_dir]
+
+def probe_input(input_path: str, args):
+    """
+    Probe an input's duration, codec and channels without decoding it.
+    Results are remembered per file in the cache folder unless --no-cache.
+    Returns None if the input cannot be probed.
+    """
+    cache = _probe_cache(args)
+    try:
+        info = probe(input_path, cache=cache,
+                     ffprobe_override=os.environ.get("FFMPEG_BINARY"))
+    except (FileNotFoundError, RuntimeError, ValueError) as e:
+        # ValueError: ffprobe printed malformed JSON
+        logging.warning(f"Could not probe {input_path}: {e}")
+        return None
+    if cache is not None:
+        cache.save()
+    return info
+
+def probe_durations(paths, args, threads=8):
+    """
+    Durations of many inputs (None where unknown), probed in parallel
+    ffprobe processes and saved to the probe cache in one write.
+    """
+    cache = _probe_cache(args)
+
+    def duration(path):
+        try:
+            return probe(path, cache=cache,
+                         ffprobe_override=os.environ.get("FFMPEG_BINARY"))["duration"]
+        except (FileNotFoundError, RuntimeError, ValueError) as e:
+            logging.warning(f"Could not probe {path}: {e}")
+            return None
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        durations = list(pool.map(duration, paths))
+    if cache is not None:
+        cache.save()
+    return durations
+
+def _completed(value):
+    future = Future()
+    future.set_result(value)
+    return future
+
+def transcribe_and_diarize(input_path: str, args, pipeline=None, cache=None):
+    """
+    Run Whisper and speaker diarization for one input.
+
+    With --pipelined, diarization runs in a background thread while Whisper
+    transcribes on the calling thread, so wall time approaches the slower
+    of the two stages instead of their sum.
+
+    Unless --decode-per-stage is given, the input is decoded once and the
+    same waveform array is shared by both stages.
+
+    With a ResultCache, segments and turns are looked up separately by the
+    input's content hash and stage options; only missing results are
+    computed (--refresh recomputes both) and new results are stored.
+
+    With --speaker-db, diarization labels are then replaced by enrolled
+    speaker names where they match (cached turns keep the raw labels, so
+    changes to the database always apply).
+
+    Returns:
+        tuple: (segments, Future resolving to the diarization turns).
+    """
+    global _stage_pool
+    transcribe_threads, diarize_threads = stage_thread_budgets(args)
+
+    segments = turns = None
+    if cache is not None:
+        content_hash = cache.content_hash(input_path)
+        transcribe_options = dict(model=args.whisper_model, device=args.device,
+                                  word_timestamps=args.word_speakers)
+        if args.parallel_chunks > 1:
+            # Chunk edges can change the segmentation slightly
+            transcribe_options["chunk_seconds"] = args.chunk_seconds
+        segments_key = cache.key(content_hash, **transcribe_options)
+        turns_key = cache.key(content_hash, pipeline=DEFAULT_PIPELINE)
+        if not args.refresh:
+            segments = cache.get("segments", segments_key)
+            turns = cache.get("turns", turns_key)
+            if segments is not None:
+                logging.info(f"Using cached Whisper segments for {input_path}")
+            if turns is not None:
+                logging.info(f"Using cached speaker turns for {input_path}")
+                turns = [tuple(turn) for turn in turns]
+
+    info = probe_input(input_path, args)
+    if info is not None:
+        logging.info(f"Input: {info['duration'] or 0:.1f}s, {info['codec']}, "
+                     f"{info['channels']} channel(s) at {info['sample_rate']} Hz")
+        profiler.note_audio(info["duration"])
+
+    chunked = args.parallel_chunks > 1
+    audio = None
+    if ((segments is None and (chunked or not args.decode_per_stage))
+            or (turns is None and not args.decode_per_stage)
+            or args.speaker_db):
+        logging.info(f"Decoding {input_path} to {SAMPLE_RATE} Hz mono...")
+        with profiler.stage("audio_decode"):
+            audio = load_audio(input_path, sample_rate=SAMPLE_RATE,
+                               ffmpeg_path_override=os.environ.get("FFMPEG_BINARY"))
+        logging.info(f"Decoded {len(audio) / SAMPLE_RATE:.1f}s of audio")
+    audio_seconds = len(audio) / SAMPLE_RATE if audio is not None else None
+    profiler.note_audio(audio_seconds)
+
+    def transcribe():
+        if chunked:
+            logging.info(f"Transcribing {input_path} with Whisper in parallel chunks...")
+            transcriber = get_chunked_transcriber(args, transcribe_threads)
+            with profiler.stage("whisper_decode", audio_seconds):
+                result = transcriber.transcribe(audio, word_timestamps=args.word_speakers)
+        else:
+            model = get_whisper_model(args.whisper_model, args.device, args.model_dir)
+            with profiler.stage("whisper_decode", audio_seconds):
+                result = run_with_torch_threads(transcribe_threads, transcribe_audio,
+                                                model, input_path, audio=audio,
+                                                word_timestamps=args.word_speakers)
+        if result:
+            profiler.note_audio(result[-1]["end"])
+        if cache is not None:
+            cache.put("segments", segments_key, result)
+        return result
+
+    def identify(result):
+        if not args.speaker_db:
+            return result
+        with profiler.stage("embedding_load"):
+            model = get_embedding_model(args.embedding_model, args.device, args.pyannote_token)
+        with profiler.stage("speaker_id", audio_seconds):
+            return run_with_torch_threads(diarize_threads, identify_speakers,
+                                          result, audio, args.speaker_db, model,
+                                          threshold=args.speaker_threshold,
+                                          index_path=args.speaker_index,
+                                          sample_rate=SAMPLE_RATE)
+
+    def diarize():
+        diarization_pipeline = pipeline
+        if diarization_pipeline is None:
+            with profiler.stage("pyannote_load"):
+                diarization_pipeline = get_pipeline(args.pyannote_token)
+        with profiler.stage("pyannote_diarize", audio_seconds):
+            result = run_with_torch_threads(diarize_threads, diarize_turns,
+                                            input_path, args.pyannote_token,
+                                            pipeline=diarization_pipeline, audio=audio)
+        if cache is not None:
+            cache.put("turns", turns_key, result)
+        return identify(result)
+
+    diarization = None
+    if turns is not None:
+        diarization = _completed(identify(turns))
+    elif args.pipelined and segments is None:
+        if _stage_pool is None:
+            _stage_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="diarize")
+        logging.info(f"Pipelined run: {transcribe_threads} thread(s) for Whisper, "
+                     f"{diarize_threads} for diarization")
+        diarization = _stage_pool.submit(diarize)
+
+    if segments is None:
+        segments = transcribe()
+
+    if diarization is None:
+        diarization = Future()
+        try:
+            diarization.set_result(diarize())
+        except Exception as e:
+            diarization.set_exception(e)
+    return segments, diarization
+
+def aligned_rows(segments, turns, by_word=False):
+    """
+    Yield (start, end, speaker, text) rows, labelling each segment with the
+    speaker holding its midpoint. With by_word, each word is labelled instead
+    and segments are split into one row per run of words from the same
+    speaker (see aligner.py).
+    """
+    if by_word:
+        for piece in split_by_speaker(segments, SpeakerTimeline(turns)):
+            yield float(piece["start"]), float(piece["end"]), piece["speaker"], piece["text"]
+        return
+    index = TurnIndex(turns)
+    speakers = index.midpoint_speakers([seg["start"] for seg in segments],
+                                       [seg["end"] for seg in segments],
+                                       default="unknown")
+    for seg, assigned in zip(segments, speakers):
+        yield float(seg["start"]), float(seg["end"]), assigned, seg["text"].strip()
+
+def open_output(output_path: str, output_format=None):
+    """Open the sink for a transcript; CSV times keep two decimals."""
+    return open_sink(output_path, output_format, float_format="{:.2f}")
+
+def align_and_write(segments, turns, output_path: str, output_format=None, by_word=False):
     logging.info(f"Writing aligned transcript to {output_path}...")
-    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
-    
-    with open(output_path, "w", newline="", encoding="utf-8") as csvfile:
-        writer = csv.writer(csvfile)
-        writer.writerow(["start", "end", "speaker", "text"])
-        for seg in segments:
-            start = seg["start"]
-            end = seg["end"]
-            text = seg["text"].strip()
-            midpoint = (start + end) / 2.0
-            assigned = "unknown"
-            for turn_start, turn_end, speaker in turns:
-                if turn_start <= midpoint <= turn_end:
-                    assigned = speaker
-                    break
-            writer.writerow([f"{start:.2f}", f"{end:.2f}", assigned, text])
-    logging.info("CSV writing complete.")
+    # The sink writes next to the target and renames when done, so an existing
+    # output is always complete (batch mode relies on this to skip finished files).
+    with profiler.stage("output_write"):
+        with open_output(output_path, output_format) as sink:
+            sink.write_rows(aligned_rows(segments, turns, by_word=by_word))
+    logging.info("Output writing complete.")
+
+def stream_and_write(input_path: str, output_path: str, args, pipeline=None,
+                     output_format=None):
+    """
+    Transcribe, diarize and write the output one window at a time.
+
+    Rows are appended and flushed to <output>.part as each window finishes,
+    so memory stays bounded by a window and, for CSV and JSONL, the rows
+    written so far survive a crash; the file is renamed to the output path
+    once the whole input is done.
+    """
+    logging.info(f"Streaming {input_path} to {output_path} "
+                 f"in {args.window_seconds:.0f}s windows...")
+    transcribe_threads, diarize_threads = stage_thread_budgets(args)
+    model = get_whisper_model(args.whisper_model, args.device, args.model_dir)
+    linker = SpeakerLinker()
+    prompt = None
+    info = probe_input(input_path, args)
+    total = f" of {info['duration']:.0f}s" if info and info["duration"] else ""
+
+    with open_output(output_path, output_format) as sink:
+        sink.flush(sync=True)
+        windows = iter_windows(input_path, args.window_seconds, args.window_overlap,
+                               sample_rate=SAMPLE_RATE,
+                               ffmpeg_path_override=os.environ.get("FFMPEG_BINARY"))
+        for window_start, context_start, audio in windows:
+            # A view of the new part of the window, no copy
+            window_audio = audio[int(round((window_start - context_start) * SAMPLE_RATE)):]
+            window_seconds = len(window_audio) / SAMPLE_RATE
+            logging.info(f"Window at {window_start:.0f}s{total} "
+                         f"({window_seconds:.0f}s of audio)")
+
+            with profiler.stage("whisper_decode", window_seconds):
+                result = run_with_torch_threads(transcribe_threads, model.transcribe,
+                                                window_audio, word_timestamps=args.word_speakers,
+                                                initial_prompt=prompt)
+            segments = [dict(seg, start=seg["start"] + window_start,
+                             end=seg["end"] + window_start,
+                             words=[dict(word, start=word["start"] + window_start,
+                                         end=word["end"] + window_start)
+                                    for word in seg.get("words") or []])
+                        for seg in result.get("segments", [])]
+            if segments:
+                prompt = segments[-1]["text"].strip()
+
+            with profiler.stage("pyannote_diarize", len(audio) / SAMPLE_RATE):
+                local_turns = run_with_torch_threads(diarize_threads, diarize_turns,
+                                                     input_path, args.pyannote_token,
+                                                     pipeline=pipeline, audio=audio)
+            turns = linker.link([(start + context_start, end + context_start, speaker)
+                                 for start, end, speaker in local_turns],
+                                context_start, window_start)
+            linker.remember(turns, window_start + args.window_seconds - args.window_overlap)
+            if args.speaker_db:
+                embedding_model = get_embedding_model(args.embedding_model, args.device,
+                                                      args.pyannote_token)
+                with profiler.stage("speaker_id", len(audio) / SAMPLE_RATE):
+                    named = identify_speakers([(start - context_start, end - context_start,
+                                                speaker) for start, end, speaker in turns],
+                                              audio, args.speaker_db, embedding_model,
+                                              threshold=args.speaker_threshold,
+                                              index_path=args.speaker_index,
+                                              sample_rate=SAMPLE_RATE)
+                turns = [(start + context_start, end + context_start, speaker)
+                         for start, end, speaker in named]
+
+            with profiler.stage("output_write"):
+                sink.write_rows(aligned_rows(segments, turns, by_word=args.word_speakers))
+                sink.flush(sync=True)
+    logging.info("Output writing complete.")
+
+def load_resident_models(args):
+    """
+    Load Whisper (or start the --parallel-chunks workers) and the diarization
+    pipeline up front, for runs that process many files with one copy.
+
+    Returns:
+        The diarization pipeline, to pass on to process_file().
+    """
+    if args.parallel_chunks > 1 and not args.stream:
+        get_chunked_transcriber(args, stage_thread_budgets(args)[0])
+    else:
+        get_whisper_model(args.whisper_model, args.device, args.model_dir)
+    with profiler.stage("pyannote_load"):
+        return get_pipeline(args.pyannote_token)
+
+def process_file(input_path: str, output_path: str, args, pipeline=None, cache=None,
+                 output_format=None):
+    """
+    Transcribe, diarize and write the output for one input (streamed with
+    --stream); the format follows the output's extension unless given.
+    """
+    if args.stream:
+        stream_and_write(input_path, output_path, args, pipeline=pipeline,
+                         output_format=output_format)
+        return
+    segments, turns = transcribe_and_diarize(input_path, args, pipeline=pipeline,
+                                             cache=cache)
+    align_and_write(segments, turns.result(), output_path, output_format=output_format,
+                    by_word=args.word_speakers)
+
+def run_batch_mode(args):
+    """Process every input matched by --batch with one resident copy of each model."""
+    inputs = collect_inputs(args.batch)
+    if not inputs:
+        logging.error(f"No input files found for: {args.batch}")
+        return 1
+    try:
+        plan = plan_outputs(inputs, args.output, FORMATS[args.output_format or "csv"])
+    except ValueError as e:
+        logging.error(f"Cannot plan batch outputs: {e}")
+        return 1
+    logging.info(f"Batch of {len(plan)} file(s) -> {args.output}")
+
+    # Only the files that will be processed are probed (and scheduled)
+    todo = [os.path.isfile(input_path) and (args.overwrite or not os.path.isfile(output_path))
+            for input_path, output_path in plan]
+    with profiler.stage("probe"):
+        probed = iter(probe_durations([p for (p, _), run in zip(plan, todo) if run], args))
+    plan, durations = order_plan(plan, [next(probed) if run else None for run in todo],
+                                 args.batch_order)
+
+    workers = max(1, args.batch_workers)
+    if workers > 1:
+        # Each worker process loads its own models on its first file
+        from workers import WorkerPool
+        pool = WorkerPool(args, workers)
+        process = pool.process
+    else:
+        pool = None
+        pipeline = load_resident_models(args)
+        cache = open_result_cache(args)
+
+        def process(input_path, output_path):
+            process_file(input_path, output_path, args, pipeline=pipeline, cache=cache,
+                         output_format=args.output_format)
+
+    try:
+        results = run_batch(plan, process, overwrite=args.overwrite, workers=workers,
+                            durations=durations)
+    finally:
+        if pool is not None:
+            pool.close()
+    failed = report_summary(results, args.batch_summary)
+    return 1 if failed else 0
 
 def main():
     setup_logger()
     
-    # Configure FFmpeg before anything else
-    ffmpeg_path = configure_ffmpeg()
-    logging.info(f"Using FFmpeg from: {ffmpeg_path}")
-    
+    # Arguments and the input are checked before FFmpeg is looked for, and
+    # the models (with torch) are only imported once a stage needs them
     args = parse_args()
+    if args.profile:
+        profiler.enable(args.profile_python, args.profile_interval)
+        atexit.register(profiler.write, args.profile)
+    # Before pyannote (huggingface_hub) is first imported
+    use_local_models(args.model_dir, offline=args.offline)
 
-    if not os.path.isfile(args.input):
+    if not args.batch and not os.path.isfile(args.input):
         logging.error(f"Input file not found: {args.input}")
         sys.exit(1)
 
-    # 1) Load Whisper and transcribe
-    logging.info(f"Loading Whisper '{args.whisper_model}' on {args.device}...")
-    whisper_model = whisper.load_model(args.whisper_model, device=args.device)
-    segments = transcribe_audio(whisper_model, args.input)
+    # Configure FFmpeg before any processing
+    with profiler.stage("ffmpeg_discovery"):
+        ffmpeg_path = configure_ffmpeg()
+    logging.info(f"Using FFmpeg from: {ffmpeg_path}")
+
+    if args.batch:
+        sys.exit(run_batch_mode(args))
+
+    if args.stream:
+        try:
+            stream_and_write(args.input, args.output, args, output_format=args.output_format)
+        except Exception as e:
+            logging.error(f"Streaming run failed: {e}")
+            sys.exit(1)
+        logging.info("TranscribblerApp finished successfully.")
+        return
+
+    # 1) Load Whisper and transcribe (skipped when the result cache has it)
+    segments, diarization = transcribe_and_diarize(args.input, args,
+                                                   cache=open_result_cache(args))
 
-    # 2) Run speaker diarization
+    # 2) Run speaker diarization (already running alongside Whisper with --pipelined)
     try:
-        annotation = diarize_audio(audio_path=args.input, auth_token=args.pyannote_token)
-        turns = [
-            (segment.start, segment.end, speaker)
-            for segment, _, speaker in annotation.itertracks(yield_label=True)
-        ]
+        turns = diarization.result()
     except Exception as e:
         logging.error(f"Diarization failed: {e}")
         sys.exit(1)
 
-    # 3) Align segments to speaker turns and write CSV
+    # 3) Align segments to speaker turns and write the output
     try:
-        align_and_write_csv(segments, turns, args.output)
+        align_and_write(segments, turns, args.output, output_format=args.output_format,
+                        by_word=args.word_speakers)
     except Exception as e:
-        logging.error(f"Failed to write CSV: {e}")
+        logging.error(f"Failed to write output: {e}")
         sys.exit(1)
 
     logging.info("TranscribblerApp finished successfully.")
 
 if __name__ == "__main__":
+    # Needed for --parallel-chunks worker processes in the frozen Windows build
+    multiprocessing.freeze_support()
     main()
\ No newline at end of file
@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+"""
+media.py: FFmpeg/ffprobe discovery, media probing and the WAV fast path.
+
+find_tool() is the one place that looks for ffmpeg and ffprobe (main.py
+and audio_extract.py both use it) and remembers the answer per process.
+
+probe() returns duration, container, codec, sample rate and channels of
+an input. WAV headers are parsed directly; anything else goes through
+ffprobe. Results are kept in a small JSON file in the cache folder,
+keyed by path and validated by size and mtime, so planning and progress
+estimates never need to decode or re-probe an unchanged file.
+
+Inputs that already are 16-bit PCM mono WAV at the wanted rate are not
+decoded by FFmpeg at all: map_pcm_wav() memory-maps their sample data.
+"""
+
+import json
+import logging
+import os
+import shutil
+import struct
+import subprocess
+import sys
+import tempfile
+import threading
+
+import numpy as np
+
+WAVE_FORMAT_PCM = 0x0001
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+PROBE_FILE = "probes.json"
+
+
+# --- toolchain -----------------------------------------------------------------
+
+_tools = {}
+_tools_lock = threading.Lock()
+
+
+def _executable(name):
+    return name + ".exe" if os.name == "nt" else name
+
+
+def _app_dirs():
+    """Folders a bundled or installed copy of the tools can live in."""
+    dirs = []
+    if getattr(sys, "_MEIPASS", None):
+        dirs += [sys._MEIPASS, os.path.join(sys._MEIPASS, "bin")]
+    if getattr(sys, "frozen", False):
+        app_dir = os.path.dirname(sys.executable)
+    else:
+        app_dir = os.path.dirname(os.path.abspath(__file__))
+    dirs += [app_dir, os.path.join(app_dir, "bin")]
+    if os.name == "nt":
+        dirs += [r"C:\Program Files (x86)\TranscribblerApp",
+                 r"C:\Program Files\TranscribblerApp"]
+    return dirs
+
+
+def _resolve(name, override):
+    exe = _executable(name)
+    candidates = []
+    if override:
+        # An override may name ffmpeg itself; ffprobe is expected beside it
+        candidates.append(override if name == "ffmpeg" or os.path.isdir(override)
+                          else os.path.join(os.path.dirname(override), exe))
+    if os.environ.get("FFMPEG_BINARY"):
+        ffmpeg_binary = os.environ["FFMPEG_BINARY"]
+        candidates.append(ffmpeg_binary if name == "ffmpeg"
+                          else os.path.join(os.path.dirname(ffmpeg_binary), exe))
+    candidates += [os.path.join(d, exe) for d in _app_dirs()]
+    for candidate in candidates:
+        if os.path.isdir(candidate):
+            candidate = os.path.join(candidate, exe)
+        if os.path.isfile(candidate):
+            return candidate
+    return shutil.which(name)
+
+
+def find_tool(name, override=None):
+    """
+    Locate an FFmpeg tool ("ffmpeg" or "ffprobe"), once per process.
+
+    Looks at the override, then next to $FFMPEG_BINARY, the bundle and
+    application folders (and their bin subfolder), the install folders on
+    Windows, and finally PATH.
+
+    Returns:
+        str: Path to the executable, or None if it was not found.
+    """
+    key = (name, override)
+    with _tools_lock:
+        if key not in _tools:
+            path = _resolve(name, override)
+            if path:
+                logging.info(f"Found {name} at: {path}")
+            _tools[key] = path
+        return _tools[key]
+
+
+def clear_tool_cache():
+    """Forget resolved tool paths (e.g. after installing FFmpeg)."""
+    with _tools_lock:
+        _tools.clear()
+
+
+# --- WAV fast path -------------------------------------------------------------
+
+def read_wav_header(path):
+    """
+    Parse a RIFF/WAVE header without decoding.
+
+    Returns:
+        dict: format_tag, channels, sample_rate, bits_per_sample, data_offset
+            and data_bytes (clamped to the file size), or None if the file is
+            not a WAV file this parser understands.
+    """
+    try:
+        f = open(path, "rb")
+    except OSError:
+        return None
+    with f:
+        head = f.read(12)
+        if len(head) < 12 or head[:4] != b"RIFF" or head[8:12] != b"WAVE":
+            return None
+        file_size = os.fstat(f.fileno()).st_size
+        fmt = None
+        while True:
+            chunk = f.read(8)
+            if len(chunk) < 8:
+                return None
+            chunk_id, size = struct.unpack("<4sI", chunk)
+            if chunk_id == b"fmt ":
+                body = f.read(size)
+                if len(body) < 16:
+                    return None
+                tag, channels, rate, _, _, bits = struct.unpack_from("<HHIIHH", body)
+                if tag == WAVE_FORMAT_EXTENSIBLE and len(body) >= 26:
+                    # The real format is the first two bytes of the SubFormat GUID
+                    tag = struct.unpack_from("<H", body, 24)[0]
+                fmt = {"format_tag": tag, "channels": channels,
+                       "sample_rate": rate, "bits_per_sample": bits}
+                if size % 2:
+                    f.seek(1, os.SEEK_CUR)
+            elif chunk_id == b"data":
+                if fmt is None:
+                    return None
+                offset = f.tell()
+                # Streamed WAVs may leave the size at 0 or 0xFFFFFFFF
+                data_bytes = size if 0 < size <= file_size - offset else file_size - offset
+                return dict(fmt, data_offset=offset, data_bytes=data_bytes)
+            else:
+                f.seek(size + size % 2, os.SEEK_CUR)
+
+
+def is_pcm_wav(header, sample_rate=16000):
+    """True if a read_wav_header() result can be used without decoding."""
+    return (header is not None and header["format_tag"] == WAVE_FORMAT_PCM
+            and header["channels"] == 1 and header["bits_per_sample"] == 16
+            and header["sample_rate"] == sample_rate)
+
+
+def map_pcm_wav(path, sample_rate=16000, header=None):
+    """
+    Memory-map the samples of a 16-bit mono PCM WAV at sample_rate.
+
+    Returns:
+        numpy.memmap: Read-only int16 samples, or None if the file needs
+            decoding (other format, rate or channel count).
+    """
+    header = header or read_wav_header(path)
+    if not is_pcm_wav(header, sample_rate):
+        return None
+    n_samples = header["data_bytes"] // 2
+    if n_samples == 0:
+        return np.zeros(0, dtype=np.int16)
+    return np.memmap(path, dtype="<i2", mode="r", offset=header["data_offset"],
+                     shape=(n_samples,))
+
+
+# --- probing ---------------------------------------------------------------------
+
+class ProbeCache:
+    """
+    Probe results per file in one JSON file, keyed by absolute path and
+    only trusted while the file's size and mtime are unchanged. save()
+    merges this process's new entries into the file under a lock, so
+    processes probing at the same time keep each other's results.
+    """
+
+    def __init__(self, root=None):
+        from result_cache import default_cache_dir
+        # Kept in its own folder, outside the result cache's entry layout
+        self.path = os.path.join(root or default_cache_dir(), "probes", PROBE_FILE)
+        self._entries = None
+        self._changed = {}
+        self._lock = threading.Lock()
+
+    def _read(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logging.warning(f"Ignoring unreadable probe cache {self.path}: {e}")
+            return {}
+
+    def _load(self):
+        if self._entries is None:
+            self._entries = self._read()
+        return self._entries
+
+    @staticmethod
+    def _identity(path):
+        st = os.stat(path)
+        return os.path.abspath(path), st.st_size, st.st_mtime_ns
+
+    def get(self, path):
+        key, size, mtime = self._identity(path)
+        with self._lock:
+            entry = self._load().get(key)
+        if entry and entry["size"] == size and entry["mtime_ns"] == mtime:
+            return entry["info"]
+        return None
+
+    def put(self, path, info):
+        key, size, mtime = self._identity(path)
+        with self._lock:
+            entry = {"size": size, "mtime_ns": mtime, "info": info}
+            self._load()[key] = self._changed[key] = entry
+
+    def save(self):
+        """Merge new entries into the file on disk and write it atomically."""
+        from result_cache import lock_file, unlock_file
+        with self._lock:
+            if not self._changed:
+                return
+            folder = os.path.dirname(self.path)
+            os.makedirs(folder, exist_ok=True)
+            lock = lock_file(self.path + ".lock")
+            try:
+                entries = self._read()
+                entries.update(self._changed)
+                fd, tmp_path = tempfile.mkstemp(dir=folder, suffix=".tmp")
+                try:
+                    with os.fdopen(fd, "w", encoding="utf-8") as f:
+                        json.dump(entries, f, separators=(",", ":"))
+                    os.replace(tmp_path, self.path)
+                except BaseException:
+                    if os.path.exists(tmp_path):
+                        os.remove(tmp_path)
+                    raise
+            finally:
+                unlock_file(lock)
+            self._entries = entries
+            self._changed = {}
+
+
+def _probe_wav(header):
+    rate = header["sample_rate"]
+    frame_bytes = max(1, header["channels"] * header["bits_per_sample"] // 8)
+    codec = (f"pcm_s{header['bits_per_sample']}le"
+             if header["format_tag"] == WAVE_FORMAT_PCM else f"wav_0x{header['format_tag']:04x}")
+    return {
+        "duration": header["data_bytes"] / frame_bytes / rate if rate else None,
+        "format_name": "wav",
+        "codec": codec,
+        "sample_rate": rate,
+        "channels": header["channels"],
+    }
+
+
+def _probe_ffprobe(path, ffprobe):
+    command = [ffprobe, "-v", "error", "-select_streams", "a:0",
+               "-show_entries", "format=duration,format_name"
+               ":stream=codec_name,sample_rate,channels,duration",
+               "-of", "json", path]
+    result = subprocess.run(command, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"ffprobe failed on {path}: {result.stderr.strip()}")
+    data = json.loads(result.stdout or "{}")
+    fmt = data.get("format", {})
+    stream = (data.get("streams") or [{}])[0]
+    duration = fmt.get("duration") or stream.get("duration")
+    return {
+        "duration": float(duration) if duration not in (None, "N/A") else None,
+        "format_name": fmt.get("format_name"),
+        "codec": stream.get("codec_name"),
+        "sample_rate": int(stream["sample_rate"]) if stream.get("sample_rate") else None,
+        "channels": stream.get("channels"),
+    }
+
+
+def probe(path, cache=None, ffprobe_override=None):
+    """
+    Describe a media file without decoding it.
+
+    Args:
+        path (str): Input file.
+        cache (ProbeCache, optional): Where to look up and remember results
+            (call cache.save() to persist them).
+        ffprobe_override (str, optional): ffprobe (or ffmpeg) path to use.
+
+    Returns:
+        dict: duration (seconds, or None if unknown), format_name, codec,
+            sample_rate and channels (None without an audio stream).
+
+    Raises:
+        FileNotFoundError: If the input is not a WAV file and ffprobe
+            cannot be located.
+        RuntimeError: If ffprobe cannot read the input.
+    """
+    if cache is not None:
+        info = cache.get(path)
+        if info is not None:
+            return info
+    header = read_wav_header(path)
+    if header is not None:
+        info = _probe_wav(header)
+    else:
+        ffprobe = find_tool("ffprobe", ffprobe_override)
+        if not ffprobe:
+            raise FileNotFoundError("ffprobe executable could not be located. Cannot probe media.")
+        info = _probe_ffprobe(path, ffprobe)
+    if cache is not None:
+        cache.put(path, info)
+    return info
@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+"""
+models.py: local model asset manager.
+
+Keeps the Whisper checkpoints and pyannote pipelines in one known folder
+($TRANSCRIBBLER_MODELS, else <cache dir>/models) so the app can run
+offline once `python models.py fetch` has been run:
+
+    <root>/whisper/<name>.pt        checkpoint as published (SHA-256 checked)
+    <root>/whisper/<name>.f32.pt    float32 copy in torch's zip format
+    <root>/huggingface/             Hugging Face hub cache for pyannote
+    <root>/whisper_assets/          whisper's package assets (mel filters,
+                                    tokenizers) for the frozen build
+
+load_whisper() loads the float32 copy with torch.load(mmap=True) and
+assigns the mapped tensors to the model instead of copying them, so the
+weights stay in the page cache and every process on the host that loads
+the same model (e.g. --parallel-chunks workers) shares one physical copy.
+Load times are recorded per model in load_times.
+"""
+
+import hashlib
+import logging
+import os
+import shutil
+import time
+
+from result_cache import default_cache_dir
+
+load_times = {}
+
+
+def default_model_dir():
+    """Model folder: $TRANSCRIBBLER_MODELS, else <cache dir>/models."""
+    return os.environ.get("TRANSCRIBBLER_MODELS") or os.path.join(default_cache_dir(), "models")
+
+
+def _sha256(path, block_size=1024 * 1024):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+# --- Whisper -----------------------------------------------------------------
+
+def whisper_paths(name, root=None):
+    """Return (checkpoint path, float32 copy path, expected SHA-256) for a model."""
+    import whisper
+    if name not in whisper._MODELS:
+        raise ValueError(f"Unknown Whisper model: {name}")
+    url = whisper._MODELS[name]
+    folder = os.path.join(root or default_model_dir(), "whisper")
+    # Whisper's download URLs embed the checkpoint's SHA-256
+    return (os.path.join(folder, os.path.basename(url)),
+            os.path.join(folder, f"{name}.f32.pt"),
+            url.split("/")[-2])
+
+
+def verify_whisper(name, root=None):
+    """True if the checkpoint for name is present and matches its SHA-256."""
+    checkpoint, _, expected = whisper_paths(name, root)
+    return os.path.isfile(checkpoint) and _sha256(checkpoint) == expected
+
+
+def _offline():
+    """True when downloads are forbidden (--offline sets HF_HUB_OFFLINE)."""
+    return os.environ.get("HF_HUB_OFFLINE", "").strip().lower() in ("1", "true", "yes", "on")
+
+
+def _require_checkpoint(name, checkpoint):
+    if not os.path.isfile(checkpoint):
+        raise FileNotFoundError(f"Whisper '{name}' is not in {os.path.dirname(checkpoint)} and "
+                                f"downloads are disabled; run `python models.py fetch "
+                                f"--whisper-model {name}` first")
+
+
+def _write_shared(name, checkpoint, shared):
+    import torch
+    logging.info(f"Writing float32 copy of Whisper '{name}' to {shared}")
+    state = torch.load(checkpoint, map_location="cpu")
+    state["model_state_dict"] = {key: value.float() if value.is_floating_point() else value
+                                 for key, value in state["model_state_dict"].items()}
+    tmp_path = f"{shared}.{os.getpid()}.tmp"
+    torch.save(state, tmp_path)
+    os.replace(tmp_path, shared)
+    return shared
+
+
+def _shared_is_current(checkpoint, shared):
+    return os.path.isfile(shared) and (not os.path.isfile(checkpoint)
+                                       or os.path.getmtime(shared) >= os.path.getmtime(checkpoint))
+
+
+def fetch_whisper(name, root=None):
+    """
+    Download (if needed) and verify a Whisper checkpoint, then write the
+    float32 copy that load_whisper() memory-maps. When offline the
+    checkpoint must already be present and is only verified.
+
+    Returns:
+        str: Path of the float32 copy.
+    """
+    import whisper
+    checkpoint, shared, _ = whisper_paths(name, root)
+    if _offline():
+        _require_checkpoint(name, checkpoint)
+        if not verify_whisper(name, root):
+            raise RuntimeError(f"Whisper checkpoint {checkpoint} does not match its SHA-256 "
+                               f"and cannot be re-downloaded offline")
+    else:
+        # whisper's own downloader checks the SHA-256 and re-downloads on mismatch
+        whisper._download(whisper._MODELS[name], os.path.dirname(checkpoint), False)
+    if _shared_is_current(checkpoint, shared):
+        return shared
+    return _write_shared(name, checkpoint, shared)
+
+
+def shared_whisper(name, root=None):
+    """
+    Path of the float32 copy for loading, without re-hashing the checkpoint.
+
+    The copy is used as is while it is newer than the checkpoint and is
+    rebuilt from a present checkpoint otherwise; only a missing checkpoint
+    goes through fetch_whisper() (and so fails when offline).
+    """
+    checkpoint, shared, _ = whisper_paths(name, root)
+    if _shared_is_current(checkpoint, shared):
+        return shared
+    if os.path.isfile(checkpoint):
+        return _write_shared(name, checkpoint, shared)
+    return fetch_whisper(name, root)
+
+
+def load_whisper(name, device="cpu", root=None):
+    """
+    Load a Whisper model, sharing its weights between processes on CPU.
+
+    On CPU the float32 copy is memory-mapped (built or fetched first if
+    missing) and its tensors become the model's parameters without a copy.
+    The checkpoint is not re-verified here; that is left to fetch and
+    status. On other devices, or with a torch too old for mmap/assign
+    loading, this falls back to whisper.load_model with the checkpoint in
+    the model folder.
+    """
+    import torch
+    import whisper
+    started = time.perf_counter()
+    model = None
+    if device == "cpu":
+        try:
+            shared = shared_whisper(name, root)
+            state = torch.load(shared, map_location="cpu", mmap=True)
+            model = whisper.model.Whisper(whisper.model.ModelDimensions(**state["dims"]))
+            # assign=True keeps the mapped tensors; the fresh ones are freed
+            model.load_state_dict(state["model_state_dict"], assign=True)
+            model.set_alignment_heads(whisper._ALIGNMENT_HEADS[name])
+            shared_weights = True
+        except (TypeError, RuntimeError, NotImplementedError) as e:
+            logging.warning(f"Memory-mapped load of Whisper '{name}' failed ({e}); "
+                            f"loading a private copy")
+            model = None
+    if model is None:
+        checkpoint = whisper_paths(name, root)[0]
+        if _offline():
+            _require_checkpoint(name, checkpoint)
+        folder = os.path.dirname(checkpoint)
+        model = whisper.load_model(name, device=device, download_root=folder)
+        shared_weights = False
+    load_times[f"whisper/{name}"] = elapsed = time.perf_counter() - started
+    logging.info(f"Loaded Whisper '{name}' on {device} in {elapsed:.2f}s"
+                 + (" (memory-mapped, shared)" if shared_weights else ""))
+    return model
+
+
+def copy_whisper_assets(destination=None):
+    """Copy whisper's package assets (mel filters, tokenizers) for bundling."""
+    import whisper
+    source = os.path.join(os.path.dirname(whisper.__file__), "assets")
+    destination = destination or os.path.join(default_model_dir(), "whisper_assets")
+    shutil.copytree(source, destination, dirs_exist_ok=True)
+    return destination
+
+
+# --- pyannote ----------------------------------------------------------------
+
+def hf_cache_dir(root=None):
+    return os.path.join(root or default_model_dir(), "huggingface")
+
+
+def use_local_models(root=None, offline=False):
+    """
+    Point the Hugging Face hub at the model folder once it has been filled
+    by fetch_pyannote(), and with offline=True forbid network access. Must
+    run before pyannote (huggingface_hub) is imported.
+
+    pyannote 3.x passes its own cache folder ($PYANNOTE_CACHE) to the hub
+    explicitly, overriding HF_HUB_CACHE, so both are set.
+    """
+    cache = hf_cache_dir(root)
+    if offline or os.path.isdir(cache):
+        os.environ.setdefault("HF_HUB_CACHE", cache)
+        os.environ.setdefault("PYANNOTE_CACHE", cache)
+    if offline:
+        os.environ.setdefault("HF_HUB_OFFLINE", "1")
+
+
+def _pipeline_models(config_path):
+    """Model repos a pyannote pipeline config refers to."""
+    import yaml
+    with open(config_path, encoding="utf-8") as f:
+        params = (yaml.safe_load(f).get("pipeline") or {}).get("params") or {}
+    return [value for key, value in params.items()
+            if key in ("segmentation", "embedding") and isinstance(value, str)
+            and "/" in value and not os.path.exists(value)]
+
+
+def fetch_pyannote(pipeline_name, auth_token=None, root=None, local_only=False):
+    """
+    Download (or with local_only, verify) a pyannote pipeline and the
+    models its config refers to into the local hub cache.
+
+    Returns:
+        list: Repo ids that are now cached.
+
+    Raises:
+        Exception: From huggingface_hub if a repo is missing (local_only) or
+            cannot be downloaded.
+    """
+    from huggingface_hub import snapshot_download
+    cache = hf_cache_dir(root)
+    repo, _, revision = pipeline_name.partition("@")
+    folder = snapshot_download(repo, revision=revision or None, token=auth_token,
+                               cache_dir=cache, local_files_only=local_only)
+    repos = [repo]
+    config = os.path.join(folder, "config.yaml")
+    if os.path.isfile(config):
+        for model in _pipeline_models(config):
+            model_repo, _, model_revision = model.partition("@")
+            snapshot_download(model_repo, revision=model_revision or None, token=auth_token,
+                              cache_dir=cache, local_files_only=local_only)
+            repos.append(model_repo)
+    return repos
+
+
+def timed_pipeline_load(auth_token, pipeline_name, device=None):
+    """Load a pyannote pipeline and record its load time."""
+    from diarize import load_pipeline
+    started = time.perf_counter()
+    pipeline = load_pipeline(auth_token, pipeline_name, device=device)
+    load_times[f"pyannote/{pipeline_name}"] = elapsed = time.perf_counter() - started
+    logging.info(f"Loaded pipeline '{pipeline_name}' in {elapsed:.2f}s")
+    return pipeline
+
+
+# --- report ------------------------------------------------------------------
+
+def status(root=None, whisper_models=(), pipelines=(), auth_token=None):
+    """Return one (kind, name, state, size in bytes) row per asset."""
+    rows = []
+    for name in whisper_models:
+        checkpoint, shared, _ = whisper_paths(name, root)
+        if not os.path.isfile(checkpoint):
+            state = "missing"
+        else:
+            state = "ok" if verify_whisper(name, root) else "CORRUPT"
+            if state == "ok" and not os.path.isfile(shared):
+                state = "ok (no shared copy)"
+        size = sum(os.path.getsize(p) for p in (checkpoint, shared) if os.path.isfile(p))
+        rows.append(("whisper", name, state, size))
+    for name in pipelines:
+        try:
+            fetch_pyannote(name, auth_token, root, local_only=True)
+            state = "ok"
+        except Exception:
+            state = "missing"
+        rows.append(("pyannote", name, state, None))
+    return rows
+
+
+def main():
+    import configargparse
+    from diarize import DEFAULT_PIPELINE
+    p = configargparse.ArgParser(description="Manage local Whisper and pyannote model assets")
+    p.add_argument("--model-dir", help="Model folder (default: $TRANSCRIBBLER_MODELS "
+                                       "or <cache dir>/models)")
+    p.add_argument("--whisper-model", action="append", default=None,
+                   help="Whisper model to act on (repeatable; default: base)")
+    p.add_argument("--pipeline", action="append", default=None,
+                   help=f"pyannote pipeline to act on (repeatable; default: {DEFAULT_PIPELINE})")
+    p.add_argument("--pyannote-token", env_var="PYANNOTE_AUTH_TOKEN",
+                   help="Hugging Face token for pyannote.audio")
+    p.add_argument("--device", default="cpu", help="Device for the load command")
+    p.add_argument("command", choices=["status", "fetch", "load", "assets"],
+                   help="status: check the cache; fetch: download and verify; "
+                        "load: time loading each model; assets: copy whisper's package assets")
+    args = p.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s",
+                        datefmt="%H:%M:%S")
+    root = args.model_dir or default_model_dir()
+    whisper_models = args.whisper_model or ["base"]
+    pipelines = args.pipeline or [DEFAULT_PIPELINE]
+    use_local_models(root, offline=args.command in ("status", "load"))
+
+    if args.command == "fetch":
+        for name in whisper_models:
+            print(f"whisper/{name}: {fetch_whisper(name, root)}")
+        for name in pipelines:
+            print(f"pyannote/{name}: {', '.join(fetch_pyannote(name, args.pyannote_token, root))}")
+    elif args.command == "assets":
+        print(f"Copied whisper assets to {copy_whisper_assets()}")
+    elif args.command == "load":
+        for name in whisper_models:
+            load_whisper(name, args.device, root)
+        for name in pipelines:
+            timed_pipeline_load(args.pyannote_token, name, device=args.device)
+        for key, seconds in load_times.items():
+            print(f"{key:<45} {seconds:8.2f}s")
+    else:
+        print(f"Model folder: {root}")
+        for kind, name, state, size in status(root, whisper_models, pipelines,
+                                              args.pyannote_token):
+            size = f"{size / 2**20:8.1f} MB" if size else ""
+            print(f"  {kind:<9} {name:<40} {state:<20} {size}")
+
+
+if __name__ == "__main__":
+    main()
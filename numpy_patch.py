@@ -1,2 +0,0 @@
-# Empty numpy patch - issue already fixed in code
-print("NumPy patch loaded (no-op)")
\ No newline at end of file
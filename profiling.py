@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+"""
+profiling.py: per-stage timing and memory profile of a main.py run.
+
+main.py wraps each stage (ffmpeg discovery, decoding, model loads,
+Whisper, pyannote, speaker identification, output writing) in
+`profiler.stage(name)`. The module-level profiler does nothing until
+enable() is called (main.py --profile), so unprofiled runs only pay for
+an attribute check.
+
+When enabled, every stage records its wall time, process CPU time and
+the peak resident memory seen while it ran (a background thread samples
+RSS). Stages that run concurrently (--pipelined) overlap in wall time
+and share the process CPU counter. Optionally each stage is also run
+under cProfile (one .prof file per stage name) or sampled: the same
+background thread records the Python stack of every thread inside a
+stage, written as folded stacks for flame graph tools.
+
+write() produces one JSON file that is both a report (per-stage totals,
+real-time factors) and a Chrome trace: load it in chrome://tracing or
+https://ui.perfetto.dev to see the stages on a timeline per thread with
+the RSS curve underneath.
+"""
+
+import contextlib
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+
+PYTHON_PROFILERS = ("cprofile", "sample")
+
+
+def current_rss_bytes():
+    """Resident set size of this process, or None if it cannot be read."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import psutil
+    except ImportError:
+        pass
+    else:
+        return psutil.Process().memory_info().rss
+    try:
+        import resource
+    except ImportError:
+        return None
+    # Only the peak is available here; still bounds each stage from above
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _frame_name(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})"
+
+
+class _Stage:
+    def __init__(self, name, tid, start, audio_seconds):
+        self.name = name
+        self.tid = tid
+        self.start = start
+        self.audio_seconds = audio_seconds
+        self.wall = None
+        self.cpu = None
+        self.peak_rss = None
+
+
+class StageProfiler:
+    """Collects stage spans and memory samples for one run."""
+
+    def __init__(self):
+        self.enabled = False
+        self.python_profiler = None
+        self.interval = 0.02
+        self.audio_seconds = None
+        self._lock = threading.Lock()
+        self._origin = time.perf_counter()
+        self._stages = []
+        self._active = {}
+        self._rss = []
+        self._stacks = defaultdict(Counter)
+        self._profiles = {}
+        self._threads = {}
+        self._sampler = None
+        self._stop = threading.Event()
+
+    def enable(self, python_profiler=None, interval=0.02):
+        """
+        Start recording stages.
+
+        Args:
+            python_profiler (str, optional): "cprofile" to run each stage under
+                cProfile, or "sample" to sample Python stacks inside stages.
+            interval (float): Seconds between RSS (and stack) samples.
+        """
+        if python_profiler not in (None,) + PYTHON_PROFILERS:
+            raise ValueError(f"Unknown Python profiler: {python_profiler}")
+        self.enabled = True
+        self.python_profiler = python_profiler
+        self.interval = interval
+        if self._sampler is None:
+            self._sampler = threading.Thread(target=self._sample, name="profiler", daemon=True)
+            self._sampler.start()
+
+    def note_audio(self, seconds):
+        """Record the input duration that real-time factors are relative to."""
+        if self.enabled and seconds and not self.audio_seconds:
+            self.audio_seconds = seconds
+
+    def _now(self):
+        return time.perf_counter() - self._origin
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            rss = current_rss_bytes()
+            now = self._now()
+            with self._lock:
+                if rss is not None:
+                    self._rss.append((now, rss))
+                    for stage in self._active.values():
+                        stage.peak_rss = max(stage.peak_rss or 0, rss)
+                if self.python_profiler == "sample" and self._active:
+                    frames = sys._current_frames()
+                    for tid, stage in self._active.items():
+                        frame = frames.get(tid)
+                        stack = []
+                        while frame is not None:
+                            stack.append(_frame_name(frame))
+                            frame = frame.f_back
+                        if stack:
+                            self._stacks[stage.name][";".join(reversed(stack))] += 1
+
+    @contextlib.contextmanager
+    def _record(self, name, audio_seconds):
+        thread = threading.current_thread()
+        tid = thread.ident
+        stage = _Stage(name, tid, self._now(), audio_seconds)
+        rss = current_rss_bytes()
+        stage.peak_rss = rss
+        with self._lock:
+            self._threads[tid] = thread.name
+            # Nested stages on one thread are charged to the outer one
+            nested = tid in self._active
+            if not nested:
+                self._active[tid] = stage
+
+        profile = None
+        if self.python_profiler == "cprofile" and not nested:
+            import cProfile
+            profile = cProfile.Profile()
+            try:
+                profile.enable()
+            except ValueError:
+                # Another stage already holds the profiler (e.g. --pipelined on 3.12+)
+                profile = None
+
+        cpu0 = time.process_time()
+        t0 = time.perf_counter()
+        try:
+            yield stage
+        finally:
+            stage.wall = time.perf_counter() - t0
+            stage.cpu = time.process_time() - cpu0
+            if profile is not None:
+                profile.disable()
+            rss = current_rss_bytes()
+            with self._lock:
+                if rss is not None:
+                    stage.peak_rss = max(stage.peak_rss or 0, rss)
+                if not nested:
+                    del self._active[tid]
+                self._stages.append(stage)
+                if profile is not None:
+                    self._profiles.setdefault(name, []).append(profile)
+
+    def stage(self, name, audio_seconds=None):
+        """
+        Context manager timing one stage; a no-op unless enabled.
+
+        Args:
+            name (str): Stage name; repeated stages are summed in the report.
+            audio_seconds (float, optional): Audio this run of the stage
+                covered, for its real-time factor (defaults to the input
+                duration given to note_audio()).
+        """
+        if not self.enabled:
+            return contextlib.nullcontext()
+        return self._record(name, audio_seconds)
+
+    def summary(self):
+        """Per-stage totals in order of first appearance."""
+        totals = {}
+        with self._lock:
+            stages = list(self._stages)
+        for stage in sorted(stages, key=lambda s: s.start):
+            total = totals.setdefault(stage.name, {
+                "stage": stage.name, "calls": 0, "wall_seconds": 0.0,
+                "cpu_seconds": 0.0, "audio_seconds": None, "peak_rss_mb": None})
+            total["calls"] += 1
+            total["wall_seconds"] += stage.wall
+            total["cpu_seconds"] += stage.cpu
+            if stage.audio_seconds:
+                total["audio_seconds"] = (total["audio_seconds"] or 0.0) + stage.audio_seconds
+            if stage.peak_rss is not None:
+                total["peak_rss_mb"] = max(total["peak_rss_mb"] or 0.0, stage.peak_rss / 2**20)
+        for total in totals.values():
+            audio = total["audio_seconds"] or self.audio_seconds
+            total["audio_seconds"] = audio
+            total["rtf"] = total["wall_seconds"] / audio if audio else None
+        return list(totals.values())
+
+    def trace_events(self):
+        """Stages, RSS samples and thread names as Chrome trace events."""
+        pid = os.getpid()
+        with self._lock:
+            stages = list(self._stages)
+            rss = list(self._rss)
+            threads = dict(self._threads)
+        events = [{"name": "thread_name", "ph": "M", "pid": pid, "tid": tid,
+                   "args": {"name": name}} for tid, name in threads.items()]
+        for stage in stages:
+            events.append({
+                "name": stage.name, "cat": "stage", "ph": "X", "pid": pid, "tid": stage.tid,
+                "ts": stage.start * 1e6, "dur": stage.wall * 1e6,
+                "args": {"cpu_seconds": round(stage.cpu, 6),
+                         "audio_seconds": stage.audio_seconds,
+                         "peak_rss_mb": round(stage.peak_rss / 2**20, 1)
+                         if stage.peak_rss is not None else None}})
+        events.extend({"name": "rss", "ph": "C", "pid": pid, "ts": t * 1e6,
+                       "args": {"MiB": round(value / 2**20, 1)}} for t, value in rss)
+        return events
+
+    def write(self, path):
+        """
+        Write the report/Chrome trace JSON to path, plus <path stem>.<stage>.prof
+        files (cprofile) or <path stem>.folded (sample).
+        """
+        self._stop.set()
+        if self._sampler is not None:
+            self._sampler.join()
+            self._sampler = None
+        stages = self.summary()
+        stem = os.path.splitext(path)[0]
+        report = {
+            "stages": stages,
+            "audio_seconds": self.audio_seconds,
+            "wall_seconds": self._now(),
+            "python_profiler": self.python_profiler,
+            "displayTimeUnit": "ms",
+            "traceEvents": self.trace_events(),
+        }
+
+        if self.python_profiler == "cprofile":
+            import pstats
+            report["profiles"] = {}
+            for name, profiles in self._profiles.items():
+                stats = pstats.Stats(profiles[0])
+                for profile in profiles[1:]:
+                    stats.add(profile)
+                out = f"{stem}.{name}.prof"
+                stats.dump_stats(out)
+                report["profiles"][name] = out
+        elif self.python_profiler == "sample":
+            out = f"{stem}.folded"
+            with open(out, "w", encoding="utf-8") as f:
+                for name, stacks in self._stacks.items():
+                    for stack, count in stacks.most_common():
+                        f.write(f"{name};{stack} {count}\n")
+            report["folded_stacks"] = out
+            report["hot_functions"] = {}
+            for name, stacks in self._stacks.items():
+                leaves = Counter()
+                for stack, count in stacks.items():
+                    leaves[stack.rsplit(";", 1)[-1]] += count
+                report["hot_functions"][name] = leaves.most_common(15)
+
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=1)
+
+        for stage in stages:
+            rtf = f"{stage['rtf']:.3f}" if stage["rtf"] is not None else "n/a"
+            rss = f"{stage['peak_rss_mb']:.0f} MiB" if stage["peak_rss_mb"] is not None else "n/a"
+            logging.info(f"[profile] {stage['stage']:<18} x{stage['calls']:<3} "
+                         f"wall {stage['wall_seconds']:8.2f}s  cpu {stage['cpu_seconds']:8.2f}s  "
+                         f"rtf {rtf:>7}  peak {rss}")
+        logging.info(f"Profile written to {path}")
+        return report
+
+
+profiler = StageProfiler()
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+result_cache.py: content-addressed on-disk cache for pipeline results.
+
+Whisper segments and diarization turns are stored as separate entries,
+keyed by a hash of the input file's bytes plus the model name, device and
+any options that change the output. Re-running on the same recording (to
+change formatting or retry a failed write) can then reuse either result.
+The cache is trimmed to a size budget, least recently used entries first.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+ENTRY_SUFFIX = ".json"
+# Folders under the cache root that belong to other stores, never to results
+RESERVED_DIRS = ("probes", "models")
+
+
+def default_cache_dir():
+    """Cache folder: $TRANSCRIBBLER_CACHE, else <user cache dir>/transcribbler."""
+    if os.environ.get("TRANSCRIBBLER_CACHE"):
+        return os.environ["TRANSCRIBBLER_CACHE"]
+    base = os.environ.get("XDG_CACHE_HOME") or os.environ.get("LOCALAPPDATA") \
+        or os.path.expanduser("~/.cache")
+    return os.path.join(base, "transcribbler")
+
+
+def lock_file(path):
+    """Open path and take an exclusive lock on it across processes; blocks until free."""
+    f = open(path, "a+b")
+    try:
+        if os.name == "nt":
+            import msvcrt
+            while True:
+                try:
+                    f.seek(0)
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    # LK_LOCK gives up after ~10 s; keep waiting
+                    continue
+        else:
+            import fcntl
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+    except BaseException:
+        f.close()
+        raise
+    return f
+
+
+def unlock_file(f):
+    """Release a lock_file() lock and close the file."""
+    try:
+        if os.name == "nt":
+            import msvcrt
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+    finally:
+        f.close()
+
+
+def hash_file(path, block_size=1024 * 1024):
+    """Return the SHA-256 hex digest of a file's contents."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """
+    On-disk store of JSON-serialisable stage results.
+
+    Entries live at <root>/<kind>/<key[:2]>/<key>.json and are written
+    atomically. Reading an entry refreshes its modification time, which
+    is what eviction orders by.
+    """
+
+    def __init__(self, root=None, max_bytes=DEFAULT_MAX_BYTES):
+        self.root = root or default_cache_dir()
+        self.max_bytes = max_bytes
+        self._hashes = {}
+
+    def content_hash(self, path):
+        """Hash an input file, memoised by path, size and mtime for this process."""
+        st = os.stat(path)
+        memo_key = (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+        if memo_key not in self._hashes:
+            self._hashes[memo_key] = hash_file(path)
+        return self._hashes[memo_key]
+
+    @staticmethod
+    def key(content_hash, **options):
+        """Combine a content hash with the options that affect a result."""
+        blob = json.dumps({"content": content_hash, **options}, sort_keys=True)
+        return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+    def _path(self, kind, key):
+        return os.path.join(self.root, kind, key[:2], key + ENTRY_SUFFIX)
+
+    def get(self, kind, key):
+        """Return the cached value for (kind, key), or None on a miss."""
+        path = self._path(kind, key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                value = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logging.warning(f"Ignoring unreadable cache entry {path}: {e}")
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return value
+
+    def put(self, kind, key, value):
+        """Store a value and trim the cache back under its size budget."""
+        path = self._path(kind, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(value, f, separators=(",", ":"))
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self.evict()
+
+    def entries(self):
+        """
+        Return (path, size, mtime) for every entry in the cache.
+
+        Only the <kind>/<key[:2]>/<key>.json layout is scanned; reserved
+        folders and anything else sharing the cache root are left alone.
+        """
+        found = []
+        for kind in self._listdir(self.root):
+            kind_dir = os.path.join(self.root, kind)
+            if kind in RESERVED_DIRS or not os.path.isdir(kind_dir):
+                continue
+            for shard in self._listdir(kind_dir):
+                shard_dir = os.path.join(kind_dir, shard)
+                if len(shard) != 2 or not os.path.isdir(shard_dir):
+                    continue
+                for name in self._listdir(shard_dir):
+                    if not (name.startswith(shard) and name.endswith(ENTRY_SUFFIX)):
+                        continue
+                    path = os.path.join(shard_dir, name)
+                    try:
+                        st = os.stat(path)
+                    except OSError:
+                        continue
+                    found.append((path, st.st_size, st.st_mtime))
+        return found
+
+    @staticmethod
+    def _listdir(path):
+        try:
+            return os.listdir(path)
+        except OSError:
+            return []
+
+    def evict(self, max_bytes=None):
+        """Delete least recently used entries until the cache fits max_bytes."""
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        if total <= max_bytes:
+            return 0
+        removed = 0
+        for path, size, _ in sorted(entries, key=lambda e: e[2]):
+            if total <= max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        logging.info(f"Evicted {removed} result cache entr{'y' if removed == 1 else 'ies'}")
+        return removed
+
+    def stats(self):
+        """Summarise entry counts and sizes per kind."""
+        kinds = {}
+        for path, size, _ in self.entries():
+            kind = os.path.relpath(path, self.root).split(os.sep)[0]
+            count, total = kinds.get(kind, (0, 0))
+            kinds[kind] = (count + 1, total + size)
+        return kinds
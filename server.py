@@ -0,0 +1,523 @@
+#!/usr/bin/env python3
+"""
+server.py: long-running job server that keeps the models loaded.
+
+Starting main.py pays for importing torch and loading Whisper and the
+diarization pipeline on every file. The server does that once per worker
+process and then takes jobs over a small HTTP API on the loopback
+interface (--host/--port) or a Unix socket (--socket):
+
+    POST   /jobs             submit {"input": "<path on this host>", "output": "<csv>"}
+                             ("output" optional: a path under --output-dir, refused
+                             without it), or upload the media file itself
+                             as the request body (?name=meeting.mp3)
+                             -> 202 with the job; 503 + Retry-After when the queue is full
+    GET    /jobs             all jobs the server remembers
+    GET    /jobs/<id>        one job: status is queued, running, done, failed or cancelled
+    GET    /jobs/<id>/csv    the CSV of a finished job (409 until then)
+    DELETE /jobs/<id>        cancel; a running job's worker is stopped and restarted
+    GET    /health           workers, queue depth and capacity
+
+At most --queue-size jobs wait; further submissions are refused rather
+than buffered, so clients back off (client.py retries after Retry-After).
+--workers processes run jobs concurrently, each with its own pipeline
+and result cache; on CPU their Whisper weights are memory-mapped from
+one file (see models.py) and the cores are split between them. Jobs are
+kept in memory: queued jobs are lost when the server stops, and only the
+last --keep-jobs finished jobs (with their uploads and CSVs under
+--jobs-dir) are remembered.
+"""
+
+import configargparse as argparse
+import json
+import logging
+import multiprocessing
+import os
+import shutil
+import socketserver
+import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import main as app
+from models import use_local_models
+from result_cache import default_cache_dir
+from workers import WorkerSlot, split_threads
+
+RETRY_AFTER_SECONDS = 5
+UPLOAD_BLOCK = 1024 * 1024
+MAX_JSON_BYTES = 1024 * 1024
+FINISHED = ("done", "failed", "cancelled")
+
+
+class QueueFull(Exception):
+    """Raised by JobManager.submit() when --queue-size jobs are already waiting."""
+
+
+class Job:
+    def __init__(self, job_id, input_path, output_path, folder, upload=False):
+        self.id = job_id
+        self.input = input_path
+        self.output = output_path
+        self.folder = folder
+        self.upload = upload
+        self.status = "queued"
+        self.error = None
+        self.worker = None
+        self.submitted = time.time()
+        self.started = None
+        self.finished = None
+        self.cancel_requested = threading.Event()
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "status": self.status,
+            "input": os.path.basename(self.input) if self.upload else self.input,
+            "output": self.output,
+            "error": self.error,
+            "worker": self.worker,
+            "cancel_requested": self.cancel_requested.is_set(),
+            "submitted": self.submitted,
+            "started": self.started,
+            "finished": self.finished,
+            "seconds": round((self.finished or time.time()) - self.started, 3)
+            if self.started else None,
+        }
+
+
+# --- job bookkeeping ---------------------------------------------------------------
+
+class JobManager:
+    """
+    Bounded job queue served by a fixed set of worker processes.
+
+    One dispatcher thread per worker takes the oldest queued job, hands it
+    to its worker process and records the outcome.
+    """
+
+    def __init__(self, args, workers=1, queue_size=16, jobs_dir=None, keep_jobs=500):
+        self.args = args
+        self.queue_size = queue_size
+        self.jobs_dir = jobs_dir or os.path.join(args.cache_dir or default_cache_dir(), "jobs")
+        self.keep_jobs = keep_jobs
+        self._jobs = OrderedDict()
+        self._pending = deque()
+        self._cond = threading.Condition()
+        self._closing = False
+        self.slots = [WorkerSlot(n, args) for n in range(workers)]
+        self._threads = [threading.Thread(target=self._dispatch, args=(slot,),
+                                          name=f"dispatch-{slot.index}", daemon=True)
+                         for slot in self.slots]
+        for thread in self._threads:
+            thread.start()
+
+    def new_job_folder(self):
+        job_id = uuid.uuid4().hex[:12]
+        folder = os.path.join(self.jobs_dir, job_id)
+        os.makedirs(folder)
+        return job_id, folder
+
+    def has_room(self):
+        with self._cond:
+            return len(self._pending) < self.queue_size
+
+    def submit(self, job_id, folder, input_path, output_path=None, upload=False):
+        """
+        Queue a job.
+
+        Raises:
+            QueueFull: If queue_size jobs are already waiting.
+        """
+        if output_path is None:
+            stem = os.path.splitext(os.path.basename(input_path))[0] or "output"
+            output_path = os.path.join(folder, stem + ".csv")
+        job = Job(job_id, input_path, output_path, folder, upload=upload)
+        with self._cond:
+            if self._closing or len(self._pending) >= self.queue_size:
+                raise QueueFull(f"{len(self._pending)} job(s) already queued")
+            self._jobs[job.id] = job
+            self._pending.append(job)
+            self._cond.notify()
+        logging.info(f"Queued job {job.id}: {input_path}")
+        return job
+
+    def get(self, job_id):
+        with self._cond:
+            return self._jobs.get(job_id)
+
+    def jobs(self):
+        with self._cond:
+            return [job.to_dict() for job in self._jobs.values()]
+
+    def cancel(self, job_id):
+        """Cancel a queued or running job; returns the job, or None if unknown."""
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is None or job.status in FINISHED:
+                return job
+            if job.status == "queued":
+                self._pending.remove(job)
+                self._finish(job, "cancelled", None)
+            else:
+                job.cancel_requested.set()
+        return job
+
+    def health(self):
+        with self._cond:
+            return {
+                "workers": len(self.slots),
+                "ready": sum(slot.ready for slot in self.slots),
+                "running": sum(job.status == "running" for job in self._jobs.values()),
+                "queued": len(self._pending),
+                "queue_size": self.queue_size,
+                "jobs": len(self._jobs),
+            }
+
+    def _finish(self, job, status, error):
+        # Called with self._cond held
+        job.status = status
+        job.error = error
+        job.finished = time.time()
+        finished = [j for j in self._jobs.values() if j.status in FINISHED]
+        for old in finished[:max(0, len(finished) - self.keep_jobs)]:
+            del self._jobs[old.id]
+            shutil.rmtree(old.folder, ignore_errors=True)
+
+    def _dispatch(self, slot):
+        try:
+            slot.start()
+        except RuntimeError as e:
+            # Retried when the first job arrives
+            logging.error(str(e))
+        while True:
+            with self._cond:
+                while not self._pending and not self._closing:
+                    self._cond.wait()
+                if self._closing:
+                    return
+                job = self._pending.popleft()
+                job.status = "running"
+                job.worker = slot.index
+                job.started = time.time()
+            logging.info(f"Worker {slot.index} started job {job.id}")
+            try:
+                status, error = slot.run(job.input, job.output, cancel=job.cancel_requested)
+            except (RuntimeError, OSError) as e:
+                status, error = "failed", str(e)
+                slot.stop()
+            with self._cond:
+                self._finish(job, status, error)
+            logging.info(f"Job {job.id} {status} in {job.finished - job.started:.1f}s"
+                         + (f": {error}" if error else ""))
+            if slot.process is None and not self._closing:
+                # Reload the models now rather than when the next job arrives
+                try:
+                    slot.start()
+                except RuntimeError as e:
+                    logging.error(str(e))
+
+    def close(self):
+        """Stop taking jobs and shut the worker processes down."""
+        with self._cond:
+            self._closing = True
+            for job in self._pending:
+                job.status = "cancelled"
+            self._pending.clear()
+            for job in self._jobs.values():
+                job.cancel_requested.set()
+            self._cond.notify_all()
+        for thread in self._threads:
+            # A dispatcher still waiting for its worker's models is not waited for
+            thread.join(timeout=10)
+        for slot in self.slots:
+            slot.stop()
+
+
+# --- HTTP ----------------------------------------------------------------------------
+
+class JobRequestHandler(BaseHTTPRequestHandler):
+    server_version = "TranscribblerServer/1.0"
+    protocol_version = "HTTP/1.1"
+
+    @property
+    def manager(self):
+        return self.server.manager
+
+    def address_string(self):
+        # Unix socket peers have no (host, port) address
+        return self.client_address[0] if self.client_address else "local"
+
+    def log_message(self, format, *args):
+        logging.debug(f"{self.address_string()} {format % args}")
+
+    def send_json(self, status, body, headers=None):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def send_error_json(self, status, message, headers=None):
+        # The request body may not have been read
+        self.close_connection = True
+        self.send_json(status, {"error": message}, headers)
+
+    def _route(self):
+        url = urlsplit(self.path)
+        parts = [part for part in url.path.split("/") if part]
+        return parts, parse_qs(url.query)
+
+    def _job_or_404(self, job_id):
+        job = self.manager.get(job_id)
+        if job is None:
+            self.send_error_json(404, f"unknown job {job_id}")
+        return job
+
+    def do_GET(self):
+        parts, _ = self._route()
+        if parts == ["health"]:
+            self.send_json(200, self.manager.health())
+        elif parts == ["jobs"]:
+            self.send_json(200, {"jobs": self.manager.jobs()})
+        elif len(parts) == 2 and parts[0] == "jobs":
+            job = self._job_or_404(parts[1])
+            if job:
+                self.send_json(200, job.to_dict())
+        elif len(parts) == 3 and parts[0] == "jobs" and parts[2] == "csv":
+            job = self._job_or_404(parts[1])
+            if job:
+                self.send_csv(job)
+        else:
+            self.send_error_json(404, f"no such endpoint: {self.path}")
+
+    def send_csv(self, job):
+        if job.status != "done":
+            self.send_error_json(409, f"job {job.id} is {job.status}")
+            return
+        try:
+            f = open(job.output, "rb")
+        except OSError as e:
+            self.send_error_json(410, f"CSV of job {job.id} is gone: {e}")
+            return
+        with f:
+            size = os.fstat(f.fileno()).st_size
+            self.send_response(200)
+            self.send_header("Content-Type", "text/csv; charset=utf-8")
+            self.send_header("Content-Length", str(size))
+            self.send_header("Content-Disposition",
+                             f'attachment; filename="{os.path.basename(job.output)}"')
+            self.end_headers()
+            shutil.copyfileobj(f, self.wfile)
+
+    def do_DELETE(self):
+        parts, _ = self._route()
+        if len(parts) != 2 or parts[0] != "jobs":
+            self.send_error_json(404, f"no such endpoint: {self.path}")
+            return
+        job = self.manager.cancel(parts[1])
+        if job is None:
+            self.send_error_json(404, f"unknown job {parts[1]}")
+        else:
+            self.send_json(200, job.to_dict())
+
+    def do_POST(self):
+        parts, query = self._route()
+        if parts != ["jobs"]:
+            self.send_error_json(404, f"no such endpoint: {self.path}")
+            return
+        retry = {"Retry-After": str(RETRY_AFTER_SECONDS)}
+        length = self.headers.get("Content-Length")
+        if length is None:
+            self.send_error_json(411, "Content-Length required")
+            return
+        try:
+            length = int(length)
+        except ValueError:
+            length = -1
+        if length < 0:
+            self.send_error_json(400, "invalid Content-Length")
+            return
+        # Refuse before reading a possibly large upload
+        if not self.manager.has_room():
+            self.send_error_json(503, "job queue is full", retry)
+            return
+
+        if self.headers.get_content_type() == "application/json":
+            if length > MAX_JSON_BYTES:
+                self.send_error_json(413, f"JSON body larger than {MAX_JSON_BYTES // 1024} KB")
+                return
+            try:
+                request = json.loads(self.rfile.read(length) or b"{}")
+                input_path = os.path.abspath(request["input"])
+            except (ValueError, KeyError, TypeError):
+                self.send_error_json(400, 'expected {"input": "<path>"}')
+                return
+            if not os.path.isfile(input_path):
+                self.send_error_json(400, f"input file not found: {input_path}")
+                return
+            output_path = request.get("output")
+            if output_path:
+                try:
+                    output_path = resolve_output(self.server.output_dir, output_path)
+                except ValueError as e:
+                    self.send_error_json(400, str(e))
+                    return
+            job_id, folder = self.manager.new_job_folder()
+            upload = False
+        else:
+            if length > self.server.max_upload_bytes:
+                self.send_error_json(413, f"upload larger than "
+                                          f"{self.server.max_upload_bytes // 2**20} MB")
+                return
+            name = os.path.basename(query.get("name", ["upload"])[0]) or "upload"
+            job_id, folder = self.manager.new_job_folder()
+            input_path = os.path.join(folder, name)
+            output_path = None
+            upload = True
+            remaining = length
+            with open(input_path, "wb") as f:
+                while remaining:
+                    block = self.rfile.read(min(UPLOAD_BLOCK, remaining))
+                    if not block:
+                        break
+                    f.write(block)
+                    remaining -= len(block)
+            if remaining:
+                shutil.rmtree(folder, ignore_errors=True)
+                self.send_error_json(400, "upload ended early")
+                return
+
+        try:
+            job = self.manager.submit(job_id, folder, input_path, output_path, upload=upload)
+        except QueueFull as e:
+            shutil.rmtree(folder, ignore_errors=True)
+            self.send_error_json(503, f"job queue is full: {e}", retry)
+            return
+        self.send_json(202, job.to_dict(), {"Location": f"/jobs/{job.id}"})
+
+
+def resolve_output(output_dir, output_path):
+    """
+    Resolve a client-supplied CSV path under output_dir.
+
+    Raises:
+        ValueError: If there is no output_dir or the path leaves it.
+    """
+    if not output_dir:
+        raise ValueError('"output" is disabled; start the server with --output-dir')
+    if not isinstance(output_path, str):
+        raise ValueError('"output" must be a path')
+    root = os.path.realpath(output_dir)
+    resolved = os.path.realpath(os.path.join(root, output_path))
+    if os.path.commonpath([root, resolved]) != root or resolved == root:
+        raise ValueError(f'"output" must be a file under the output folder: {output_path}')
+    os.makedirs(os.path.dirname(resolved), exist_ok=True)
+    return resolved
+
+
+class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def server_bind(self):
+        if os.path.exists(self.server_address):
+            os.remove(self.server_address)
+        super().server_bind()
+
+
+def make_server(manager, host="127.0.0.1", port=8765, socket_path=None,
+                max_upload_bytes=4096 * 2**20, output_dir=None):
+    """Create the HTTP server for a JobManager on a TCP port or a Unix socket."""
+    if socket_path:
+        server = UnixHTTPServer(socket_path, JobRequestHandler)
+    else:
+        server = ThreadingHTTPServer((host, port), JobRequestHandler)
+    server.manager = manager
+    server.max_upload_bytes = max_upload_bytes
+    server.output_dir = output_dir
+    return server
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Keep the models loaded and transcribe jobs submitted over HTTP.",
+        default_config_files=['config.ini'],
+        ignore_unknown_config_file_keys=True
+    )
+    parser.add_argument('-c', '--config',
+                        is_config_file=True,
+                        help='Path to config file (INI or YAML)')
+    parser.add_argument('--host',
+                        default='127.0.0.1',
+                        help='Interface to listen on (keep it on loopback: there is no authentication)')
+    parser.add_argument('--port',
+                        type=int,
+                        default=8765,
+                        help='TCP port to listen on')
+    parser.add_argument('--socket',
+                        help='Listen on this Unix socket instead of a TCP port')
+    parser.add_argument('--workers',
+                        type=int,
+                        default=1,
+                        help='Worker processes running jobs concurrently, each with its own models')
+    parser.add_argument('--queue-size',
+                        type=int,
+                        default=16,
+                        help='Jobs allowed to wait; further submissions get 503 until there is room')
+    parser.add_argument('--jobs-dir',
+                        help='Folder for uploads and CSVs (default: <cache dir>/jobs)')
+    parser.add_argument('--output-dir',
+                        help='Folder that a job\'s "output" path is resolved under '
+                             '(default: none; clients cannot choose where CSVs go)')
+    parser.add_argument('--keep-jobs',
+                        type=int,
+                        default=500,
+                        help='Finished jobs to remember; older ones and their files are removed')
+    parser.add_argument('--max-upload-mb',
+                        type=float,
+                        default=4096,
+                        help='Largest media file accepted as an upload')
+    app.add_pipeline_arguments(parser)
+    return parser.parse_args()
+
+
+def main():
+    app.setup_logger()
+    args = parse_args()
+    use_local_models(args.model_dir, offline=args.offline)
+    # Workers inherit FFMPEG_BINARY and PATH from here
+    ffmpeg_path = app.configure_ffmpeg()
+    logging.info(f"Using FFmpeg from: {ffmpeg_path}")
+    split_threads(args, args.workers)
+
+    manager = JobManager(args, workers=max(1, args.workers), queue_size=args.queue_size,
+                         jobs_dir=args.jobs_dir, keep_jobs=args.keep_jobs)
+    server = make_server(manager, args.host, args.port, args.socket,
+                         max_upload_bytes=int(args.max_upload_mb * 2**20),
+                         output_dir=args.output_dir)
+    where = f"unix:{args.socket}" if args.socket else f"http://{args.host}:{args.port}"
+    logging.info(f"Listening on {where} with {args.workers} worker(s), "
+                 f"queue of {args.queue_size}, jobs in {manager.jobs_dir}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logging.info("Shutting down...")
+    finally:
+        server.server_close()
+        manager.close()
+        if args.socket and os.path.exists(args.socket):
+            os.remove(args.socket)
+    return 0
+
+
+if __name__ == "__main__":
+    # Worker processes are spawned, also from the frozen Windows build
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+sinks.py: incremental writers for aligned transcripts.
+
+main.py and align.py hand rows of (start, end, speaker, text) to a sink
+as they are produced, instead of collecting a DataFrame first:
+
+    csv       header plus one line per row
+    jsonl     one JSON object per line
+    parquet   columnar, buffered into row groups (needs pyarrow)
+    arrow     Arrow IPC file, one record batch per flush (needs pyarrow)
+
+open_sink() picks the format from the output file's extension unless
+one is given. Rows are written to <path>.part and the file is renamed to
+<path> by close(), so an output file that exists is always complete; a
+sink left by an exception keeps its .part file. flush(sync=True) forces
+everything written so far to disk, which --stream uses after each window.
+Only the text formats can be read back from a .part file after a crash:
+Parquet and Arrow files get their footer on close(), so an unfinished
+one is unreadable and its rows cannot be recovered.
+"""
+
+import csv
+import json
+import os
+
+COLUMNS = ("start", "end", "speaker", "text")
+
+FORMATS = {"csv": ".csv", "jsonl": ".jsonl", "parquet": ".parquet", "arrow": ".arrow"}
+EXTENSIONS = {".csv": "csv", ".jsonl": "jsonl", ".ndjson": "jsonl", ".parquet": "parquet",
+              ".arrow": "arrow", ".feather": "arrow", ".ipc": "arrow"}
+
+
+def format_for_path(path, default="csv"):
+    """Output format implied by a file name, or default if it implies none."""
+    return EXTENSIONS.get(os.path.splitext(path)[1].lower(), default)
+
+
+class Sink:
+    """Base class: subclasses open self.partial_path and implement write_row()."""
+
+    def __init__(self, path, columns=COLUMNS, partial=True):
+        self.path = path
+        self.columns = tuple(columns)
+        self.partial_path = path + ".part" if partial else path
+        self.rows_written = 0
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    def write_row(self, row):
+        """Write one row: a tuple of values in column order."""
+        raise NotImplementedError
+
+    def write_rows(self, rows):
+        for row in rows:
+            self.write_row(row)
+
+    def flush(self, sync=False):
+        """Push buffered rows to the file (and to disk with sync)."""
+
+    def _close_file(self):
+        raise NotImplementedError
+
+    def close(self):
+        """Finish the file and move it into place."""
+        self._close_file()
+        if self.partial_path != self.path:
+            os.replace(self.partial_path, self.path)
+
+    def abort(self):
+        """Close without moving the partial file into place."""
+        self._close_file()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+class _TextSink(Sink):
+    def __init__(self, path, columns=COLUMNS, partial=True):
+        super().__init__(path, columns, partial)
+        self._file = open(self.partial_path, "w", newline="", encoding="utf-8")
+
+    def flush(self, sync=False):
+        self._file.flush()
+        if sync:
+            os.fsync(self._file.fileno())
+
+    def _close_file(self):
+        self._file.close()
+
+
+class CsvSink(_TextSink):
+    def __init__(self, path, columns=COLUMNS, partial=True, float_format=None):
+        """
+        Args:
+            float_format (str, optional): Format for float values, e.g.
+                "{:.2f}"; by default they are written in full.
+        """
+        super().__init__(path, columns, partial)
+        self.float_format = float_format
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(self.columns)
+
+    def write_row(self, row):
+        if self.float_format:
+            row = [self.float_format.format(value) if isinstance(value, float) else value
+                   for value in row]
+        self._writer.writerow(row)
+        self.rows_written += 1
+
+
+class JsonlSink(_TextSink):
+    def write_row(self, row):
+        self._file.write(json.dumps(dict(zip(self.columns, row)), ensure_ascii=False))
+        self._file.write("\n")
+        self.rows_written += 1
+
+
+class _ArrowSink(Sink):
+    """Buffers rows column-wise and writes them as Arrow record batches."""
+
+    batch_rows = 65536
+
+    def __init__(self, path, columns=COLUMNS, partial=True):
+        try:
+            import pyarrow
+        except ImportError:
+            raise ImportError("pyarrow is required for Parquet and Arrow output. "
+                              "Install with: pip install pyarrow")
+        super().__init__(path, columns, partial)
+        self.pa = pyarrow
+        types = {"start": pyarrow.float64(), "end": pyarrow.float64()}
+        self.schema = pyarrow.schema([(name, types.get(name, pyarrow.string()))
+                                      for name in self.columns])
+        self._buffer = [[] for _ in self.columns]
+        self._file = open(self.partial_path, "wb")
+        self._writer = self._open_writer()
+
+    def _open_writer(self):
+        raise NotImplementedError
+
+    def write_row(self, row):
+        for column, value in zip(self._buffer, row):
+            column.append(value)
+        self.rows_written += 1
+        if len(self._buffer[0]) >= self.batch_rows:
+            self._write_buffer()
+
+    def _write_buffer(self):
+        if self._buffer[0]:
+            self._writer.write_batch(self.pa.record_batch(self._buffer, schema=self.schema))
+            self._buffer = [[] for _ in self.columns]
+
+    def flush(self, sync=False):
+        # Puts the buffered rows on disk, but the file stays unreadable
+        # until close() writes the footer
+        self._write_buffer()
+        self._file.flush()
+        if sync:
+            os.fsync(self._file.fileno())
+
+    def _close_file(self):
+        try:
+            self._write_buffer()
+            self._writer.close()
+        finally:
+            self._file.close()
+
+
+class ParquetSink(_ArrowSink):
+    def _open_writer(self):
+        import pyarrow.parquet as pq
+        return pq.ParquetWriter(self._file, self.schema)
+
+
+class ArrowSink(_ArrowSink):
+    def _open_writer(self):
+        return self.pa.ipc.new_file(self._file, self.schema)
+
+
+SINKS = {"csv": CsvSink, "jsonl": JsonlSink, "parquet": ParquetSink, "arrow": ArrowSink}
+
+
+def open_sink(path, output_format=None, columns=COLUMNS, partial=True, float_format=None):
+    """
+    Open a sink for path.
+
+    Args:
+        path (str): Output file.
+        output_format (str, optional): One of FORMATS; defaults to the one
+            implied by the extension, else csv.
+        columns (tuple): Column names, in the order rows give their values.
+        partial (bool): Write to <path>.part and rename on close().
+        float_format (str, optional): CSV only, e.g. "{:.2f}".
+
+    Returns:
+        Sink: Use as a context manager, or call close() when done.
+    """
+    output_format = output_format or format_for_path(path)
+    if output_format not in SINKS:
+        raise ValueError(f"Unknown output format: {output_format}")
+    if output_format == "csv":
+        return CsvSink(path, columns, partial, float_format=float_format)
+    return SINKS[output_format](path, columns, partial)
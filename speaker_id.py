@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+"""
+speaker_id.py: name diarized speakers using the enrolled-speaker database.
+
+All embeddings written by Train.py are loaded once into a contiguous,
+L2-normalised float32 matrix together with one normalised centroid per
+enrolled speaker. Each diarization cluster gets an embedding of its own
+(the mean over a few windows of its longest turns), and every cluster is
+scored against every centroid with one matrix product. Clusters whose
+best cosine similarity clears the threshold take the enrolled name; the
+rest keep their diarization label.
+
+The loaded matrix is cached per database path and only reloaded when the
+database's contents change.
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+
+import numpy as np
+
+from embedding_store import database_signature, decode_matrix
+
+DEFAULT_EMBEDDING_MODEL = "speechbrain/spkrec-ecapa-voxceleb"
+
+
+def _normalize_rows(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class EnrolledSpeakers:
+    """Snapshot of the enrolled embeddings as NumPy arrays."""
+
+    def __init__(self, names, speaker_index, vectors, signature=None):
+        """
+        Args:
+            names (list): Enrolled speaker names; position is the speaker index.
+            speaker_index (numpy.ndarray): Speaker index of every vector row.
+            vectors (numpy.ndarray): (n, dim) embeddings.
+            signature (tuple, optional): database_signature() at load time.
+        """
+        self.names = list(names)
+        self.speaker_index = np.asarray(speaker_index, dtype=np.int64)
+        self.vectors = np.ascontiguousarray(_normalize_rows(np.asarray(vectors, dtype=np.float32)))
+        self.signature = signature
+
+        dim = self.vectors.shape[1] if self.vectors.ndim == 2 else 0
+        centroids = np.zeros((len(self.names), dim), dtype=np.float32)
+        np.add.at(centroids, self.speaker_index, self.vectors)
+        self.centroids = np.ascontiguousarray(_normalize_rows(centroids))
+        self.has_vectors = np.bincount(self.speaker_index, minlength=len(self.names)) > 0
+
+    @classmethod
+    def from_db(cls, conn):
+        """Load every enrolled embedding from an open Train.py database."""
+        signature = database_signature(conn)
+        speakers = conn.execute("SELECT id, name FROM speakers ORDER BY id").fetchall()
+        position = {speaker_id: i for i, (speaker_id, _) in enumerate(speakers)}
+        rows = conn.execute("SELECT speaker_id, vector FROM embeddings ORDER BY id").fetchall()
+        vectors = decode_matrix([blob for _, blob in rows])
+        speaker_index = [position[speaker_id] for speaker_id, _ in rows]
+        return cls([name for _, name in speakers], speaker_index, vectors, signature)
+
+    def __len__(self):
+        return len(self.vectors)
+
+    def match(self, queries, threshold=0.5):
+        """
+        Match query embeddings against the enrolled centroids.
+
+        Args:
+            queries (numpy.ndarray): (k, dim) embeddings, e.g. one per cluster.
+            threshold (float): Minimum cosine similarity to accept a match.
+
+        Returns:
+            list: (name or None, similarity) per query.
+        """
+        queries = _normalize_rows(np.atleast_2d(np.asarray(queries, dtype=np.float32)))
+        if not len(queries) or not self.has_vectors.any():
+            return [(None, 0.0)] * len(queries)
+        scores = queries @ self.centroids.T
+        scores[:, ~self.has_vectors] = -np.inf
+        best = np.argmax(scores, axis=1)
+        best_scores = scores[np.arange(len(queries)), best]
+        return [(self.names[b] if s >= threshold else None, float(s))
+                for b, s in zip(best.tolist(), best_scores.tolist())]
+
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def load_enrolled(db_path):
+    """
+    Return the EnrolledSpeakers for a database, reusing the cached matrix
+    unless the database changed since it was loaded.
+    """
+    key = os.path.abspath(db_path)
+    conn = sqlite3.connect(db_path)
+    try:
+        signature = database_signature(conn)
+        with _cache_lock:
+            cached = _cache.get(key)
+            if cached is not None and cached.signature == signature:
+                return cached
+        enrolled = EnrolledSpeakers.from_db(conn)
+    finally:
+        conn.close()
+    logging.info(f"Loaded {len(enrolled)} embeddings for {len(enrolled.names)} "
+                 f"enrolled speaker(s) from {db_path}")
+    with _cache_lock:
+        _cache[key] = enrolled
+    return enrolled
+
+
+_embedding_models = {}
+
+
+def get_embedding_model(model_name=DEFAULT_EMBEDDING_MODEL, device="cpu", auth_token=None):
+    """Load a PretrainedSpeakerEmbedding once per process."""
+    key = (model_name, str(device))
+    if key not in _embedding_models:
+        import torch
+        from pyannote.audio import PretrainedSpeakerEmbedding
+        logging.info(f"Loading speaker embedding model '{model_name}'")
+        _embedding_models[key] = PretrainedSpeakerEmbedding(
+            model_name, device=torch.device(device), use_auth_token=auth_token)
+    return _embedding_models[key]
+
+
+def cluster_windows(audio, turns, sample_rate=16000, window_seconds=3.0, max_windows=20):
+    """
+    Cut up to max_windows fixed-length windows per diarization label,
+    taken from that label's longest turns.
+
+    Returns:
+        tuple: (labels, windows, owner, short) where windows is
+            (n, samples), owner[i] is the index into labels of window i,
+            and short lists (label index, samples) for labels whose turns
+            are all shorter than a window (their longest turn is used).
+    """
+    window = int(round(window_seconds * sample_rate))
+    by_label = {}
+    for start, end, label in turns:
+        by_label.setdefault(label, []).append((start, end))
+
+    labels, windows, owner, short = [], [], [], []
+    for label, spans in by_label.items():
+        spans.sort(key=lambda span: span[0] - span[1])  # longest first
+        taken = 0
+        for start, end in spans:
+            lo = int(start * sample_rate)
+            hi = min(int(end * sample_rate), len(audio))
+            for offset in range(lo, hi - window + 1, window):
+                windows.append(audio[offset:offset + window])
+                owner.append(len(labels))
+                taken += 1
+                if taken >= max_windows:
+                    break
+            if taken >= max_windows:
+                break
+        if not taken:
+            start, end = spans[0]
+            piece = audio[int(start * sample_rate):int(end * sample_rate)]
+            if len(piece):
+                short.append((len(labels), piece))
+        labels.append(label)
+    stacked = np.stack(windows) if windows else np.empty((0, window), dtype=np.float32)
+    return labels, stacked, np.asarray(owner, dtype=np.int64), short
+
+
+def cluster_embeddings(model, audio, turns, sample_rate=16000, window_seconds=3.0,
+                       max_windows=20, batch_size=32):
+    """
+    Compute one embedding per diarization label.
+
+    Returns:
+        tuple: (labels, (len(labels), dim) array); labels with no usable
+            audio get a zero row.
+    """
+    import torch
+    labels, windows, owner, short = cluster_windows(audio, turns, sample_rate,
+                                                    window_seconds, max_windows)
+    sums = np.zeros((len(labels), model.dimension), dtype=np.float32)
+    for start in range(0, len(windows), batch_size):
+        batch = torch.from_numpy(np.ascontiguousarray(windows[start:start + batch_size]))
+        embeddings = np.nan_to_num(np.asarray(model(batch.unsqueeze(1)), dtype=np.float32))
+        np.add.at(sums, owner[start:start + batch_size], _normalize_rows(embeddings))
+    for label_index, piece in short:
+        batch = torch.from_numpy(np.ascontiguousarray(piece))[None, None, :]
+        embedding = np.nan_to_num(np.asarray(model(batch), dtype=np.float32))
+        sums[label_index] += _normalize_rows(embedding)[0]
+    return labels, _normalize_rows(sums)
+
+
+_indexes = {}
+
+
+def match_with_index(embeddings, db_path, index_path, threshold=0.5):
+    """
+    Match cluster embeddings through the on-disk ANN index instead of
+    loading every enrolled vector. The index is opened (memory-mapped) once
+    per process and synced with the database on every call. Callers of the
+    same index take turns, since a sync may rebuild it and close the old
+    maps under a concurrent match.
+
+    Returns:
+        list: (name or None, similarity) per embedding.
+    """
+    from ann_index import open_or_build
+    key = os.path.abspath(index_path)
+    with _cache_lock:
+        index, lock = _indexes.get(key) or (None, threading.Lock())
+        _indexes[key] = (index, lock)
+    with lock:
+        conn = sqlite3.connect(db_path)
+        try:
+            index = index.sync(conn) if index is not None else open_or_build(index_path, db_path)
+            names = dict(conn.execute("SELECT id, name FROM speakers").fetchall())
+        finally:
+            conn.close()
+        with _cache_lock:
+            _indexes[key] = (index, lock)
+        matches = index.match(embeddings, threshold)
+    return [(names.get(speaker) if speaker is not None else None, score)
+            for speaker, score in matches]
+
+
+def identify_speakers(turns, audio, db_path, model, threshold=0.5, sample_rate=16000,
+                      index_path=None):
+    """
+    Replace diarization labels with enrolled speaker names where they match.
+
+    Args:
+        turns (list): (start, end, label) diarization turns.
+        audio (numpy.ndarray): The mono waveform the turns refer to.
+        db_path (str): Train.py speaker database.
+        model: Speaker embedding model (same one used for enrolment).
+        threshold (float): Minimum cosine similarity to accept a name.
+        index_path (str, optional): ANN index directory (see ann_index.py) to
+            use instead of the in-memory centroid matrix.
+
+    Returns:
+        list: (start, end, label) turns with matched labels renamed.
+    """
+    if not turns:
+        return turns
+    if index_path:
+        labels, embeddings = cluster_embeddings(model, audio, turns, sample_rate)
+        matches = match_with_index(embeddings, db_path, index_path, threshold)
+    else:
+        enrolled = load_enrolled(db_path)
+        if not len(enrolled):
+            return turns
+        labels, embeddings = cluster_embeddings(model, audio, turns, sample_rate)
+        matches = enrolled.match(embeddings, threshold)
+    renames = {}
+    for label, (name, score) in zip(labels, matches):
+        if name is not None:
+            renames[label] = name
+            logging.info(f"{label} identified as {name} (similarity {score:.2f})")
+        else:
+            logging.info(f"{label} not matched (best similarity {score:.2f})")
+    return [(start, end, renames.get(label, label)) for start, end, label in turns]
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+streaming.py: window-by-window processing for long recordings.
+
+The input is decoded, transcribed and diarized one window at a time so
+that aligned rows can be written as soon as each window is done and peak
+memory is bounded by a window rather than the whole recording. Each
+diarization window also covers the tail of the previous window; speaker
+labels are linked across windows by how much their turns agree in that
+overlap.
+"""
+
+import numpy as np
+
+from audio_extract import iter_audio_chunks
+
+
+def iter_windows(input_path, window_seconds, overlap_seconds, sample_rate=16000,
+                 ffmpeg_path_override=None):
+    """
+    Decode an input window by window.
+
+    The file is decoded once, through a single FFmpeg pipe
+    (audio_extract.iter_audio_chunks); the context before each window is
+    carried over from the previous one instead of being decoded again.
+
+    Args:
+        input_path (str): Path to input audio or video file.
+        window_seconds (float): Length of each new stretch of audio.
+        overlap_seconds (float): Audio from before each window to include as context.
+        sample_rate (int): Target sample rate.
+        ffmpeg_path_override (str, optional): User-specified path to FFmpeg.
+
+    Yields:
+        tuple: (window_start, context_start, audio) where audio covers
+            [context_start, window_start + window_seconds) and
+            audio[round((window_start - context_start) * sample_rate):]
+            is the new part of the window.
+    """
+    overlap_samples = int(round(overlap_seconds * sample_rate))
+    position = 0
+    tail = np.empty(0, dtype=np.float32)
+    for chunk in iter_audio_chunks(input_path, sample_rate=sample_rate,
+                                   chunk_seconds=window_seconds,
+                                   ffmpeg_path_override=ffmpeg_path_override):
+        audio = np.concatenate([tail, chunk]) if len(tail) else chunk
+        yield position / sample_rate, (position - len(tail)) / sample_rate, audio
+        position += len(chunk)
+        # Copy, so the previous window can be freed
+        tail = audio[max(0, len(audio) - overlap_samples):].copy() if overlap_samples else tail
+
+
+class SpeakerLinker:
+    """
+    Map per-window diarization labels onto labels that are stable for the
+    whole recording.
+
+    Local labels are matched to the previous window's global labels by
+    greedy maximum overlap inside the shared context region; local speakers
+    with no match get a new global label.
+    """
+
+    def __init__(self, label_format="SPEAKER_{:02d}"):
+        self.label_format = label_format
+        self._next_id = 0
+        self._tail = []
+
+    def _new_label(self):
+        label = self.label_format.format(self._next_id)
+        self._next_id += 1
+        return label
+
+    def link(self, turns, region_start, region_end):
+        """
+        Relabel one window's turns.
+
+        Args:
+            turns (list): (start, end, local_label) in recording time.
+            region_start (float): Start of the region shared with the previous window.
+            region_end (float): End of that region (start of the new audio).
+
+        Returns:
+            list: (start, end, global_label) turns.
+        """
+        scores = {}
+        for start, end, local in turns:
+            for prev_start, prev_end, label in self._tail:
+                overlap = (min(end, prev_end, region_end)
+                           - max(start, prev_start, region_start))
+                if overlap > 0:
+                    scores[(local, label)] = scores.get((local, label), 0.0) + overlap
+
+        mapping, used = {}, set()
+        for (local, label), _ in sorted(scores.items(), key=lambda item: -item[1]):
+            if local not in mapping and label not in used:
+                mapping[local] = label
+                used.add(label)
+        for _, _, local in turns:
+            if local not in mapping:
+                mapping[local] = self._new_label()
+        return [(start, end, mapping[local]) for start, end, local in turns]
+
+    def remember(self, turns, since):
+        """Keep the turns that reach past `since` for linking the next window."""
+        self._tail = [turn for turn in turns if turn[1] > since]
@@ -2,6 +2,8 @@ import whisper
 import json
 import os
 
+from transcript_store import STORE_EXTENSION, save_transcript
+
 def transcribe_audio(audio_path, model_size="medium", output_path=None):
     """
     Transcribe audio file using Whisper model
@@ -9,7 +11,9 @@ def transcribe_audio(audio_path, model_size="medium", output_path=None):
     Args:
         audio_path (str): Path to audio file
         model_size (str): Whisper model size ('tiny', 'base', 'small', 'medium', 'large')
-        output_path (str, optional): Path to save transcription JSON
+        output_path (str, optional): Path to save the transcription; a
+            .json path gets JSON, anything else a transcript store file
+            (see transcript_store.py)
         
     Returns:
         dict: Transcription result with timestamps
@@ -26,8 +30,11 @@ def transcribe_audio(audio_path, model_size="medium", output_path=None):
     )
     
     if output_path:
-        with open(output_path, 'w') as f:
-            json.dump(result, f, indent=2)
+        if output_path.lower().endswith(".json"):
+            with open(output_path, 'w', encoding='utf-8') as f:
+                json.dump(result, f, separators=(",", ":"))
+        else:
+            save_transcript(result, output_path)
         print(f"Transcription saved to {output_path}")
     
     return result
@@ -37,7 +44,7 @@ if __name__ == "__main__":
     audio_file = "data/sample_clip.wav"
     result = transcribe_audio(
         audio_file, 
-        output_path="data/transcription.json"
+        output_path="data/transcription" + STORE_EXTENSION
     )
     
     # Print first few segments as preview
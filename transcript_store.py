@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+"""
+transcript_store.py: compact binary file for Whisper transcription results.
+
+transcribe.py used to dump the whole result (token lists and word
+timestamps included) as indented JSON, which align.py then parsed in
+full. A store file keeps the same data column-wise instead:
+
+    preamble   magic, format version, header length
+    header     JSON: language, counts, which segment fields were present,
+               and (dtype, offset, length) of every column
+    columns    raw little-endian arrays, each 64-byte aligned:
+               per segment   id, seek, start, end, temperature, avg_logprob,
+                             compression_ratio, no_speech_prob, text offsets,
+                             token offsets, word offsets
+               per token     tokens
+               per word      start, end, probability, text offsets
+               text          one UTF-8 blob holding every segment and word text
+
+Transcript.open() memory-maps the file, so opening is O(1) whatever its
+size and only the columns (and pages) actually read are loaded. Segments
+are read-only mappings that decode their fields on access, so code written
+for the JSON result (result["segments"], seg["start"], seg.get("words"))
+works unchanged; bulk readers use the column arrays directly.
+"""
+
+import json
+import os
+import struct
+from collections.abc import Mapping, Sequence
+
+import numpy as np
+
+STORE_MAGIC = b"TRS1"
+STORE_VERSION = 1
+STORE_EXTENSION = ".transcript"
+PREAMBLE = struct.Struct("<4sHxxQ")
+ALIGNMENT = 64
+
+# Per-segment scalar columns: (field, dtype, value when a segment lacks it)
+SEGMENT_COLUMNS = (
+    ("id", "<i8", -1),
+    ("seek", "<i8", 0),
+    ("start", "<f8", np.nan),
+    ("end", "<f8", np.nan),
+    ("temperature", "<f4", np.nan),
+    ("avg_logprob", "<f4", np.nan),
+    ("compression_ratio", "<f4", np.nan),
+    ("no_speech_prob", "<f4", np.nan),
+)
+# Segment keys in the order Whisper gives them
+SEGMENT_FIELDS = ("id", "seek", "start", "end", "text", "tokens", "temperature",
+                  "avg_logprob", "compression_ratio", "no_speech_prob", "words")
+
+
+def _offsets(lengths):
+    offsets = np.zeros(len(lengths) + 1, dtype="<i8")
+    np.cumsum(lengths, out=offsets[1:])
+    return offsets
+
+
+def _encode_texts(texts, blob):
+    """Append encoded texts to blob (a list of bytes); return their end offsets."""
+    encoded = [text.encode("utf-8") for text in texts]
+    blob.extend(encoded)
+    return np.fromiter(map(len, encoded), dtype="<i8", count=len(encoded))
+
+
+def save_transcript(result, path):
+    """
+    Write a Whisper transcription result (or a Transcript) to a store file.
+
+    Args:
+        result (dict): Output of model.transcribe(); segments may lack
+            tokens, words or the decoding statistics.
+        path (str): Output file, replaced atomically.
+    """
+    segments = result["segments"]
+    n = len(segments)
+    present = [name for name in SEGMENT_FIELDS if n and all(name in seg for seg in segments)]
+    columns = {}
+    for name, dtype, missing in SEGMENT_COLUMNS:
+        if name in present:
+            values = (seg[name] for seg in segments)
+        else:
+            values = (missing for _ in segments)
+        columns[name] = np.fromiter(values, dtype=dtype, count=n)
+
+    token_lists = [seg.get("tokens") or () for seg in segments]
+    columns["token_offsets"] = _offsets([len(tokens) for tokens in token_lists])
+    columns["tokens"] = np.fromiter((t for tokens in token_lists for t in tokens),
+                                    dtype="<i4", count=int(columns["token_offsets"][-1]))
+
+    word_lists = [seg.get("words") or () for seg in segments]
+    words = [word for seg_words in word_lists for word in seg_words]
+    columns["word_offsets"] = _offsets([len(seg_words) for seg_words in word_lists])
+    columns["word_start"] = np.fromiter((w["start"] for w in words), dtype="<f8",
+                                        count=len(words))
+    columns["word_end"] = np.fromiter((w["end"] for w in words), dtype="<f8", count=len(words))
+    columns["word_probability"] = np.fromiter((w.get("probability", np.nan) for w in words),
+                                              dtype="<f4", count=len(words))
+
+    # Segment texts first, then word texts, in one blob with running offsets
+    blob = []
+    lengths = np.concatenate((_encode_texts((seg.get("text", "") for seg in segments), blob),
+                              _encode_texts((w.get("word", "") for w in words), blob)))
+    text_offsets = _offsets(lengths)
+    columns["text_offsets"] = text_offsets[:n + 1]
+    columns["word_text_offsets"] = text_offsets[n:]
+    columns["text"] = np.frombuffer(b"".join(blob), dtype=np.uint8)
+
+    header = {"language": result.get("language"), "segments": n, "words": len(words),
+              "fields": present, "columns": {}}
+    position = 0
+    for name, array in columns.items():
+        header["columns"][name] = [array.dtype.str, position, len(array)]
+        position += -(-array.nbytes // ALIGNMENT) * ALIGNMENT
+    header_bytes = json.dumps(header, separators=(",", ":")).encode("utf-8")
+    data_start = -(-(PREAMBLE.size + len(header_bytes)) // ALIGNMENT) * ALIGNMENT
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(PREAMBLE.pack(STORE_MAGIC, STORE_VERSION, len(header_bytes)))
+            f.write(header_bytes)
+            for name, array in columns.items():
+                f.seek(data_start + header["columns"][name][1])
+                f.write(np.ascontiguousarray(array).tobytes())
+            f.truncate(data_start + position)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def is_transcript_store(path):
+    """True if path is a store file (rather than, say, a JSON transcript)."""
+    with open(path, "rb") as f:
+        return f.read(len(STORE_MAGIC)) == STORE_MAGIC
+
+
+class Transcript(Mapping):
+    """
+    A memory-mapped store file, readable like the Whisper result dict:
+    keys are "segments", "text" and "language". close() (or a with block)
+    releases the map, which Windows needs before the file can be replaced.
+
+    Attributes:
+        columns (dict): Name -> read-only NumPy array over the file.
+    """
+
+    def __init__(self, path, header, data):
+        self.path = path
+        self.header = header
+        self.fields = tuple(header["fields"])
+        self._data = data
+        self.columns = {}
+        for name, (dtype, offset, length) in header["columns"].items():
+            dtype = np.dtype(dtype)
+            self.columns[name] = data[offset:offset + length * dtype.itemsize].view(dtype)
+        self.segments = SegmentList(self)
+
+    @classmethod
+    def open(cls, path):
+        """
+        Map a store file read-only.
+
+        Raises:
+            ValueError: If path is not a store file of a supported version.
+        """
+        with open(path, "rb") as f:
+            magic, version, header_size = PREAMBLE.unpack(f.read(PREAMBLE.size))
+            if magic != STORE_MAGIC:
+                raise ValueError(f"{path} is not a transcript store file")
+            if version > STORE_VERSION:
+                raise ValueError(f"{path} has store version {version}; "
+                                 f"this version reads up to {STORE_VERSION}")
+            header = json.loads(f.read(header_size).decode("utf-8"))
+        data_start = -(-(PREAMBLE.size + header_size) // ALIGNMENT) * ALIGNMENT
+        if os.path.getsize(path) > data_start:
+            data = np.memmap(path, dtype=np.uint8, mode="r", offset=data_start)
+        else:
+            data = np.zeros(0, dtype=np.uint8)
+        return cls(path, header, data)
+
+    def close(self):
+        """
+        Drop the columns and the memory map. Values already read stay
+        valid; Segment objects do not (reading them raises ValueError).
+        """
+        self.columns = {}
+        self.segments = None
+        data, self._data = self._data, None
+        mapping = getattr(data, "_mmap", None)
+        del data
+        if mapping is not None:
+            try:
+                mapping.close()
+            except BufferError:
+                # A caller still holds a column array; the map goes when it does
+                pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _text(self, offsets, i):
+        return bytes(self.columns["text"][offsets[i]:offsets[i + 1]]).decode("utf-8")
+
+    def __getitem__(self, key):
+        if self.segments is None:
+            raise ValueError("transcript is closed")
+        if key == "segments":
+            return self.segments
+        if key == "language":
+            return self.header["language"]
+        if key == "text":
+            # Whisper's full text is its segment texts joined
+            offsets = self.columns["text_offsets"]
+            return bytes(self.columns["text"][:offsets[-1]]).decode("utf-8")
+        raise KeyError(key)
+
+    def __iter__(self):
+        return iter(("text", "segments", "language"))
+
+    def __len__(self):
+        return 3
+
+    def to_dict(self):
+        """Materialise the whole result as plain dicts and lists, as Whisper returns it."""
+        return {"text": self["text"],
+                "segments": [dict(seg) for seg in self.segments],
+                "language": self["language"]}
+
+
+class SegmentList(Sequence):
+    """The segments of a Transcript; starts and ends are column arrays."""
+
+    def __init__(self, transcript):
+        self.transcript = transcript
+        self.starts = transcript.columns["start"]
+        self.ends = transcript.columns["end"]
+
+    def __len__(self):
+        return self.transcript.header["segments"]
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("segment index out of range")
+        return Segment(self.transcript, i)
+
+
+class Segment(Mapping):
+    """One segment; fields are read from the columns when looked up."""
+
+    __slots__ = ("transcript", "index")
+
+    def __init__(self, transcript, index):
+        self.transcript = transcript
+        self.index = index
+
+    def _columns(self):
+        if self.transcript.segments is None:
+            raise ValueError("transcript is closed")
+        return self.transcript.columns
+
+    def __getitem__(self, key):
+        if key not in self.transcript.fields:
+            raise KeyError(key)
+        columns, i = self._columns(), self.index
+        if key == "text":
+            return self.transcript._text(columns["text_offsets"], i)
+        if key == "tokens":
+            offsets = columns["token_offsets"]
+            return columns["tokens"][offsets[i]:offsets[i + 1]].tolist()
+        if key == "words":
+            return self.words()
+        return columns[key][i].item()
+
+    def words(self):
+        """Word dicts (word, start, end, probability) of this segment."""
+        columns, i = self._columns(), self.index
+        a, b = columns["word_offsets"][i:i + 2].tolist()
+        text_offsets = columns["word_text_offsets"]
+        return [{"word": self.transcript._text(text_offsets, j),
+                 "start": float(start), "end": float(end), "probability": float(probability)}
+                for j, start, end, probability in zip(
+                    range(a, b), columns["word_start"][a:b].tolist(),
+                    columns["word_end"][a:b].tolist(), columns["word_probability"][a:b].tolist())]
+
+    def __iter__(self):
+        return iter(self.transcript.fields)
+
+    def __len__(self):
+        return len(self.transcript.fields)
+
+
+def load_transcript(path):
+    """
+    Open a transcript written by transcribe.py: a store file is
+    memory-mapped, anything else is parsed as JSON (older outputs).
+    """
+    if is_transcript_store(path):
+        return Transcript.open(path)
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def segment_times(segments):
+    """(starts, ends) of segments, straight from the columns for a store file."""
+    if isinstance(segments, SegmentList):
+        return segments.starts, segments.ends
+    return [s["start"] for s in segments], [s["end"] for s in segments]
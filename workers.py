@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+workers.py: worker processes that keep the models loaded between files.
+
+Each WorkerSlot owns one spawned process which loads Whisper and the
+diarization pipeline once (main.load_resident_models) and then runs
+main.process_file for every (input, output) pair it is sent. The job
+server (server.py) and multi-worker batch runs (main.py --batch-workers)
+are built on them. On CPU the Whisper weights are memory-mapped from one
+file (see models.py), so extra workers mostly cost pyannote's memory.
+
+Workers are not daemonic, because --parallel-chunks starts a process
+pool inside them; the owner stops them with stop()/close(), and any left
+running are stopped when the parent exits.
+"""
+
+import atexit
+import logging
+import multiprocessing
+import os
+import queue
+import signal
+import sys
+import weakref
+
+_live_slots = weakref.WeakSet()
+
+
+@atexit.register
+def _stop_live_slots():
+    # Runs before multiprocessing's own exit handler joins non-daemon children
+    for slot in list(_live_slots):
+        slot.stop()
+
+
+def _exit_on_sigterm(signum, frame):
+    sys.exit(128 + signum)
+
+
+def _worker_main(conn, args):
+    """Load the models once, then run (input, output) jobs sent over conn."""
+    # Ctrl+C is for the parent, which stops the workers itself; terminate()
+    # unwinds normally so the --parallel-chunks pool is shut down too
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, _exit_on_sigterm)
+    import main as app
+    from models import use_local_models
+    app.setup_logger()
+    use_local_models(args.model_dir, offline=args.offline)
+    try:
+        try:
+            pipeline = app.load_resident_models(args)
+            cache = app.open_result_cache(args)
+        except Exception as e:
+            conn.send(("error", f"could not load models: {e}"))
+            return
+        conn.send(("ready", None))
+        while True:
+            try:
+                message = conn.recv()
+            except EOFError:
+                return
+            if message is None:
+                return
+            input_path, output_path = message
+            try:
+                app.process_file(input_path, output_path, args, pipeline=pipeline, cache=cache)
+            except Exception as e:
+                # The parent reports the error; keep the traceback for debugging
+                logging.debug(f"Failed on {input_path}", exc_info=True)
+                conn.send(("failed", str(e)))
+            else:
+                conn.send(("done", None))
+    finally:
+        app.close_chunked_transcribers()
+
+
+class WorkerSlot:
+    """One worker process with resident models, (re)started on demand."""
+
+    def __init__(self, index, args, context=None):
+        self.index = index
+        self.args = args
+        self.context = context or multiprocessing.get_context("spawn")
+        self.process = None
+        self.conn = None
+        self.ready = False
+
+    def start(self):
+        """
+        Start the process and wait until its models are loaded.
+
+        Raises:
+            RuntimeError: If the worker exits or cannot load its models.
+        """
+        self.ready = False
+        self.conn, child_conn = self.context.Pipe()
+        self.process = self.context.Process(target=_worker_main, args=(child_conn, self.args),
+                                            name=f"worker-{self.index}", daemon=False)
+        self.process.start()
+        _live_slots.add(self)
+        child_conn.close()
+        try:
+            kind, error = self.conn.recv()
+        except EOFError:
+            kind, error = "error", f"exited with code {self.process.exitcode}"
+        if kind != "ready":
+            self.stop()
+            raise RuntimeError(f"Worker {self.index} failed to start: {error}")
+        self.ready = True
+        logging.info(f"Worker {self.index} ready (pid {self.process.pid})")
+
+    def stop(self, timeout=5.0):
+        self.ready = False
+        if self.process is None:
+            return
+        try:
+            self.conn.send(None)
+        except (OSError, ValueError):
+            pass
+        self.process.join(timeout)
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join(timeout)
+        if self.process.is_alive():
+            # SIGTERM waits for the current torch call to return; don't
+            self.process.kill()
+            self.process.join()
+        self.conn.close()
+        self.process = None
+        _live_slots.discard(self)
+
+    def run(self, input_path, output_path, cancel=None, poll_seconds=0.5):
+        """
+        Process one file in the worker process, starting it if needed.
+
+        Args:
+            cancel (threading.Event, optional): Set to abandon the file; the
+                worker is stopped, since Whisper and pyannote cannot be
+                interrupted mid-file.
+
+        Returns:
+            tuple: (status, error) with status 'done', 'failed' or 'cancelled'.
+        """
+        if self.process is None or not self.process.is_alive():
+            self.start()
+        self.conn.send((input_path, output_path))
+        while not self.conn.poll(poll_seconds):
+            if cancel is not None and cancel.is_set():
+                logging.info(f"Stopping worker {self.index} to cancel {input_path}")
+                self.process.terminate()
+                self.stop()
+                return "cancelled", None
+            if not self.process.is_alive():
+                code = self.process.exitcode
+                self.stop()
+                return "failed", f"worker exited with code {code}"
+        try:
+            return self.conn.recv()
+        except EOFError:
+            self.stop()
+            return "failed", "worker exited unexpectedly"
+
+
+class WorkerPool:
+    """
+    A fixed set of WorkerSlots shared by several threads: process() runs a
+    file on whichever worker is free and raises if it failed, so it can be
+    passed to batch.run_batch() as its process callable.
+    """
+
+    def __init__(self, args, workers):
+        split_threads(args, workers)
+        self.slots = [WorkerSlot(n, args) for n in range(workers)]
+        self._free = queue.Queue()
+        for slot in self.slots:
+            self._free.put(slot)
+
+    def process(self, input_path, output_path):
+        slot = self._free.get()
+        try:
+            status, error = slot.run(input_path, output_path)
+        finally:
+            self._free.put(slot)
+        if status != "done":
+            raise RuntimeError(error or status)
+
+    def close(self):
+        for slot in self.slots:
+            slot.stop()
+
+
+def split_threads(args, workers):
+    """Give each worker its share of the cores unless thread counts were set."""
+    if workers < 2 or args.device != "cpu":
+        return
+    share = max(1, (os.cpu_count() or workers) // workers)
+    if args.pipelined:
+        if args.transcribe_threads is None:
+            args.transcribe_threads = max(1, share - share // 2)
+        if args.diarize_threads is None:
+            args.diarize_threads = max(1, share // 2)
+    else:
+        if args.transcribe_threads is None:
+            args.transcribe_threads = share
+        if args.diarize_threads is None:
+            args.diarize_threads = share